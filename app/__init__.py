@@ -25,12 +25,30 @@ def create_app():
     from app.api.orders import api as orders_ns
     from app.api.payments import api as payments_ns
     from app.api.customers import api as customers_ns
+    from app.api.analytics import api as analytics_ns
 
     api.add_namespace(merchants_ns, path='/api/merchants')
     api.add_namespace(inventory_ns, path='/api/inventory')
     api.add_namespace(orders_ns, path='/api/orders')
     api.add_namespace(payments_ns, path='/api/payments')
     api.add_namespace(customers_ns, path='/api/customers')
+    api.add_namespace(analytics_ns, path='/api/analytics')
+
+    # Pick up queued atomic orders left over from a previous run
+    from app.order_queue import resume_pending
+    resume_pending()
+
+    # Continue bulk jobs interrupted by a restart
+    from app.jobs import resume_running
+    resume_running()
+
+    # Keep local stores fed from Clover when SYNC_INTERVAL_SECONDS is set
+    from app.sync import start_background_sync
+    start_background_sync()
+
+    # Keep the cached catalog warm when CATALOG_REFRESH_INTERVAL_SECONDS is set
+    from app.catalog import start_background_refresh
+    start_background_refresh()
 
     # OAuth namespace (documented in Swagger)
     oauth_ns = Namespace('auth', description='Clover OAuth authentication')
@@ -0,0 +1,202 @@
+"""Columnar in-memory store of synced order line items for sales reporting.
+
+Line items are kept as parallel typed arrays (item, quantity, price, amount,
+timestamp, employee, order type) rather than nested dicts, roughly 40 bytes per
+line item. Repeated strings are interned into small integer codes, and
+aggregations run as vectorized NumPy operations over zero-copy views of the
+columns.
+
+Re-synced orders replace their earlier line items: the old rows are masked out
+and the new ones appended; masked rows are compacted away once they make up
+half of the store.
+"""
+
+import threading
+from array import array
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app import sync
+
+
+class _Codes:
+    """Interns strings to dense integer codes"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[Optional[str]] = []
+
+    def code(self, value: Optional[str]) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+class OrderAnalyticsStore:
+    """Line item columns for one merchant"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = _Codes()
+        self._employees = _Codes()
+        self._order_types = _Codes()
+        self._item_names: Dict[str, str] = {}
+        self._reset_columns()
+        self._order_rows: Dict[str, List[int]] = {}
+        self._dead = 0
+
+    def _reset_columns(self) -> None:
+        self.item = array('I')
+        self.quantity = array('i')
+        self.price = array('q')
+        self.amount = array('q')
+        self.created = array('q')
+        self.employee = array('I')
+        self.order_type = array('I')
+        self.live = array('b')
+
+    def __len__(self) -> int:
+        return len(self.live) - self._dead
+
+    def ingest(self, orders: List[Dict[str, Any]]) -> None:
+        """Upsert orders (with expanded lineItems) into the columns"""
+        with self._lock:
+            for order in orders:
+                order_id = order.get('id')
+                for row in self._order_rows.pop(order_id, ()):
+                    self.live[row] = 0
+                    self._dead += 1
+                if order.get('state') == 'deleted':
+                    continue
+
+                created = order.get('createdTime') or 0
+                employee = self._employees.code((order.get('employee') or {}).get('id'))
+                order_type = self._order_types.code((order.get('orderType') or {}).get('id'))
+                rows = []
+                for line_item in (order.get('lineItems') or {}).get('elements', []):
+                    item_id = (line_item.get('item') or {}).get('id')
+                    if item_id and line_item.get('name'):
+                        self._item_names[item_id] = line_item['name']
+                    quantity = line_item.get('unitQty') or 1
+                    price = line_item.get('price') or 0
+                    rows.append(len(self.live))
+                    self.item.append(self._items.code(item_id))
+                    self.quantity.append(quantity)
+                    self.price.append(price)
+                    self.amount.append(price * quantity)
+                    self.created.append(created)
+                    self.employee.append(employee)
+                    self.order_type.append(order_type)
+                    self.live.append(1)
+                if rows:
+                    self._order_rows[order_id] = rows
+
+            if self._dead and self._dead * 2 >= len(self.live):
+                self._compact()
+
+    def _compact(self) -> None:
+        keep = np.frombuffer(self.live, dtype=np.int8).astype(bool)
+        columns = {}
+        for name, typecode in (('item', 'I'), ('quantity', 'i'), ('price', 'q'), ('amount', 'q'),
+                               ('created', 'q'), ('employee', 'I'), ('order_type', 'I')):
+            values = np.frombuffer(getattr(self, name), dtype=np.dtype(typecode))[keep]
+            columns[name] = array(typecode, values.tobytes())
+            del values
+        new_index = np.cumsum(keep) - 1
+        self._order_rows = {order_id: [int(new_index[row]) for row in rows]
+                            for order_id, rows in self._order_rows.items()}
+        del keep, new_index
+        for name, column in columns.items():
+            setattr(self, name, column)
+        self.live = array('b', b'\x01' * len(self.item))
+        self._dead = 0
+
+    def _mask(self, start: Optional[int], end: Optional[int]) -> np.ndarray:
+        mask = np.frombuffer(self.live, dtype=np.int8).astype(bool)
+        created = np.frombuffer(self.created, dtype=np.int64)
+        if start is not None:
+            mask &= created >= start
+        if end is not None:
+            mask &= created < end
+        return mask
+
+    def _grouped(self, codes: array, labels: List[Optional[str]], start, end) -> List[Dict[str, Any]]:
+        mask = self._mask(start, end)
+        keys = np.frombuffer(codes, dtype=np.uint32)[mask]
+        amount = np.frombuffer(self.amount, dtype=np.int64)[mask]
+        quantity = np.frombuffer(self.quantity, dtype=np.int32)[mask]
+        size = len(labels)
+        sales = np.bincount(keys, weights=amount, minlength=size)
+        units = np.bincount(keys, weights=quantity, minlength=size)
+        lines = np.bincount(keys, minlength=size)
+        return [
+            {'id': labels[code], 'sales': int(sales[code]), 'quantity': int(units[code]), 'lineItems': int(lines[code])}
+            for code in np.flatnonzero(lines)
+        ]
+
+    def sales_by_item(self, start: Optional[int] = None, end: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._grouped(self.item, self._items.values, start, end)
+            for row in rows:
+                row['name'] = self._item_names.get(row['id'])
+        return sorted(rows, key=lambda r: r['sales'], reverse=True)
+
+    def sales_by_employee(self, start: Optional[int] = None, end: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._grouped(self.employee, self._employees.values, start, end)
+        return sorted(rows, key=lambda r: r['sales'], reverse=True)
+
+    def sales_by_order_type(self, start: Optional[int] = None, end: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._grouped(self.order_type, self._order_types.values, start, end)
+        return sorted(rows, key=lambda r: r['sales'], reverse=True)
+
+    def sales_by_hour(self, start: Optional[int] = None, end: Optional[int] = None,
+                      tz_offset_minutes: int = 0) -> List[Dict[str, Any]]:
+        """Sales per hour of day (0-23) in the given UTC offset"""
+        with self._lock:
+            mask = self._mask(start, end)
+            created = np.frombuffer(self.created, dtype=np.int64)[mask]
+            amount = np.frombuffer(self.amount, dtype=np.int64)[mask]
+            hours = ((created + tz_offset_minutes * 60000) // 3600000) % 24
+            sales = np.bincount(hours, weights=amount, minlength=24)
+            lines = np.bincount(hours, minlength=24)
+        return [{'hour': hour, 'sales': int(sales[hour]), 'lineItems': int(lines[hour])} for hour in range(24)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            column_bytes = sum(column.itemsize * len(column) for column in (
+                self.item, self.quantity, self.price, self.amount,
+                self.created, self.employee, self.order_type, self.live))
+            return {
+                'orders': len(self._order_rows),
+                'lineItems': len(self.live) - self._dead,
+                'maskedRows': self._dead,
+                'items': len(self._items.values),
+                'employees': len(self._employees.values),
+                'columnBytes': column_bytes,
+                'bytesPerLineItem': round(column_bytes / len(self.live), 1) if len(self.live) else 0,
+            }
+
+
+_LOCK = threading.Lock()
+_STORES: Dict[str, OrderAnalyticsStore] = {}
+
+
+def get_store(merchant_id: str) -> OrderAnalyticsStore:
+    with _LOCK:
+        store = _STORES.get(merchant_id)
+        if store is None:
+            store = _STORES[merchant_id] = OrderAnalyticsStore()
+        return store
+
+
+def ingest_orders(merchant_id: str, orders: List[Dict[str, Any]]) -> None:
+    get_store(merchant_id).ingest(orders)
+
+
+sync.add_listener('orders', ingest_orders)
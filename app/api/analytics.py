@@ -0,0 +1,100 @@
+from flask import request
+from flask_restx import Namespace, Resource
+from werkzeug.exceptions import HTTPException
+from app.api_utils import get_merchant_id_or_abort, parse_time_param
+from app import analytics
+
+api = Namespace('analytics', description='Sales reporting over locally synced orders')
+
+RANGE_PARAMS = {
+    'from': 'Start of the range (epoch ms or ISO 8601, inclusive) on order createdTime',
+    'to': 'End of the range (epoch ms or ISO 8601, exclusive) on order createdTime'
+}
+
+
+def _range():
+    return (parse_time_param(api, 'from', request.args.get('from')),
+            parse_time_param(api, 'to', request.args.get('to')))
+
+
+@api.route('/sales/by-item')
+class SalesByItem(Resource):
+    @api.doc('sales_by_item', params=RANGE_PARAMS)
+    def get(self):
+        """Sales, units and line item count per item"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            start, end = _range()
+            return {'elements': analytics.get_store(merchant_id).sales_by_item(start, end)}
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/sales/by-hour')
+class SalesByHour(Resource):
+    @api.doc('sales_by_hour', params=dict(RANGE_PARAMS, tzOffset='Merchant UTC offset in minutes for hour buckets (default 0)'))
+    def get(self):
+        """Sales per hour of day"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            start, end = _range()
+            try:
+                tz_offset = int(request.args.get('tzOffset', 0))
+            except ValueError:
+                api.abort(400, 'tzOffset must be an integer number of minutes')
+            return {'elements': analytics.get_store(merchant_id).sales_by_hour(start, end, tz_offset)}
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/sales/by-employee')
+class SalesByEmployee(Resource):
+    @api.doc('sales_by_employee', params=RANGE_PARAMS)
+    def get(self):
+        """Sales, units and line item count per employee"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            start, end = _range()
+            return {'elements': analytics.get_store(merchant_id).sales_by_employee(start, end)}
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/sales/by-order-type')
+class SalesByOrderType(Resource):
+    @api.doc('sales_by_order_type', params=RANGE_PARAMS)
+    def get(self):
+        """Sales, units and line item count per order type"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            start, end = _range()
+            return {'elements': analytics.get_store(merchant_id).sales_by_order_type(start, end)}
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/stats')
+class AnalyticsStats(Resource):
+    @api.doc('analytics_stats')
+    def get(self):
+        """Size and memory footprint of the analytics store"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            return analytics.get_store(merchant_id).stats()
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
@@ -1,8 +1,11 @@
 import requests
 from flask import request
 from flask_restx import Namespace, Resource, fields
+from werkzeug.exceptions import HTTPException
 from app.config import Config
-from app.api_utils import make_clover_request, get_merchant_id_or_abort, build_merchant_url
+from app.api_utils import get_merchant_id_or_abort, parse_time_param
+from app.pagination import fetch_cursor_page
+from app import customer_history, customer_import, customer_index, customer_profiles, jobs, sync
 
 MISSING_MID_MSG = "Merchant ID not set. Complete OAuth flow or set CLOVER_MERCHANT_ID in .env"
 
@@ -42,7 +45,9 @@ email_address_model = api.model('EmailAddress', {
 
 @api.route('/')
 class Customers(Resource):
-    @api.doc('get_customers')
+    @api.doc('get_customers', params={
+        'cursor': 'Opaque cursor from a previous page (pass empty for the first page) to use keyset pagination instead of offset'
+    })
     def get(self):
         """Get all customers"""
         try:
@@ -58,6 +63,23 @@ class Customers(Resource):
             filter_param = request.args.get('filter', None)
             expand = request.args.get('expand', None)
 
+            filters = request.args.getlist('filter')
+            if 'cursor' in request.args:
+                try:
+                    return fetch_cursor_page(
+                        url,
+                        merchant_id,
+                        request.args.get('cursor', ''),
+                        limit,
+                        filters=filters,
+                        expand=expand,
+                        time_field='customerSince'
+                    )
+                except ValueError as e:
+                    api.abort(400, str(e))
+                except requests.HTTPError as e:
+                    api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+
             params = {
                 'limit': limit,
                 'offset': offset
@@ -80,10 +102,14 @@ class Customers(Resource):
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
 
+        except HTTPException as http_exc:
+            raise http_exc
         except Exception as e:
             api.abort(500, f"Internal error: {str(e)}")
 
-    @api.doc('create_customer')
+    @api.doc('create_customer', params={
+        'allowDuplicate': 'Set to true to create the customer even if one with the same phone number or email address exists'
+    })
     @api.expect(customer_model)
     def post(self):
         """Create a new customer"""
@@ -94,6 +120,19 @@ class Customers(Resource):
                 api.abort(400, MISSING_MID_MSG)
             url = f"{config.clover_api_url}/{config.CLOVER_API_VERSION}/merchants/{merchant_id}/customers"
 
+            index = customer_index.get_index(merchant_id)
+            if request.args.get('allowDuplicate', 'false').lower() != 'true':
+                try:
+                    seeded = customer_index.ensure_seeded(merchant_id, Config.CUSTOMER_INDEX_WAIT_SECONDS)
+                except requests.HTTPError as e:
+                    api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+                if not seeded:
+                    api.abort(503, 'The customer index is still loading; retry shortly or pass allowDuplicate=true')
+                duplicates = index.duplicates(request.json or {})
+                if duplicates:
+                    api.abort(409, 'A customer with the same phone number or email address exists',
+                              duplicates=duplicates)
+
             response = requests.post(
                 url,
                 headers=config.get_headers(),
@@ -102,13 +141,47 @@ class Customers(Resource):
             )
 
             if response.status_code in [200, 201]:
-                return response.json()
+                customer = response.json()
+                # Clover may not echo the phone numbers and emails it was sent
+                index.upsert(dict(request.json or {}, **customer))
+                return customer
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
 
+        except HTTPException as http_exc:
+            raise http_exc
         except Exception as e:
             api.abort(500, f"Internal error: {str(e)}")
 
+@api.route('/search')
+class CustomerSearch(Resource):
+    @api.doc('search_customers',
+             description='Look customers up by exact email address, exact phone number, or name prefixes '
+                         '(every word of q must start one of the first or last name words) in the local customer index',
+             params={'q': 'Email address, phone number or the beginning of a name', 'limit': 'Maximum number of matches (default 20)'})
+    def get(self):
+        """Search customers"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            query = (request.args.get('q') or '').strip()
+            if not query:
+                api.abort(400, 'q is required')
+            try:
+                limit = int(request.args.get('limit', 20))
+            except ValueError:
+                api.abort(400, 'limit must be an integer')
+            if not customer_index.ensure_seeded(merchant_id, Config.CUSTOMER_INDEX_WAIT_SECONDS):
+                api.abort(503, 'The customer index is still loading; retry shortly')
+            return {'elements': customer_index.get_index(merchant_id).search(query, limit)}
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
 @api.route('/<string:customer_id>')
 class Customer(Resource):
     @api.doc('get_customer')
@@ -158,8 +231,10 @@ class Customer(Resource):
                 json=request.json,
                 timeout=30
             )
+            customer_profiles.invalidate(merchant_id, customer_id)
 
             if response.status_code == 200:
+                customer_index.get_index(merchant_id).upsert(response.json())
                 return response.json()
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
@@ -179,8 +254,10 @@ class Customer(Resource):
                 headers=config.get_headers(),
                 timeout=30
             )
+            customer_profiles.invalidate(config.CLOVER_MERCHANT_ID, customer_id)
 
             if response.status_code == 200:
+                customer_index.get_index(config.CLOVER_MERCHANT_ID).remove(customer_id)
                 return {'message': 'Customer deleted successfully'}
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
@@ -188,6 +265,54 @@ class Customer(Resource):
         except Exception as e:
             api.abort(500, f"Internal error: {str(e)}")
 
+@api.route('/<string:customer_id>/profile')
+class CustomerProfile(Resource):
+    @api.doc('get_customer_profile', description='Get a customer with its addresses, phone numbers and email addresses '
+                                                 'in one response (one expanded Clover request, or concurrent '
+                                                 'sub-resource requests), cached briefly')
+    def get(self, customer_id):
+        """Get a customer profile"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            profile, cached = customer_profiles.get_profile(merchant_id, customer_id)
+            return profile, 200, {'X-Cache': 'HIT' if cached else 'MISS'}
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+@api.route('/<string:customer_id>/history')
+class CustomerHistory(Resource):
+    @api.doc('get_customer_history',
+             description='Visit count, spend, average ticket and recent orders of a customer from the local '
+                         'order index (fed by the orders sync; the figures cover orders from syncedFrom onwards)',
+             params={'recent': 'Number of recent orders to return (default 10)'})
+    def get(self, customer_id):
+        """Get a customer's order history"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            try:
+                recent = int(request.args.get('recent', 10))
+            except ValueError:
+                api.abort(400, 'recent must be an integer')
+            if sync.get_coverage(merchant_id, 'orders') is None:
+                sync.sync(merchant_id, 'orders')
+            history = customer_history.get_history(merchant_id).history(customer_id, max(recent, 0))
+            coverage = sync.get_coverage(merchant_id, 'orders')
+            history['syncedFrom'] = coverage['syncedFrom']
+            history['syncedAt'] = coverage['syncedAt']
+            return history
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
 @api.route('/<string:customer_id>/addresses')
 class CustomerAddresses(Resource):
     @api.doc('get_customer_addresses')
@@ -231,6 +356,7 @@ class CustomerAddresses(Resource):
                 json=request.json,
                 timeout=30
             )
+            customer_profiles.invalidate(merchant_id, customer_id)
 
             if response.status_code in [200, 201]:
                 return response.json()
@@ -283,8 +409,10 @@ class CustomerPhoneNumbers(Resource):
                 json=request.json,
                 timeout=30
             )
+            customer_profiles.invalidate(merchant_id, customer_id)
 
             if response.status_code in [200, 201]:
+                customer_index.get_index(merchant_id).add_contact(customer_id, phone=response.json().get('phoneNumber'))
                 return response.json()
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
@@ -335,11 +463,118 @@ class CustomerEmailAddresses(Resource):
                 json=request.json,
                 timeout=30
             )
+            customer_profiles.invalidate(merchant_id, customer_id)
 
             if response.status_code in [200, 201]:
+                customer_index.get_index(merchant_id).add_contact(customer_id, email=response.json().get('emailAddress'))
                 return response.json()
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
 
         except Exception as e:
-            api.abort(500, f"Internal error: {str(e)}")
\ No newline at end of file
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/sync')
+class CustomersSync(Resource):
+    @api.doc('sync_customers', description='Pull customers created since the last sync into the local stores (Clover customers have no modifiedTime, so edits are not picked up)', params={
+        'since': 'Re-sync from this customerSince (epoch ms or ISO 8601) instead of the last watermark'
+    })
+    def post(self):
+        """Sync customers into local stores"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            since = parse_time_param(api, 'since', request.args.get('since'))
+            return sync.sync(merchant_id, 'customers', since)
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+def _import_format():
+    fmt = (request.args.get('format') or '').lower()
+    if not fmt:
+        content_type = (request.mimetype or '').lower()
+        fmt = 'csv' if content_type in ('text/csv', 'application/csv') else 'ndjson'
+    if fmt not in customer_import.FORMATS:
+        api.abort(400, f"format must be one of {', '.join(customer_import.FORMATS)}")
+    return fmt
+
+
+def _get_import_or_abort(job_id):
+    job = jobs.get_job(job_id)
+    if job is None or job['kind'] != customer_import.JOB_KIND:
+        api.abort(404, f'Import {job_id} not found')
+    return job
+
+
+@api.route('/import')
+class CustomerImports(Resource):
+    @api.doc('list_customer_imports', description='List customer imports, most recent first',
+             params={'limit': 'Maximum number of imports (default 50)'})
+    def get(self):
+        """List customer imports"""
+        try:
+            try:
+                limit = int(request.args.get('limit', 50))
+            except ValueError:
+                api.abort(400, 'limit must be an integer')
+            return {'elements': jobs.list_jobs(customer_import.JOB_KIND, limit)}
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+    @api.doc('import_customers',
+             description='Stream a CSV file (firstName, lastName, marketingAllowed, email, phone, address1, address2, '
+                         'city, state, zip, country) or NDJSON customers with addresses, phoneNumbers and emailAddresses '
+                         'as the request body. Rows are journaled as they arrive and imported in a background job.',
+             params={'format': 'csv or ndjson (default: from Content-Type, otherwise ndjson)'})
+    def post(self):
+        """Start a customer import"""
+        try:
+            fmt = _import_format()
+            merchant_id = get_merchant_id_or_abort(api)
+            job = jobs.create_job(customer_import.JOB_KIND, merchant_id, {'format': fmt},
+                                  customer_import.parse(request.stream, fmt))
+            return job, 202
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/import/<string:job_id>')
+class CustomerImport(Resource):
+    @api.doc('get_customer_import', description='Get the progress and throughput of a customer import and its failed rows')
+    def get(self, job_id):
+        """Get a customer import"""
+        job = _get_import_or_abort(job_id)
+        job['failures'] = [{'line': item['item_key'], 'error': item['error']}
+                           for item in jobs.list_items(job_id, jobs.FAILED)]
+        return job
+
+
+@api.route('/import/<string:job_id>/resume')
+class CustomerImportResume(Resource):
+    @api.doc('resume_customer_import', description='Resume a cancelled or interrupted customer import',
+             params={'retryFailed': 'Also retry rows that failed (true/false)'})
+    def post(self, job_id):
+        """Resume a customer import"""
+        _get_import_or_abort(job_id)
+        return jobs.resume_job(job_id, request.args.get('retryFailed', 'false').lower() == 'true')
+
+
+@api.route('/import/<string:job_id>/cancel')
+class CustomerImportCancel(Resource):
+    @api.doc('cancel_customer_import', description='Stop a customer import once the rows in flight finish')
+    def post(self, job_id):
+        """Cancel a customer import"""
+        _get_import_or_abort(job_id)
+        return jobs.cancel_job(job_id)
@@ -1,8 +1,13 @@
 import requests
-from flask import request
+from flask import Response, request
 from flask_restx import Namespace, Resource, fields
+from werkzeug.exceptions import HTTPException
 from app.config import Config
 from app.api_utils import make_clover_request, get_merchant_id_or_abort, build_merchant_url
+from app import catalog, inventory_updates, item_index, menu
+
+# Most item patches accepted by one bulk update
+MAX_BULK_ITEM_PATCHES = 1000
 
 api = Namespace('inventory', description='Clover Inventory API operations')
 
@@ -18,6 +23,14 @@ item_model = api.model('Item', {
     'stockCount': fields.Integer(description='Stock count')
 })
 
+item_bulk_update_model = api.model('ItemBulkUpdate', {
+    'items': fields.List(fields.Raw, required=True,
+                         description='Item patches: an id plus the fields to set (name, price, cost, sku, code, '
+                                     'priceType, hidden, available, stockCount, ...)'),
+    'dryRun': fields.Boolean(description='Only report which items would change'),
+    'refresh': fields.Boolean(description='Reload the catalog from Clover before diffing'),
+})
+
 category_model = api.model('Category', {
     'id': fields.String(description='Category ID'),
     'name': fields.String(description='Category name'),
@@ -79,6 +92,7 @@ class Items(Resource):
             )
 
             if response.status_code in [200, 201]:
+                catalog.items.put(merchant_id, [response.json()])
                 return response.json()
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
@@ -86,6 +100,64 @@ class Items(Resource):
         except Exception as e:
             api.abort(500, f"Internal error: {str(e)}")
 
+@api.route('/items/bulk')
+class ItemsBulkUpdate(Resource):
+    @api.doc('bulk_update_items',
+             description='Update many items in one call. Patches are diffed against the cached catalog, items that '
+                         'already match are skipped, and the rest are updated concurrently within the rate limits. '
+                         'Returns one outcome per patch: updated, unchanged, notFound, invalid, failed '
+                         '(or wouldUpdate for a dry run).')
+    @api.expect(item_bulk_update_model)
+    def post(self):
+        """Bulk update inventory items"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            payload = request.get_json(silent=True) or {}
+            patches = payload.get('items')
+            if not isinstance(patches, list) or not patches:
+                api.abort(400, 'items must be a non-empty list of item patches')
+            if len(patches) > MAX_BULK_ITEM_PATCHES:
+                api.abort(400, f'At most {MAX_BULK_ITEM_PATCHES} item patches per request')
+            return inventory_updates.apply_patches(merchant_id, patches, bool(payload.get('dryRun')),
+                                                   bool(payload.get('refresh')))
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+@api.route('/items/lookup')
+class ItemsLookup(Resource):
+    @api.doc('lookup_items', description='Find items in the cached catalog by exact SKU or code (barcode scans), '
+                                         'or by name: every word of q must start a word of the item name',
+             params={'code': 'SKU or code to match exactly (case-insensitive)',
+                     'q': 'Beginning of the item name', 'limit': 'Maximum number of name matches (default 20)'})
+    def get(self):
+        """Look up inventory items"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            code = request.args.get('code')
+            query = request.args.get('q')
+            if not code and not query:
+                api.abort(400, 'Provide code or q')
+            try:
+                limit = int(request.args.get('limit', 20))
+            except ValueError:
+                api.abort(400, 'limit must be an integer')
+            index = item_index.get_index(merchant_id)
+            if code:
+                return {'elements': index.by_code(code), 'matchedOn': 'code'}, 200, {'X-Data-Source': 'cache'}
+            return {'elements': index.search(query, limit), 'matchedOn': 'name'}, 200, {'X-Data-Source': 'cache'}
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
 @api.route('/items/<string:item_id>')
 class Item(Resource):
     @api.doc('get_item')
@@ -112,6 +184,27 @@ class Item(Resource):
         except Exception as e:
             api.abort(500, f"Internal error: {str(e)}")
 
+    @api.doc('update_item')
+    @api.expect(item_model)
+    def post(self, item_id):
+        """Update an inventory item"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            url = build_merchant_url(Config(), merchant_id, f'items/{item_id}')
+
+            response = make_clover_request('POST', url, merchant_id, json=request.json)
+
+            if response.status_code == 200:
+                catalog.items.put(merchant_id, [response.json()])
+                return response.json()
+            else:
+                api.abort(response.status_code, f"Clover API error: {response.text}")
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
 @api.route('/categories')
 class Categories(Resource):
     @api.doc('get_categories')
@@ -136,4 +229,162 @@ class Categories(Resource):
                 api.abort(response.status_code, f"Clover API error: {response.text}")
 
         except Exception as e:
-            api.abort(500, f"Internal error: {str(e)}")
\ No newline at end of file
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+def _cached_listing(cache, merchant_id, records):
+    """One page of cached records with the age of the cache"""
+    try:
+        limit = int(request.args.get('limit', 100))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        api.abort(400, 'limit and offset must be integers')
+    age = cache.age(merchant_id)
+    return ({'elements': records[offset:offset + limit], 'total': len(records)}, 200,
+            {'X-Data-Source': 'cache', 'X-Cache-Age': str(int(age or 0))})
+
+
+def _cached_record(cache, merchant_id, record_id, label):
+    record = cache.get(merchant_id, record_id)
+    if record is None:
+        api.abort(404, f'{label} {record_id} not found')
+    return record, 200, {'X-Data-Source': 'cache', 'X-Cache-Age': str(int(cache.age(merchant_id) or 0))}
+
+
+@api.route('/modifier_groups')
+class ModifierGroups(Resource):
+    @api.doc('get_modifier_groups', description='Get all modifier groups with their modifiers, from the cached catalog',
+             params={'limit': 'Page size (default 100)', 'offset': 'Page offset'})
+    def get(self):
+        """Get all modifier groups"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            groups = list(catalog.modifier_groups.get_all(merchant_id).values())
+            return _cached_listing(catalog.modifier_groups, merchant_id, groups)
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+@api.route('/modifier_groups/<string:group_id>')
+class ModifierGroup(Resource):
+    @api.doc('get_modifier_group', description='Get a modifier group with its modifiers, from the cached catalog')
+    def get(self, group_id):
+        """Get specific modifier group"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            return _cached_record(catalog.modifier_groups, merchant_id, group_id, 'Modifier group')
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+@api.route('/modifiers')
+class Modifiers(Resource):
+    @api.doc('get_modifiers', description='Get all modifiers, each with its modifierGroup, from the cached catalog',
+             params={'modifierGroupId': 'Only modifiers of this group', 'limit': 'Page size (default 100)',
+                     'offset': 'Page offset'})
+    def get(self):
+        """Get all modifiers"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            group_id = request.args.get('modifierGroupId')
+            modifiers = [
+                dict(modifier, modifierGroup={'id': group['id']})
+                for group in catalog.modifier_groups.get_all(merchant_id).values()
+                if group_id is None or group['id'] == group_id
+                for modifier in (group.get('modifiers') or {}).get('elements', [])
+            ]
+            return _cached_listing(catalog.modifier_groups, merchant_id, modifiers)
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+@api.route('/tax_rates')
+class TaxRates(Resource):
+    @api.doc('get_tax_rates', description='Get all tax rates, from the cached catalog',
+             params={'limit': 'Page size (default 100)', 'offset': 'Page offset'})
+    def get(self):
+        """Get all tax rates"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            return _cached_listing(catalog.tax_rates, merchant_id, list(catalog.tax_rates.get_all(merchant_id).values()))
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+@api.route('/tax_rates/<string:tax_rate_id>')
+class TaxRate(Resource):
+    @api.doc('get_tax_rate', description='Get a tax rate, from the cached catalog')
+    def get(self, tax_rate_id):
+        """Get specific tax rate"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            return _cached_record(catalog.tax_rates, merchant_id, tax_rate_id, 'Tax rate')
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+@api.route('/catalog/refresh')
+class CatalogRefresh(Resource):
+    @api.doc('refresh_catalog', description='Reload cached catalog collections from Clover now, e.g. after editing '
+                                            'modifiers or tax rates in the Clover dashboard',
+             params={'collection': 'Collection to reload (items, categories, modifier_groups, tax_rates; default all)'})
+    def post(self):
+        """Reload the cached catalog"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            caches = catalog.collections()
+            name = request.args.get('collection')
+            if name is not None and name not in caches:
+                api.abort(400, f"collection must be one of {', '.join(caches)}")
+            selected = [name] if name else list(caches)
+            return {'refreshed': {endpoint: len(caches[endpoint].refresh(merchant_id)) for endpoint in selected}}
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/menu')
+class Menu(Resource):
+    @api.doc('get_menu', description='Get the menu as a tree of categories, their visible items and each item\'s '
+                                     'modifier groups, precomputed from the cached catalog. Send the ETag back in '
+                                     'If-None-Match to get 304 Not Modified while the menu is unchanged.')
+    def get(self):
+        """Get the menu tree"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            body, etag = menu.get_menu(merchant_id)
+            headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+            if request.if_none_match.contains(etag):
+                return Response(status=304, headers=headers)
+            return Response(body, mimetype='application/json', headers=headers)
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
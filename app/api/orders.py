@@ -1,8 +1,27 @@
+import json
+import time
 import requests
-from flask import request
+from flask import Response, request, stream_with_context
 from flask_restx import Namespace, Resource, fields
+from werkzeug.exceptions import HTTPException
 from app.config import Config
-from app.api_utils import make_clover_request, get_merchant_id_or_abort, build_merchant_url
+from app.api_utils import make_clover_request, get_merchant_id_or_abort, build_merchant_url, idempotent, parse_time_param
+from app.pagination import fetch_cursor_page, fetch_all
+from app.concurrency import run_bounded
+from app.cart_validation import validate_cart
+from app import catalog
+from app import customer_history
+from app import order_queue
+from app import order_cache
+from app import sync
+from app import order_archive
+from app import local_mirror
+from app import jobs
+from app.projection import (
+    DEFAULT_ORDER_EXPAND, ORDER_EXPANDABLE, ORDER_PRESETS, expand_for_fields, project, resolve_fields
+)
+
+MISSING_MID_MSG = "Merchant ID not set. Complete OAuth flow or set CLOVER_MERCHANT_ID in .env"
 
 api = Namespace('orders', description='Clover Orders API operations')
 
@@ -66,6 +85,10 @@ atomic_order_model = api.model('AtomicOrder', {
     }
 })
 
+atomic_order_bulk_model = api.model('AtomicOrderBulk', {
+    'orders': fields.List(fields.Nested(atomic_order_model), description='Atomic orders to create', required=True)
+})
+
 # Atomic order checkout models
 order_type_model = api.model('OrderType', {
     'taxable': fields.String(description='Whether the order type is taxable', default='false', example='false'),
@@ -145,9 +168,76 @@ line_item_model = api.model('LineItem', {
     'unitQty': fields.Integer(description='Quantity', example=1)
 })
 
+line_item_operation_model = api.model('LineItemOperation', {
+    'op': fields.String(description='Operation to apply', enum=['add', 'update', 'delete'], required=True, example='update'),
+    'id': fields.String(description='Line item ID (required for update and delete)', example='LI-1'),
+    'lineItem': fields.Raw(description='Line item fields (required for add and update)', example={'unitQty': 2, 'note': 'Extra hot'})
+})
+
+line_item_batch_model = api.model('LineItemBatch', {
+    'operations': fields.List(fields.Nested(line_item_operation_model), description='Operations to apply', required=True, example=[
+        {'op': 'add', 'lineItem': {'item': {'id': '1FC5RCZ4XPZTT'}, 'name': 'Cappuccino', 'price': 499, 'unitQty': 1}},
+        {'op': 'update', 'id': 'LI-1', 'lineItem': {'unitQty': 2}},
+        {'op': 'delete', 'id': 'LI-2'}
+    ])
+})
+
+order_bulk_job_model = api.model('OrderBulkJob', {
+    'filter': fields.List(fields.String, description='Clover filters selecting the orders', example=['state=open']),
+    'createdBefore': fields.String(description='Only orders created before this time (epoch ms or ISO 8601)', example='2025-09-22T00:00:00Z'),
+    'action': fields.String(description='Operation to apply to each order', enum=['state', 'delete'], required=True, example='state'),
+    'state': fields.String(description='New order state (required for the state action)', example='locked'),
+    'dryRun': fields.Boolean(description='Only report the selected orders', example=False)
+})
+
+
+def _order_changed(merchant_id, order_id, deleted=False):
+    """Drop the local copies of an order changed or deleted through this API"""
+    order_cache.orders.invalidate(merchant_id, order_id)
+    order_archive.get_archive(merchant_id).remove([order_id])
+    if deleted:
+        local_mirror.get_mirror(merchant_id, 'orders').remove([order_id])
+        customer_history.get_history(merchant_id).remove(order_id)
+
+
+def _without_item_expansion(expand):
+    """Drop lineItems.item from an expand value, keeping the line items themselves"""
+    parts = [part.strip() for part in (expand or '').split(',') if part.strip()]
+    parts = [part for part in parts if part != 'lineItems.item']
+    if 'lineItems' not in parts:
+        parts.insert(0, 'lineItems')
+    return ','.join(parts)
+
+
+def _attach_catalog_items(orders, merchant_id, normalized):
+    """
+    Fill in line item item details from the cached catalog. When normalized,
+    item references are left as-is and the referenced items are returned once
+    in a map keyed by item id instead.
+    """
+    catalog_items = catalog.items.get_all(merchant_id)
+    referenced = {}
+    for order in orders:
+        for line_item in (order.get('lineItems') or {}).get('elements', []):
+            item_ref = line_item.get('item')
+            item = catalog_items.get(item_ref.get('id')) if isinstance(item_ref, dict) else None
+            if item is None:
+                continue
+            if normalized:
+                referenced[item['id']] = item
+            else:
+                line_item['item'] = item
+    return referenced
+
+
 @api.route('/')
 class Orders(Resource):
-    @api.doc('get_orders', description='Gets a list of orders')
+    @api.doc('get_orders', description='Gets a list of orders', params={
+        'cursor': 'Opaque cursor from a previous page (pass empty for the first page) to use keyset pagination instead of offset',
+        'itemDetails': 'Join line item details from the cached catalog instead of having Clover expand lineItems.item '
+                       'in every order: "local" embeds them, "normalized" returns them once in an items map',
+        'local': 'Set to false to always send filtered reads to Clover instead of the synced local mirror'
+    })
     def get(self):
         """Get all orders"""
         try:
@@ -158,31 +248,66 @@ class Orders(Resource):
             # Get query parameters
             limit = request.args.get('limit', 100)
             offset = request.args.get('offset', 0)
-            filter_param = request.args.get('filter', None)
             expand = request.args.get('expand', None)
 
-            params = {
-                'limit': limit,
-                'offset': offset
-            }
+            item_details = request.args.get('itemDetails')
+            if item_details not in (None, 'local', 'normalized'):
+                api.abort(400, 'itemDetails must be "local" or "normalized"')
+            if item_details:
+                expand = _without_item_expansion(expand)
 
-            if filter_param:
-                params['filter'] = filter_param
-            if expand:
-                params['expand'] = expand
+            filters = request.args.getlist('filter')
+            local = None
+            if filters and 'cursor' not in request.args and request.args.get('local') != 'false':
+                local = local_mirror.query(merchant_id, 'orders', filters, limit, offset, expand)
 
-            response = make_clover_request(
-                'GET',
-                url,
-                merchant_id,
-                params=params
-            )
-
-            if response.status_code == 200:
-                return response.json()
+            if local is not None:
+                result = local
+            elif 'cursor' in request.args:
+                try:
+                    result = fetch_cursor_page(
+                        url,
+                        merchant_id,
+                        request.args.get('cursor', ''),
+                        limit,
+                        filters=filters,
+                        expand=expand
+                    )
+                except ValueError as e:
+                    api.abort(400, str(e))
+                except requests.HTTPError as e:
+                    api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
             else:
-                api.abort(response.status_code, f"Clover API error: {response.text}")
+                params = {
+                    'limit': limit,
+                    'offset': offset
+                }
+
+                if filters:
+                    params['filter'] = filters
+                if expand:
+                    params['expand'] = expand
+
+                response = make_clover_request(
+                    'GET',
+                    url,
+                    merchant_id,
+                    params=params
+                )
+
+                if response.status_code != 200:
+                    api.abort(response.status_code, f"Clover API error: {response.text}")
+                result = response.json()
 
+            if item_details:
+                items = _attach_catalog_items(result.get('elements', []), merchant_id,
+                                              normalized=item_details == 'normalized')
+                if item_details == 'normalized':
+                    result['items'] = items
+            return result, 200, {'X-Data-Source': 'local' if local is not None else 'clover'}
+
+        except HTTPException as http_exc:
+            raise http_exc
         except Exception as e:
             api.abort(500, f"Internal error: {str(e)}")
 
@@ -190,7 +315,13 @@ class Orders(Resource):
 
 @api.route('/<string:order_id>')
 class Order(Resource):
-    @api.doc('get_order', description='Get a single order by ID')
+    @api.doc('get_order', description='Get a single order by ID', params={
+        'expand': 'Clover expand value (overrides the expansion derived from fields)',
+        'fields': 'Comma-separated field paths (e.g. total,state,lineItems.name) and/or presets: '
+                  + ', '.join(ORDER_PRESETS),
+        'source': 'Force reading from the local "archive" or from "clover" (default: archive for orders '
+                  'older than ORDER_ARCHIVE_AFTER_DAYS, otherwise Clover)'
+    })
     def get(self, order_id):
         """Get specific order"""
         try:
@@ -200,30 +331,71 @@ class Order(Resource):
                 api.abort(400, MISSING_MID_MSG)
             url = f"{config.clover_api_url}/{config.CLOVER_API_VERSION}/merchants/{merchant_id}/orders/{order_id}"
 
+            selected = resolve_fields(request.args.get('fields'), ORDER_PRESETS)
+
+            # Orders old enough to no longer change are served from the local archive
+            source = request.args.get('source')
+            if source not in (None, 'archive', 'clover'):
+                api.abort(400, 'source must be "archive" or "clover"')
             expand = request.args.get('expand', None)
             params = {}
             if expand:
                 params['expand'] = expand
+            elif selected is not None:
+                # Only expand what the requested fields need
+                minimal_expand = expand_for_fields(selected, ORDER_EXPANDABLE)
+                if minimal_expand:
+                    params['expand'] = minimal_expand
             else:
                 # Default to comprehensive expansion for complete order details
-                params['expand'] = (
-                    'lineItems,lineItems.item,lineItems.modifications,'
-                    'discounts,orderType,payments,taxRates,serviceCharge,'
-                    'device,merchant,employee'
-                )
+                params['expand'] = DEFAULT_ORDER_EXPAND
 
-            response = requests.get(
-                url,
-                headers=config.get_headers(),
-                params=params,
-                timeout=30
-            )
+            # The archive answers requests within the expansion it was synced with, and the
+            # default read with whatever of the default expansion it holds
+            default_read = not expand and selected is None
+            if source == 'archive' and not default_read and not order_archive.covers(params.get('expand', '')):
+                api.abort(400, 'Archived orders are only expanded with: ' + ', '.join(sorted(order_archive.EXPAND)))
+            if source != 'clover' and (default_read or order_archive.covers(params.get('expand', ''))):
+                archive = order_archive.get_archive(merchant_id)
+                created = archive.created_time(order_id)
+                cutoff = (time.time() - Config.ORDER_ARCHIVE_AFTER_DAYS * 86400) * 1000
+                if created is not None and (source == 'archive' or created < cutoff):
+                    document = archive.get(order_id)
+                    if document is not None:
+                        headers = {'X-Data-Source': 'archive'}
+                        missing = order_archive.missing(params.get('expand', ''))
+                        if missing:
+                            headers['X-Archive-Missing-Expand'] = ','.join(missing)
+                        return project(document, selected), 200, headers
+            if source == 'archive':
+                api.abort(404, f'Order {order_id} is not in the archive')
+
+            # Unexpanded reads cost the same as the revalidation check, so only cache expansions
+            expand_key = params.get('expand', '')
+            cached = order_cache.orders.get(merchant_id, order_id, expand_key) if expand_key else None
+            if cached is not None:
+                # Revalidate with a cheap unexpanded read before reusing the expansion
+                check = make_clover_request('GET', url, merchant_id)
+                modified_time = cached.get('modifiedTime')
+                if (check.status_code == 200 and modified_time is not None
+                        and check.json().get('modifiedTime') == modified_time):
+                    return project(cached, selected)
+                order_cache.orders.invalidate(merchant_id, order_id)
+                if check.status_code != 200:
+                    api.abort(check.status_code, f"Clover API error: {check.text}")
+
+            response = make_clover_request('GET', url, merchant_id, params=params)
 
             if response.status_code == 200:
-                return response.json()
+                document = response.json()
+                if expand_key:
+                    order_cache.orders.put(merchant_id, order_id, expand_key, document)
+                return project(document, selected)
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
 
+        except HTTPException as http_exc:
+            raise http_exc
         except Exception as e:
             api.abort(500, f"Internal error: {str(e)}")
 
@@ -244,6 +416,7 @@ class Order(Resource):
                 json=request.json,
                 timeout=30
             )
+            _order_changed(merchant_id, order_id)
 
             if response.status_code == 200:
                 return response.json()
@@ -268,6 +441,7 @@ class Order(Resource):
                 headers=config.get_headers(),
                 timeout=30
             )
+            _order_changed(merchant_id, order_id, deleted=response.status_code in [200, 204, 404])
 
             if response.status_code in [200, 204]:
                 return {'message': f'Order {order_id} deleted successfully'}
@@ -321,6 +495,7 @@ class OrderLineItems(Resource):
                 json=request.json,
                 timeout=30
             )
+            _order_changed(merchant_id, order_id)
 
             if response.status_code in [200, 201]:
                 return response.json()
@@ -352,6 +527,7 @@ class OrderLineItem(Resource):
                 json=request.json,
                 timeout=30
             )
+            _order_changed(merchant_id, order_id)
 
             if response.status_code in [200, 201]:
                 return response.json()
@@ -376,6 +552,7 @@ class OrderLineItem(Resource):
                 headers=config.get_headers(),
                 timeout=30
             )
+            _order_changed(merchant_id, order_id)
 
             if response.status_code in [200, 204]:
                 return {'message': f'Line item {line_item_id} deleted successfully'}
@@ -386,10 +563,158 @@ class OrderLineItem(Resource):
             api.abort(500, f"Internal error: {str(e)}")
 
 
+def _line_item_error(response):
+    return {
+        'status': 'failed',
+        'statusCode': response.status_code,
+        'error': f"Clover API error: {response.text}"
+    }
+
+
+def _add_line_items(order_url, merchant_id, line_items):
+    """Create line items with a single bulk call, returning one result per line item"""
+    response = make_clover_request('POST', f"{order_url}/bulk_line_items", merchant_id,
+                                   json={'items': line_items})
+    if response.status_code not in [200, 201]:
+        return [_line_item_error(response)] * len(line_items)
+    created = response.json()
+    if isinstance(created, dict):
+        created = created.get('elements', [])
+    results = []
+    for index in range(len(line_items)):
+        line_item = created[index] if index < len(created) else None
+        if line_item:
+            results.append({'status': 'ok', 'id': line_item.get('id'), 'lineItem': line_item})
+        else:
+            results.append({'status': 'failed', 'statusCode': 502, 'error': 'Clover did not return the created line item'})
+    return results
+
+
+def _apply_line_item_operation(order_url, merchant_id, operation):
+    """Apply a single update or delete operation to a line item"""
+    url = f"{order_url}/line_items/{operation['id']}"
+    if operation['op'] == 'update':
+        response = make_clover_request('POST', url, merchant_id, json=operation['lineItem'])
+        if response.status_code in [200, 201]:
+            return {'status': 'ok', 'id': operation['id'], 'lineItem': response.json()}
+    else:
+        response = make_clover_request('DELETE', url, merchant_id)
+        if response.status_code in [200, 204]:
+            return {'status': 'ok', 'id': operation['id']}
+    return _line_item_error(response)
+
+
+@api.route('/<string:order_id>/line_items/batch')
+class OrderLineItemsBatch(Resource):
+    @api.doc('batch_line_items', description=(
+        'Apply many add, update and delete line item operations to one order. '
+        'Adds are sent in a single bulk call; updates and deletes run concurrently, '
+        'so operations must not depend on each other. The final order is fetched once at the end.'
+    ))
+    @api.expect(line_item_batch_model)
+    def post(self, order_id):
+        """Batch line item operations on an order"""
+        try:
+            payload = request.get_json(silent=True) or {}
+            operations = payload.get('operations') if isinstance(payload, dict) else None
+            if not isinstance(operations, list) or not operations:
+                api.abort(400, 'Request body must contain a non-empty "operations" array.')
+
+            errors = []
+            for index, operation in enumerate(operations):
+                op = operation.get('op') if isinstance(operation, dict) else None
+                if op not in ('add', 'update', 'delete'):
+                    errors.append({'index': index, 'message': 'op must be one of add, update, delete'})
+                elif op in ('update', 'delete') and not operation.get('id'):
+                    errors.append({'index': index, 'message': f'{op} requires a line item id'})
+                elif op in ('add', 'update') and not isinstance(operation.get('lineItem'), dict):
+                    errors.append({'index': index, 'message': f'{op} requires a lineItem object'})
+            if errors:
+                api.abort(400, 'Invalid line item operations', errors=errors)
+
+            config = Config()
+            merchant_id = get_merchant_id_or_abort(api)
+            order_url = build_merchant_url(config, merchant_id, f'orders/{order_id}')
+
+            results = [None] * len(operations)
+            adds = [i for i, operation in enumerate(operations) if operation['op'] == 'add']
+            others = [i for i, operation in enumerate(operations) if operation['op'] != 'add']
+
+            def run(index):
+                if index is None:
+                    return _add_line_items(order_url, merchant_id, [operations[i]['lineItem'] for i in adds])
+                return _apply_line_item_operation(order_url, merchant_id, operations[index])
+
+            # The bulk add call runs alongside the individual updates and deletes
+            tasks = ([None] if adds else []) + others
+            for task, result, error in run_bounded(run, tasks):
+                index = tasks[task]
+                if error is not None:
+                    result = {'status': 'failed', 'statusCode': 500, 'error': f"Internal error: {str(error)}"}
+                if index is None:
+                    batch = result if isinstance(result, list) else [result] * len(adds)
+                    for i, add_result in zip(adds, batch):
+                        results[i] = dict(add_result, index=i, op='add')
+                else:
+                    results[index] = dict(result, index=index, op=operations[index]['op'])
+
+            _order_changed(merchant_id, order_id)
+            response = make_clover_request('GET', order_url, merchant_id, params={'expand': 'lineItems'})
+            order = response.json() if response.status_code == 200 else None
+
+            succeeded = sum(1 for r in results if r['status'] == 'ok')
+            return {
+                'total': len(operations),
+                'succeeded': succeeded,
+                'failed': len(operations) - succeeded,
+                'results': results,
+                'order': order
+            }
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+def _strict_mode():
+    return request.args.get('strict', 'false').lower() == 'true'
+
+
+def _validate_cart_or_abort(merchant_id, payload):
+    """Reject a cart that fails local validation against the cached catalog"""
+    errors, pricing = validate_cart(payload, catalog.items.get_all(merchant_id, wait=True))
+    if errors:
+        api.abort(422, 'Cart validation failed', errors=errors, pricing=pricing)
+    return pricing
+
+
+@api.route('/atomic/validate')
+class AtomicOrderValidation(Resource):
+    @api.doc('validate_atomic_order',
+             description='Validate and price an atomic order cart against the cached catalog without creating it')
+    @api.expect(atomic_order_model)
+    def post(self):
+        """Validate an atomic order cart"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            errors, pricing = validate_cart(request.get_json(silent=True), catalog.items.get_all(merchant_id, wait=True))
+            return {'valid': not errors, 'errors': errors, 'pricing': pricing}
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
 @api.route('/atomic')
 class AtomicOrders(Resource):
-    @api.doc('create_atomic_order', description='Create an atomic order')
+    @api.doc('create_atomic_order', description='Create an atomic order', params={
+        'strict': 'Validate and price the cart against the cached catalog before forwarding (true/false)',
+        'queue': 'Accept the order into the local write-behind queue and return 202 with a reference (true/false)'
+    })
     @api.expect(atomic_order_model)
+    @idempotent(api, 'atomic_orders')
     def post(self):
         """Create an atomic order"""
         try:
@@ -397,6 +722,13 @@ class AtomicOrders(Resource):
             merchant_id = config.get_merchant_id()
             if not merchant_id:
                 api.abort(400, MISSING_MID_MSG)
+            if _strict_mode():
+                _validate_cart_or_abort(merchant_id, request.json)
+            if request.args.get('queue', 'false').lower() == 'true':
+                payload = request.get_json(silent=True)
+                if not isinstance(payload, dict):
+                    api.abort(400, 'Invalid JSON body. Ensure Content-Type: application/json and valid JSON payload.')
+                return order_queue.enqueue(merchant_id, payload), 202
 
             url = f"{config.clover_api_url}/{config.CLOVER_API_VERSION}/merchants/{merchant_id}/atomic_order/orders"
 
@@ -412,14 +744,113 @@ class AtomicOrders(Resource):
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
 
+        except HTTPException as http_exc:
+            raise http_exc
         except Exception as e:
             api.abort(500, f"Internal error: {str(e)}")
 
 
+@api.route('/sync')
+class OrdersSync(Resource):
+    @api.doc('sync_orders', description='Pull orders modified since the last sync into the local stores', params={
+        'since': 'Re-sync from this modifiedTime (epoch ms or ISO 8601) instead of the last watermark'
+    })
+    def post(self):
+        """Sync orders into local stores"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            since = parse_time_param(api, 'since', request.args.get('since'))
+            return sync.sync(merchant_id, 'orders', since)
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/archive')
+class ArchivedOrders(Resource):
+    @api.doc('get_archived_orders', description='Query archived orders by createdTime range, newest first, without calling Clover', params={
+        'from': 'Start of the range (epoch ms or ISO 8601, inclusive)',
+        'to': 'End of the range (epoch ms or ISO 8601, exclusive)',
+        'limit': 'Page size (default 100, max 1000)',
+        'offset': 'Number of matching orders to skip'
+    })
+    def get(self):
+        """Query the order archive"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            start = parse_time_param(api, 'from', request.args.get('from'))
+            end = parse_time_param(api, 'to', request.args.get('to'))
+            try:
+                limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+                offset = max(0, int(request.args.get('offset', 0)))
+            except ValueError:
+                api.abort(400, 'limit and offset must be integers')
+            elements, total = order_archive.get_archive(merchant_id).query(start, end, limit, offset)
+            return {'elements': elements, 'total': total}
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/archive/stats')
+class ArchiveStats(Resource):
+    @api.doc('get_archive_stats')
+    def get(self):
+        """Size and coverage of the order archive"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            return order_archive.get_archive(merchant_id).stats()
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/queue')
+class QueuedOrders(Resource):
+    @api.doc('list_queued_orders', description='List atomic orders in the write-behind queue, oldest first', params={
+        'status': 'Filter by status (queued, submitting, created, failed)',
+        'limit': 'Maximum number of entries (default 100)'
+    })
+    def get(self):
+        """List queued atomic orders"""
+        try:
+            try:
+                limit = int(request.args.get('limit', 100))
+            except ValueError:
+                api.abort(400, 'limit must be an integer')
+            return {'elements': order_queue.list_entries(request.args.get('status'), limit)}
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/queue/<string:ref>')
+class QueuedOrder(Resource):
+    @api.doc('get_queued_order', description='Get the status of a queued atomic order by its local reference')
+    def get(self, ref):
+        """Get a queued atomic order"""
+        entry = order_queue.get_entry(ref)
+        if entry is None:
+            api.abort(404, f'Queued order {ref} not found')
+        return entry
+
+
 @api.route('/atomic/checkouts')
 class AtomicCheckouts(Resource):
-    @api.doc('checkout_atomic_order', description='Checkout an atomic order')
+    @api.doc('checkout_atomic_order', description='Checkout an atomic order',
+             params={'strict': 'Validate and price the cart against the cached catalog before forwarding (true/false)'})
     @api.expect(atomic_checkout_model)
+    @idempotent(api, 'atomic_checkouts')
     def post(self):
         """Checkout an atomic order"""
         try:
@@ -427,6 +858,8 @@ class AtomicCheckouts(Resource):
             merchant_id = config.get_merchant_id()
             if not merchant_id:
                 api.abort(400, MISSING_MID_MSG)
+            if _strict_mode():
+                _validate_cart_or_abort(merchant_id, request.json)
 
             url = f"{config.clover_api_url}/{config.CLOVER_API_VERSION}/merchants/{merchant_id}/atomic_order/checkouts"
 
@@ -442,5 +875,216 @@ class AtomicCheckouts(Resource):
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
 
+        except HTTPException as http_exc:
+            raise http_exc
         except Exception as e:
-            api.abort(500, f"Internal error: {str(e)}")
\ No newline at end of file
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+def _create_atomic_order(url, merchant_id, payload):
+    """Submit one atomic order and describe the outcome"""
+    response = make_clover_request('POST', url, merchant_id, json=payload)
+    if response.status_code in [200, 201]:
+        order = response.json()
+        return {'status': 'created', 'id': order.get('id'), 'order': order}
+    return {
+        'status': 'failed',
+        'statusCode': response.status_code,
+        'error': f"Clover API error: {response.text}"
+    }
+
+
+def _run_atomic_orders(url, merchant_id, orders, catalog_items=None):
+    """
+    Create atomic orders concurrently, yielding indexed results as they complete.
+    When catalog_items is given, carts failing local validation are not submitted.
+    """
+    def submit(payload):
+        if catalog_items is not None:
+            errors, _ = validate_cart(payload, catalog_items)
+            if errors:
+                return {'status': 'invalid', 'statusCode': 422, 'errors': errors}
+        return _create_atomic_order(url, merchant_id, payload)
+
+    for index, result, error in run_bounded(submit, orders):
+        if error is not None:
+            result = {'status': 'failed', 'statusCode': 500, 'error': f"Internal error: {str(error)}"}
+        yield dict(result, index=index)
+
+
+@api.route('/atomic/bulk')
+class AtomicOrdersBulk(Resource):
+    @api.doc('create_atomic_orders_bulk',
+             description='Create many atomic orders concurrently within the merchant rate limits',
+             params={
+                 'stream': 'Stream per-order results as NDJSON as they complete (true/false)',
+                 'strict': 'Validate each cart against the cached catalog before submitting (true/false)'
+             })
+    @api.expect(atomic_order_bulk_model)
+    def post(self):
+        """Create atomic orders in bulk"""
+        try:
+            payload = request.get_json(silent=True)
+            orders = payload.get('orders') if isinstance(payload, dict) else payload
+            if not isinstance(orders, list) or not orders:
+                api.abort(400, 'Request body must contain a non-empty "orders" array of atomic orders.')
+
+            config = Config()
+            merchant_id = get_merchant_id_or_abort(api)
+            url = build_merchant_url(config, merchant_id, 'atomic_order/orders')
+
+            catalog_items = catalog.items.get_all(merchant_id, wait=True) if _strict_mode() else None
+            if request.args.get('stream', 'false').lower() == 'true':
+                def generate():
+                    created = 0
+                    for result in _run_atomic_orders(url, merchant_id, orders, catalog_items):
+                        created += result['status'] == 'created'
+                        yield json.dumps(result) + '\n'
+                    yield json.dumps({'summary': {
+                        'total': len(orders),
+                        'created': created,
+                        'failed': len(orders) - created
+                    }}) + '\n'
+
+                return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+            results = sorted(_run_atomic_orders(url, merchant_id, orders, catalog_items), key=lambda r: r['index'])
+            created = sum(1 for r in results if r['status'] == 'created')
+            return {
+                'total': len(orders),
+                'created': created,
+                'failed': len(orders) - created,
+                'results': results
+            }
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+def _apply_bulk_order_action(merchant_id, params, order_id):
+    """Job handler: apply a bulk job's state change or delete to one order"""
+    url = build_merchant_url(Config(), merchant_id, f'orders/{order_id}')
+    if params['action'] == 'delete':
+        response = make_clover_request('DELETE', url, merchant_id)
+        # A resumed job may retry an order whose delete already went through
+        succeeded = response.status_code in [200, 204, 404]
+    else:
+        response = make_clover_request('POST', url, merchant_id, json={'state': params['state']})
+        succeeded = response.status_code == 200
+    _order_changed(merchant_id, order_id, deleted=succeeded and params['action'] == 'delete')
+    if not succeeded:
+        raise RuntimeError(f"Clover API error {response.status_code}: {response.text}")
+    return None
+
+
+jobs.register('orders.bulk', _apply_bulk_order_action)
+
+
+def _select_order_ids(url, merchant_id, filters):
+    """Every order id matching the filters; aborts if there are too many"""
+    selected, _ = fetch_all(url, merchant_id, filters, max_records=Config.BULK_JOB_MAX_ORDERS)
+    if len(selected) > Config.BULK_JOB_MAX_ORDERS:
+        api.abort(400, f'Filter selects more than {Config.BULK_JOB_MAX_ORDERS} orders; narrow it down')
+    return [order['id'] for order in selected]
+
+
+@api.route('/jobs')
+class OrderBulkJobs(Resource):
+    @api.doc('list_order_bulk_jobs', description='List bulk order jobs, most recent first',
+             params={'limit': 'Maximum number of jobs (default 50)'})
+    def get(self):
+        """List bulk order jobs"""
+        try:
+            try:
+                limit = int(request.args.get('limit', 50))
+            except ValueError:
+                api.abort(400, 'limit must be an integer')
+            return {'elements': jobs.list_jobs('orders.bulk', limit)}
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+    @api.doc('create_order_bulk_job',
+             description='Select orders by filter and change their state or delete them in a background job. '
+                         'Orders are selected once, when the job is created, so a resumed job never picks up new ones.')
+    @api.expect(order_bulk_job_model)
+    def post(self):
+        """Start a bulk order job"""
+        try:
+            payload = request.get_json(silent=True) or {}
+            action = payload.get('action')
+            if action not in ('state', 'delete'):
+                api.abort(400, 'action must be "state" or "delete"')
+            if action == 'state' and not payload.get('state'):
+                api.abort(400, 'state is required for the state action')
+
+            filters = payload.get('filter') or []
+            if isinstance(filters, str):
+                filters = [filters]
+            created_before = parse_time_param(api, 'createdBefore',
+                                              None if payload.get('createdBefore') is None
+                                              else str(payload['createdBefore']))
+            if created_before is not None:
+                filters.append(f'createdTime<{created_before}')
+            if not filters:
+                api.abort(400, 'Provide filter and/or createdBefore to select orders')
+
+            merchant_id = get_merchant_id_or_abort(api)
+            url = build_merchant_url(Config(), merchant_id, 'orders')
+            try:
+                order_ids = _select_order_ids(url, merchant_id, filters)
+            except requests.HTTPError as e:
+                api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+
+            if payload.get('dryRun'):
+                return {'selected': len(order_ids), 'orderIds': order_ids}
+
+            params = {'action': action, 'state': payload.get('state'), 'filter': filters}
+            job = jobs.create_job('orders.bulk', merchant_id, params,
+                                  [(order_id, order_id) for order_id in order_ids])
+            return job, 202
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/jobs/<string:job_id>')
+class OrderBulkJob(Resource):
+    @api.doc('get_order_bulk_job', description='Get the progress of a bulk order job and its failed orders')
+    def get(self, job_id):
+        """Get a bulk order job"""
+        job = jobs.get_job(job_id)
+        if job is None or job['kind'] != 'orders.bulk':
+            api.abort(404, f'Job {job_id} not found')
+        job['failures'] = [{'orderId': item['item_key'], 'error': item['error']}
+                           for item in jobs.list_items(job_id, jobs.FAILED)]
+        return job
+
+
+@api.route('/jobs/<string:job_id>/resume')
+class OrderBulkJobResume(Resource):
+    @api.doc('resume_order_bulk_job', description='Resume a cancelled or interrupted bulk order job',
+             params={'retryFailed': 'Also retry orders that failed (true/false)'})
+    def post(self, job_id):
+        """Resume a bulk order job"""
+        job = jobs.get_job(job_id)
+        if job is None or job['kind'] != 'orders.bulk':
+            api.abort(404, f'Job {job_id} not found')
+        return jobs.resume_job(job_id, request.args.get('retryFailed', 'false').lower() == 'true')
+
+
+@api.route('/jobs/<string:job_id>/cancel')
+class OrderBulkJobCancel(Resource):
+    @api.doc('cancel_order_bulk_job', description='Stop a bulk order job once the orders in flight finish')
+    def post(self, job_id):
+        """Cancel a bulk order job"""
+        job = jobs.get_job(job_id)
+        if job is None or job['kind'] != 'orders.bulk':
+            api.abort(404, f'Job {job_id} not found')
+        return jobs.cancel_job(job_id)
@@ -1,12 +1,18 @@
+import time
 import requests
 from flask import request
 from flask_restx import Namespace, Resource, fields
 from app.config import Config
 from werkzeug.exceptions import HTTPException
-from app.api_utils import make_clover_request, get_merchant_id_or_abort, build_merchant_url
+from app.api_utils import get_merchant_id_or_abort, parse_time_param, idempotent
+from app.pagination import fetch_cursor_page
+from app import auth_tracker, local_mirror, order_payments, payment_rollups, reconciliation, sync
 
 MISSING_MID_MSG = "Merchant ID not set. Complete OAuth flow or set CLOVER_MERCHANT_ID in .env"
 
+# Most order ids accepted by one batched payments lookup
+MAX_BATCH_ORDER_IDS = 100
+
 api = Namespace('payments', description='Clover Payments API operations')
 
 # Define models for Swagger documentation
@@ -89,7 +95,10 @@ authorization_update_model = api.model('AuthorizationUpdate', {
 
 @api.route('/')
 class Payments(Resource):
-    @api.doc('get_payments', description='Get all payments')
+    @api.doc('get_payments', description='Get all payments', params={
+        'cursor': 'Opaque cursor from a previous page (pass empty for the first page) to use keyset pagination instead of offset',
+        'local': 'Set to false to always send filtered reads to Clover instead of the synced local mirror'
+    })
     def get(self):
         """Get all payments"""
         try:
@@ -102,16 +111,36 @@ class Payments(Resource):
             # Get query parameters
             limit = request.args.get('limit', 100)
             offset = request.args.get('offset', 0)
-            filter_param = request.args.get('filter', None)
             expand = request.args.get('expand', None)
 
+            filters = request.args.getlist('filter')
+            if filters and 'cursor' not in request.args and request.args.get('local') != 'false':
+                local = local_mirror.query(merchant_id, 'payments', filters, limit, offset, expand)
+                if local is not None:
+                    return local, 200, {'X-Data-Source': 'local'}
+
+            if 'cursor' in request.args:
+                try:
+                    return fetch_cursor_page(
+                        url,
+                        merchant_id,
+                        request.args.get('cursor', ''),
+                        limit,
+                        filters=filters,
+                        expand=expand
+                    )
+                except ValueError as e:
+                    api.abort(400, str(e))
+                except requests.HTTPError as e:
+                    api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+
             params = {
                 'limit': limit,
                 'offset': offset
             }
 
-            if filter_param:
-                params['filter'] = filter_param
+            if filters:
+                params['filter'] = filters
             if expand:
                 params['expand'] = expand
 
@@ -170,6 +199,30 @@ class Payment(Resource):
 
 # Removed refunds collection endpoint (unnecessary for this scope)
 
+@api.route('/orders/batch')
+class OrderPaymentsBatch(Resource):
+    @api.doc('get_orders_payments_batch', description='Get the payments of several orders in one call, '
+                                                      'as a map of order id to payments', params={
+        'ids': f'Comma-separated order ids (may be repeated; duplicates are ignored; at most {MAX_BATCH_ORDER_IDS})'
+    })
+    def get(self):
+        """Get payments for several orders"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            order_ids = [order_id.strip() for value in request.args.getlist('ids')
+                         for order_id in value.split(',') if order_id.strip()]
+            order_ids = list(dict.fromkeys(order_ids))
+            if not order_ids:
+                api.abort(400, 'ids is required')
+            if len(order_ids) > MAX_BATCH_ORDER_IDS:
+                api.abort(400, f'At most {MAX_BATCH_ORDER_IDS} order ids per request')
+            return order_payments.lookup(merchant_id, order_ids)
+
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
 @api.route('/orders/<string:order_id>/payments')
 class OrderPayments(Resource):
     @api.doc('get_order_payments', description='Get all payments for an order')
@@ -198,6 +251,81 @@ class OrderPayments(Resource):
         except Exception as e:
             api.abort(500, f"Internal error: {str(e)}")
 
+@api.route('/summary')
+class PaymentSummary(Resource):
+    @api.doc('get_payment_summary', description='Payment count, amount, tip and cashback totals by result and card type, '
+                                                'from rollups of synced payments, or from Clover for ranges starting '
+                                                'before syncedFrom', params={
+        'from': 'Start of the createdTime range (epoch ms or ISO 8601, inclusive, rounded down to the hour; '
+                'default start of the current UTC day)',
+        'to': 'End of the range (epoch ms or ISO 8601, exclusive, rounded down to the hour; '
+              'default end of the current hour)'
+    })
+    def get(self):
+        """Summarize synced payments"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            now = int(time.time() * 1000)
+            end = parse_time_param(api, 'to', request.args.get('to'))
+            if end is None:
+                # Through the end of the current hour
+                end = now - now % 3600000 + 3600000
+            start = parse_time_param(api, 'from', request.args.get('from'))
+            if start is None:
+                start = now - now % 86400000
+            if start >= end:
+                api.abort(400, 'from must be before to')
+            if payment_rollups.covers(merchant_id, start):
+                summary = payment_rollups.get_rollups(merchant_id).summary(start, end)
+                source = 'local'
+            else:
+                summary = payment_rollups.summary_from_clover(merchant_id, start, end)
+                source = 'clover'
+            coverage = sync.get_coverage(merchant_id, 'payments')
+            summary['syncedFrom'] = coverage['syncedFrom'] if coverage else None
+            summary['syncedThrough'] = sync.get_watermark(merchant_id, 'payments')
+            return summary, 200, {'X-Data-Source': source}
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
+@api.route('/reconciliation')
+class PaymentReconciliation(Resource):
+    @api.doc('reconcile_payments', description='Join the orders and payments of a time range locally and report '
+                                               'unpaid, underpaid and overpaid orders and orphan payments', params={
+        'from': 'Start of the order createdTime range (epoch ms or ISO 8601, inclusive; default 24 hours before to)',
+        'to': 'End of the range (epoch ms or ISO 8601, exclusive; default now)',
+        'graceHours': 'Also count payments created up to this many hours after the range (default RECONCILIATION_GRACE_HOURS)'
+    })
+    def get(self):
+        """Reconcile payments against orders"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            end = parse_time_param(api, 'to', request.args.get('to'))
+            if end is None:
+                end = int(time.time() * 1000)
+            start = parse_time_param(api, 'from', request.args.get('from'))
+            if start is None:
+                start = end - 86400000
+            if start >= end:
+                api.abort(400, 'from must be before to')
+            try:
+                grace_hours = float(request.args.get('graceHours', Config.RECONCILIATION_GRACE_HOURS))
+            except ValueError:
+                api.abort(400, 'graceHours must be a number')
+            return reconciliation.reconcile(merchant_id, start, end, int(grace_hours * 3600000))
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
 @api.route('/authorizations')
 class Authorizations(Resource):
     @api.doc('get_authorizations', description='Get all authorizations')
@@ -228,6 +356,7 @@ class Authorizations(Resource):
 
     @api.doc('create_authorization', description='Create an authorization on a Payment')
     @api.expect(authorization_create_model)
+    @idempotent(api, 'authorizations')
     def post(self):
         """Create an authorization on a Payment"""
         try:
@@ -248,7 +377,9 @@ class Authorizations(Resource):
             )
 
             if response.status_code in [200, 201]:
-                return response.json()
+                authorization = response.json()
+                auth_tracker.get_tracker(merchant_id).track(authorization)
+                return authorization
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
 
@@ -257,6 +388,40 @@ class Authorizations(Resource):
         except Exception as e:
             api.abort(500, f"Internal error: {str(e)}")
 
+@api.route('/authorizations/due')
+class AuthorizationsDue(Resource):
+    @api.doc('get_due_authorizations', description='Open tab authorizations that are close to expiry and need closing, '
+                                                   'soonest first, from the local authorization tracker', params={
+        'withinMinutes': 'List authorizations expiring within this many minutes (default AUTHORIZATION_DUE_WINDOW_MINUTES)',
+        'reseed': 'Reload every authorization from Clover before answering (true/false)'
+    })
+    def get(self):
+        """List authorizations due for closing"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            try:
+                within = float(request.args.get('withinMinutes', Config.AUTHORIZATION_DUE_WINDOW_MINUTES))
+            except ValueError:
+                api.abort(400, 'withinMinutes must be a number')
+
+            tracker = auth_tracker.get_tracker(merchant_id)
+            upstream_requests = 0
+            if not tracker.seeded or request.args.get('reseed', 'false').lower() == 'true':
+                upstream_requests += tracker.seed()
+            upstream_requests += tracker.refresh_due()
+            return {
+                'elements': tracker.due(within),
+                'tracked': len(tracker),
+                'upstreamRequests': upstream_requests
+            }
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
+
 @api.route('/authorizations/<string:authorization_id>')
 class Authorization(Resource):
     @api.doc('get_authorization', description='Get a single authorization by ID')
@@ -307,7 +472,9 @@ class Authorization(Resource):
             )
 
             if response.status_code in [200, 201]:
-                return response.json()
+                authorization = response.json()
+                auth_tracker.get_tracker(merchant_id).track(authorization)
+                return authorization
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
 
@@ -333,6 +500,7 @@ class Authorization(Resource):
             )
 
             if response.status_code in [200, 204]:
+                auth_tracker.get_tracker(merchant_id).forget(authorization_id)
                 return {'message': f'Authorization {authorization_id} deleted successfully'}
             else:
                 api.abort(response.status_code, f"Clover API error: {response.text}")
@@ -340,4 +508,24 @@ class Authorization(Resource):
         except HTTPException as http_exc:
             raise http_exc
         except Exception as e:
-            api.abort(500, f"Internal error: {str(e)}")
\ No newline at end of file
+            api.abort(500, f"Internal error: {str(e)}")
+
+
+@api.route('/sync')
+class PaymentsSync(Resource):
+    @api.doc('sync_payments', description='Pull payments modified since the last sync into the local stores', params={
+        'since': 'Re-sync from this modifiedTime (epoch ms or ISO 8601) instead of the last watermark'
+    })
+    def post(self):
+        """Sync payments into local stores"""
+        try:
+            merchant_id = get_merchant_id_or_abort(api)
+            since = parse_time_param(api, 'since', request.args.get('since'))
+            return sync.sync(merchant_id, 'payments', since)
+
+        except requests.HTTPError as e:
+            api.abort(e.response.status_code, f"Clover API error: {e.response.text}")
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            api.abort(500, f"Internal error: {str(e)}")
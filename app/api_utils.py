@@ -1,8 +1,34 @@
 """Utility functions for API requests with automatic token refresh"""
 
+import functools
+import hashlib
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, Any
 from app.config import Config
+from app.concurrency import get_rate_limiter
+
+# Shared session so concurrent and repeated calls reuse pooled connections
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+
+def _send(method: str, url: str, merchant_id: str, headers: Dict[str, str], **kwargs) -> requests.Response:
+    """Send a single request under the merchant's rate limit, backing off on 429"""
+    limiter = get_rate_limiter(merchant_id)
+    attempts = 0
+    while True:
+        with limiter:
+            response = _SESSION.request(method, url, headers=headers, **kwargs)
+        if response.status_code != 429 or attempts >= Config.CLOVER_MAX_RETRIES_ON_429:
+            return response
+        attempts += 1
+        try:
+            delay = float(response.headers.get('Retry-After', 1))
+        except ValueError:
+            delay = 1.0
+        time.sleep(min(delay, 10))
 
 
 def make_clover_request(method: str, url: str, merchant_id: str, **kwargs) -> requests.Response:
@@ -30,7 +56,7 @@ def make_clover_request(method: str, url: str, merchant_id: str, **kwargs) -> re
         headers.update(kwargs.pop('headers'))
 
     # Make initial request
-    response = requests.request(method, url, headers=headers, **kwargs)
+    response = _send(method, url, merchant_id, headers, **kwargs)
 
     # If we get a 401 (Unauthorized), try to refresh token and retry once
     if response.status_code == 401:
@@ -41,7 +67,7 @@ def make_clover_request(method: str, url: str, merchant_id: str, **kwargs) -> re
                 headers = config.get_headers()
                 if 'headers' in kwargs:
                     headers.update(kwargs.get('headers', {}))
-                response = requests.request(method, url, headers=headers, **kwargs)
+                response = _send(method, url, merchant_id, headers, **kwargs)
         except Exception as e:
             # If refresh fails, return original response
             print(f"Token refresh attempt failed: {str(e)}")
@@ -62,3 +88,98 @@ def get_merchant_id_or_abort(api) -> str:
 def build_merchant_url(config: Config, merchant_id: str, endpoint: str = "") -> str:
     """Build full URL for merchant API endpoint"""
     return f"{config.clover_api_url}/{config.CLOVER_API_VERSION}/merchants/{merchant_id}/{endpoint}".rstrip('/')
+
+
+def parse_time_param(api, name: str, value: Optional[str]) -> Optional[int]:
+    """
+    Parse a time query parameter given either as epoch milliseconds or as an
+    ISO 8601 date/datetime (UTC unless an offset is included). Aborts with 400
+    if the value cannot be parsed.
+    """
+    if value is None or value == '':
+        return None
+    if value.lstrip('-').isdigit():
+        return int(value)
+    from datetime import datetime, timezone
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        api.abort(400, f"Invalid {name}: use epoch milliseconds or an ISO 8601 date")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+# Client errors that say nothing final about the request (timeout, conflict,
+# rate limit, expired token), so the key is released for a retry like 5xx
+_TRANSIENT_STATUSES = (401, 408, 409, 429)
+
+
+def _is_final(status_code: int) -> bool:
+    return status_code < 500 and status_code not in _TRANSIENT_STATUSES
+
+
+def idempotent(api, scope: str):
+    """
+    Decorate a Resource method so repeated requests carrying the same
+    Idempotency-Key header replay the first response instead of calling Clover.
+
+    Successful responses and client errors are stored for IDEMPOTENCY_TTL_SECONDS;
+    server errors and transient client errors (401, 408, 409, 429) release the
+    key so the client can retry. Concurrent duplicates
+    wait for the first call to finish.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            from flask import request
+            from werkzeug.exceptions import HTTPException
+            from app import idempotency_store
+
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return func(*args, **kwargs)
+
+            key_scope = f"{scope}:{Config.get_merchant_id() or 'unknown'}"
+            request_hash = hashlib.sha256(
+                request.path.encode('utf-8') + b'\n' + request.get_data()
+            ).hexdigest()
+
+            state, stored = idempotency_store.begin(key_scope, key, request_hash)
+            if state == idempotency_store.IN_FLIGHT:
+                state, stored = idempotency_store.wait(
+                    key_scope, key, request_hash, Config.IDEMPOTENCY_WAIT_SECONDS)
+            if state == idempotency_store.MISMATCH:
+                api.abort(422, 'Idempotency-Key was already used with a different request')
+            if state == idempotency_store.IN_FLIGHT:
+                api.abort(409, 'A request with this Idempotency-Key is still in progress')
+            if state == idempotency_store.DONE:
+                body, status_code = stored
+                return body, status_code, {'Idempotent-Replayed': 'true'}
+
+            try:
+                result = func(*args, **kwargs)
+            except HTTPException as http_exc:
+                if http_exc.code is not None and _is_final(http_exc.code):
+                    body = getattr(http_exc, 'data', None) or {'message': http_exc.description}
+                    idempotency_store.complete(key_scope, key, body, http_exc.code)
+                else:
+                    idempotency_store.release(key_scope, key)
+                raise
+            except Exception:
+                idempotency_store.release(key_scope, key)
+                raise
+
+            body, status_code = (result[0], result[1]) if isinstance(result, tuple) else (result, 200)
+            if _is_final(status_code):
+                idempotency_store.complete(key_scope, key, body, status_code)
+            else:
+                idempotency_store.release(key_scope, key)
+            return result
+
+        return api.doc(params={'Idempotency-Key': {
+            'in': 'header',
+            'description': 'Unique key for safely retrying this request; duplicates replay the first response'
+        }})(wrapper)
+
+    return decorator
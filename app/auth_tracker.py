@@ -0,0 +1,173 @@
+"""Tracker of open tab authorizations ordered by expiry.
+
+Authorizations created or updated through this service (and, on first use,
+everything Clover lists) are kept in a local index. A heap schedules each one
+for its next decision point: the moment it enters the due window before its
+expiry, and then a recheck every AUTHORIZATION_RECHECK_MINUTES until it is
+closed. Only authorizations whose decision point has passed are re-read from
+Clover, so asking which tabs need closing costs a handful of requests instead
+of listing every authorization.
+
+An authorization counts as closed once Clover no longer returns it or its
+payment has moved past the AUTH (pre-authorized) result.
+"""
+
+import heapq
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.api_utils import make_clover_request, build_merchant_url
+from app.concurrency import run_bounded
+from app.config import Config
+
+# Payment results of an authorization that has not been captured or voided yet
+OPEN_RESULTS = (None, 'AUTH')
+
+# Clover caps list requests at 1000 elements
+_PAGE_SIZE = 1000
+
+
+def _minutes(value: float) -> int:
+    return int(value * 60000)
+
+
+class AuthorizationTracker:
+    """Open authorizations of one merchant and their decision-point heap"""
+
+    def __init__(self, merchant_id: str):
+        self.merchant_id = merchant_id
+        self._lock = threading.Lock()
+        self._auths: Dict[str, Dict[str, Any]] = {}
+        # (check at ms, authorization id, version); stale versions are skipped when popped
+        self._heap: List[Tuple[int, str, int]] = []
+        self._versions: Dict[str, int] = {}
+        self.seeded = False
+
+    @staticmethod
+    def _is_open(authorization: Dict[str, Any]) -> bool:
+        return (authorization.get('payment') or {}).get('result') in OPEN_RESULTS
+
+    def _expires_at(self, authorization: Dict[str, Any]) -> int:
+        created = (authorization.get('createdTime')
+                   or (authorization.get('payment') or {}).get('createdTime')
+                   or int(time.time() * 1000))
+        return created + int(Config.AUTHORIZATION_TTL_HOURS * 3600000)
+
+    def _schedule(self, auth_id: str, at: int) -> None:
+        version = self._versions.get(auth_id, 0) + 1
+        self._versions[auth_id] = version
+        heapq.heappush(self._heap, (at, auth_id, version))
+
+    def _next_check(self, expires_at: int, now: int) -> int:
+        due_at = expires_at - _minutes(Config.AUTHORIZATION_DUE_WINDOW_MINUTES)
+        return due_at if now < due_at else now + _minutes(Config.AUTHORIZATION_RECHECK_MINUTES)
+
+    def track(self, authorization: Dict[str, Any], now: Optional[int] = None) -> None:
+        """Add or update an authorization; closed ones are dropped"""
+        auth_id = authorization.get('id')
+        if not auth_id:
+            return
+        now = now or int(time.time() * 1000)
+        with self._lock:
+            if not self._is_open(authorization):
+                self._drop(auth_id)
+                return
+            previous = self._auths.get(auth_id)
+            entry = dict(authorization)
+            entry['expiresAt'] = previous['expiresAt'] if previous else self._expires_at(authorization)
+            entry['lastCheckedAt'] = now
+            self._auths[auth_id] = entry
+            self._schedule(auth_id, self._next_check(entry['expiresAt'], now))
+
+    def _drop(self, auth_id: str) -> None:
+        self._auths.pop(auth_id, None)
+        # Bumping the version orphans any heap entry for it
+        self._versions[auth_id] = self._versions.get(auth_id, 0) + 1
+
+    def forget(self, auth_id: str) -> None:
+        with self._lock:
+            self._drop(auth_id)
+
+    def _pop_due(self, now: int) -> List[str]:
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, auth_id, version = heapq.heappop(self._heap)
+                if self._versions.get(auth_id) == version and auth_id in self._auths:
+                    due.append(auth_id)
+        return due
+
+    def seed(self) -> int:
+        """Load every authorization Clover lists; returns the number of Clover requests"""
+        url = build_merchant_url(Config(), self.merchant_id, 'authorizations')
+        now = int(time.time() * 1000)
+        offset = requests_made = 0
+        while True:
+            response = make_clover_request('GET', url, self.merchant_id, params={
+                'expand': 'payment', 'limit': _PAGE_SIZE, 'offset': offset})
+            response.raise_for_status()
+            requests_made += 1
+            elements = response.json().get('elements', [])
+            for authorization in elements:
+                self.track(authorization, now)
+            if len(elements) < _PAGE_SIZE:
+                break
+            offset += len(elements)
+        self.seeded = True
+        return requests_made
+
+    def refresh_due(self) -> int:
+        """Re-read authorizations whose decision point has passed; returns the number of Clover requests"""
+        now = int(time.time() * 1000)
+        due = self._pop_due(now)
+        config = Config()
+
+        def fetch(auth_id):
+            url = build_merchant_url(config, self.merchant_id, f'authorizations/{auth_id}')
+            return make_clover_request('GET', url, self.merchant_id, params={'expand': 'payment'})
+
+        for index, response, error in run_bounded(fetch, due):
+            auth_id = due[index]
+            if error is None and response.status_code == 404:
+                self.forget(auth_id)
+            elif error is None and response.status_code == 200:
+                self.track(response.json(), now)
+            else:
+                # Keep it and try again at the next recheck
+                with self._lock:
+                    if auth_id in self._auths:
+                        self._schedule(auth_id, now + _minutes(Config.AUTHORIZATION_RECHECK_MINUTES))
+        return len(due)
+
+    def due(self, within_minutes: float) -> List[Dict[str, Any]]:
+        """Open authorizations expiring within the given number of minutes, soonest first"""
+        now = int(time.time() * 1000)
+        horizon = now + _minutes(within_minutes)
+        with self._lock:
+            entries = sorted((a for a in self._auths.values() if a['expiresAt'] <= horizon),
+                             key=lambda a: a['expiresAt'])
+        return [{
+            'id': a['id'],
+            'tabName': a.get('tabName'),
+            'amount': a.get('amount'),
+            'paymentId': (a.get('payment') or {}).get('id'),
+            'expiresAt': a['expiresAt'],
+            'expired': a['expiresAt'] <= now,
+            'lastCheckedAt': a['lastCheckedAt'],
+        } for a in entries]
+
+    def __len__(self) -> int:
+        return len(self._auths)
+
+
+_LOCK = threading.Lock()
+_TRACKERS: Dict[str, AuthorizationTracker] = {}
+
+
+def get_tracker(merchant_id: str) -> AuthorizationTracker:
+    with _LOCK:
+        tracker = _TRACKERS.get(merchant_id)
+        if tracker is None:
+            tracker = _TRACKERS[merchant_id] = AuthorizationTracker(merchant_id)
+        return tracker
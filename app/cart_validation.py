@@ -0,0 +1,94 @@
+"""Local validation and pricing of atomic order carts against the cached catalog.
+
+Catches unknown items, price mismatches and bad quantities before a cart is
+forwarded to Clover, and computes the totals Clover is expected to charge.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+
+def validate_cart(payload: Any, catalog_items: Dict[str, Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Validate an atomic order or checkout payload and price its line items.
+
+    Args:
+        payload: Request body with an orderCart
+        catalog_items: Inventory items keyed by item id
+
+    Returns:
+        (errors, pricing). errors is a list of {'field', 'message'} dicts and
+        is empty for a valid cart.
+    """
+    errors: List[Dict[str, Any]] = []
+    pricing: Dict[str, Any] = {'lineItems': [], 'subtotal': 0}
+
+    cart = payload.get('orderCart') if isinstance(payload, dict) else None
+    if not isinstance(cart, dict):
+        errors.append({'field': 'orderCart', 'message': 'orderCart object is required'})
+        return errors, pricing
+
+    pricing['currency'] = cart.get('currency')
+    line_items = cart.get('lineItems')
+    if not isinstance(line_items, list) or not line_items:
+        errors.append({'field': 'orderCart.lineItems', 'message': 'At least one line item is required'})
+        return errors, pricing
+
+    for index, line_item in enumerate(line_items):
+        field = f'orderCart.lineItems[{index}]'
+        if not isinstance(line_item, dict):
+            errors.append({'field': field, 'message': 'Line item must be an object'})
+            continue
+
+        quantity = line_item.get('unitQty', 1)
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+            errors.append({'field': f'{field}.unitQty', 'message': f'unitQty must be a positive integer, got {quantity!r}'})
+            continue
+
+        price = line_item.get('price')
+        if price is not None and (isinstance(price, bool) or not isinstance(price, int) or price < 0):
+            errors.append({'field': f'{field}.price', 'message': f'price must be a non-negative integer in cents, got {price!r}'})
+            continue
+
+        item_ref = line_item.get('item') or {}
+        item_id = item_ref.get('id') if isinstance(item_ref, dict) else None
+        if not item_id:
+            # Custom (non-inventory) line items must carry their own name and price
+            if price is None or not line_item.get('name'):
+                errors.append({'field': field, 'message': 'Line items without item.id require name and price'})
+                continue
+            unit_price = price
+        else:
+            item = catalog_items.get(item_id)
+            if item is None:
+                errors.append({'field': f'{field}.item.id', 'message': f'Unknown item {item_id}'})
+                continue
+            if item.get('available') is False:
+                errors.append({'field': f'{field}.item.id', 'message': f'Item {item_id} is not available'})
+                continue
+
+            catalog_price = item.get('price')
+            if item.get('priceType') == 'VARIABLE':
+                if price is None:
+                    errors.append({'field': f'{field}.price', 'message': f'Item {item_id} has variable pricing; price is required'})
+                    continue
+                unit_price = price
+            else:
+                if price is not None and catalog_price is not None and price != catalog_price:
+                    errors.append({
+                        'field': f'{field}.price',
+                        'message': f'Price {price} does not match catalog price {catalog_price} for item {item_id}'
+                    })
+                    continue
+                unit_price = catalog_price if catalog_price is not None else (price or 0)
+
+        line_total = unit_price * quantity
+        pricing['lineItems'].append({
+            'index': index,
+            'itemId': item_id,
+            'unitPrice': unit_price,
+            'unitQty': quantity,
+            'total': line_total
+        })
+        pricing['subtotal'] += line_total
+
+    return errors, pricing
@@ -0,0 +1,195 @@
+"""Cached copy of the merchant's Clover inventory catalog.
+
+Hot paths (cart validation, menus, lookups) read inventory records from this
+in-process cache instead of paging through Clover on every request. Each
+collection is loaded in full on first use and reloaded once its TTL expires.
+
+Collections created with ``background=True`` keep serving the expired copy
+while a background thread reloads it, so only the very first read waits on
+Clover. Reads that must not act on a stale copy, such as strict cart
+validation, pass ``wait=True`` to reload an expired collection synchronously.
+With CATALOG_REFRESH_INTERVAL_SECONDS set, every collection is also reloaded
+periodically so reads stay fresh without anyone waiting.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from app.config import Config
+from app.api_utils import make_clover_request, build_merchant_url
+
+# Clover caps list requests at 1000 elements
+_PAGE_SIZE = 1000
+
+_LOCK = threading.Lock()
+_CACHES: List['CatalogCache'] = []
+_background: Optional[threading.Thread] = None
+
+
+class CatalogCache:
+    """TTL cache of one Clover inventory collection, keyed by merchant and record id"""
+
+    def __init__(self, endpoint: str, expand: Optional[str] = None, ttl: Optional[int] = None,
+                 background: bool = False):
+        self.endpoint = endpoint
+        self.expand = expand
+        self.ttl = ttl if ttl is not None else Config.CATALOG_TTL_SECONDS
+        self.background = background
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._refreshing: Set[str] = set()
+        _CACHES.append(self)
+
+    def _fetch(self, merchant_id: str) -> Dict[str, Dict[str, Any]]:
+        config = Config()
+        url = build_merchant_url(config, merchant_id, self.endpoint)
+        records: Dict[str, Dict[str, Any]] = {}
+        offset = 0
+        while True:
+            params: Dict[str, Any] = {'limit': _PAGE_SIZE, 'offset': offset}
+            if self.expand:
+                params['expand'] = self.expand
+            response = make_clover_request('GET', url, merchant_id, params=params)
+            response.raise_for_status()
+            elements = response.json().get('elements', [])
+            for record in elements:
+                records[record['id']] = record
+            if len(elements) < _PAGE_SIZE:
+                return records
+            offset += _PAGE_SIZE
+
+    def is_fresh(self, merchant_id: str) -> bool:
+        loaded_at = self._loaded_at.get(merchant_id)
+        return loaded_at is not None and time.time() - loaded_at < self.ttl
+
+    def refresh(self, merchant_id: str) -> Dict[str, Dict[str, Any]]:
+        """Reload the collection from Clover"""
+        records = self._fetch(merchant_id)
+        with self._lock:
+            self._records[merchant_id] = records
+            self._loaded_at[merchant_id] = time.time()
+        return records
+
+    def age(self, merchant_id: str) -> Optional[float]:
+        """Seconds since the collection was loaded, or None if it is not loaded"""
+        loaded_at = self._loaded_at.get(merchant_id)
+        return None if loaded_at is None else time.time() - loaded_at
+
+    def _refresh_in_background(self, merchant_id: str) -> None:
+        with self._lock:
+            if merchant_id in self._refreshing:
+                return
+            self._refreshing.add(merchant_id)
+
+        def run():
+            try:
+                self.refresh(merchant_id)
+            except Exception as e:
+                print(f"Background refresh of {self.endpoint} failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(merchant_id)
+
+        threading.Thread(target=run, name=f'catalog-{self.endpoint}', daemon=True).start()
+
+    def get_all(self, merchant_id: str, wait: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Get every record by id, loading or reloading from Clover if stale.
+        With wait=True an expired copy is reloaded before returning even if
+        the collection refreshes in the background.
+        """
+        # A concurrent invalidate may drop the records at any point, so read them
+        # once with .get() and reload when they are missing
+        records = self._records.get(merchant_id)
+        if records is not None and self.is_fresh(merchant_id):
+            return records
+        if self.background and not wait and records is not None:
+            self._refresh_in_background(merchant_id)
+            return records
+        with self._lock:
+            # Another thread may have loaded it while we waited
+            records = self._records.get(merchant_id)
+            if records is not None and self.is_fresh(merchant_id):
+                return records
+            records = self._fetch(merchant_id)
+            self._records[merchant_id] = records
+            self._loaded_at[merchant_id] = time.time()
+            return records
+
+    def get(self, merchant_id: str, record_id: str) -> Optional[Dict[str, Any]]:
+        return self.get_all(merchant_id).get(record_id)
+
+    def put(self, merchant_id: str, records: List[Dict[str, Any]]) -> None:
+        """
+        Write records changed through this service into a loaded collection.
+        Fields missing from a record (such as expansions Clover does not echo
+        on updates) keep their cached values.
+        """
+        with self._lock:
+            current = self._records.get(merchant_id)
+            if current is None:
+                return
+            # Copy rather than mutate, so readers iterating the old dict are unaffected
+            updated = dict(current)
+            for record in records:
+                updated[record['id']] = dict(current.get(record['id']) or {}, **record)
+            self._records[merchant_id] = updated
+
+    def invalidate(self, merchant_id: Optional[str] = None) -> None:
+        """Drop cached records so the next read reloads them"""
+        with self._lock:
+            if merchant_id is None:
+                self._records.clear()
+                self._loaded_at.clear()
+            else:
+                self._records.pop(merchant_id, None)
+                self._loaded_at.pop(merchant_id, None)
+
+
+# Lookups and menus must not wait on a reload of a large item catalog
+items = CatalogCache('items', expand='categories,modifierGroups', background=True)
+categories = CatalogCache('categories', background=True)
+modifier_groups = CatalogCache('modifier_groups', expand='modifiers', background=True)
+tax_rates = CatalogCache('tax_rates', background=True)
+
+
+def changed_ids(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> Set[str]:
+    """Ids added, removed or modified between two copies of a collection"""
+    changed = set(old) ^ set(new)
+    for record_id, record in new.items():
+        previous = old.get(record_id)
+        if previous is not None and previous is not record and previous != record:
+            changed.add(record_id)
+    return changed
+
+
+def collections() -> Dict[str, CatalogCache]:
+    """Every catalog collection by its Clover endpoint"""
+    return {cache.endpoint: cache for cache in _CACHES}
+
+
+def _refresh_periodically() -> None:
+    while True:
+        time.sleep(Config.CATALOG_REFRESH_INTERVAL_SECONDS)
+        merchant_id = Config.get_merchant_id()
+        if not merchant_id:
+            continue
+        for cache in _CACHES:
+            try:
+                cache.refresh(merchant_id)
+            except Exception as e:
+                print(f"Background refresh of {cache.endpoint} failed: {str(e)}")
+
+
+def start_background_refresh() -> None:
+    """Start periodic reloading of every catalog collection, if enabled"""
+    global _background
+    if Config.CATALOG_REFRESH_INTERVAL_SECONDS <= 0:
+        return
+    with _LOCK:
+        if _background is not None and _background.is_alive():
+            return
+        _background = threading.Thread(target=_refresh_periodically, name='catalog-refresh', daemon=True)
+        _background.start()
@@ -0,0 +1,88 @@
+"""Bounded concurrency and per-merchant rate limiting for Clover API calls.
+
+Clover limits both the number of requests per second and the number of
+requests in flight for each access token. Every call made through
+make_clover_request goes through the merchant's RateLimiter, so bulk endpoints
+can fan work out with run_bounded and stay inside those limits.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from app.config import Config
+
+_LOCK = threading.Lock()
+_LIMITERS: Dict[str, 'RateLimiter'] = {}
+
+
+class RateLimiter:
+    """Token bucket (requests per second) combined with a concurrency cap"""
+
+    def __init__(self, requests_per_second: float, max_concurrent: int):
+        self.rate = float(requests_per_second)
+        self.capacity = max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, int(max_concurrent)))
+
+    def _take_token(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def __enter__(self):
+        self._slots.acquire()
+        try:
+            self._take_token()
+        except BaseException:
+            self._slots.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._slots.release()
+        return False
+
+
+def get_rate_limiter(merchant_id: Optional[str]) -> RateLimiter:
+    """Get the shared rate limiter for a merchant"""
+    key = merchant_id or 'default'
+    with _LOCK:
+        limiter = _LIMITERS.get(key)
+        if limiter is None:
+            limiter = RateLimiter(Config.CLOVER_MAX_REQUESTS_PER_SECOND,
+                                  Config.CLOVER_MAX_CONCURRENT_REQUESTS)
+            _LIMITERS[key] = limiter
+        return limiter
+
+
+def run_bounded(func: Callable[[Any], Any], items: Iterable[Any],
+                max_workers: Optional[int] = None) -> Iterator[Tuple[int, Any, Optional[Exception]]]:
+    """
+    Run func over items on a bounded thread pool.
+
+    Yields (index, result, error) tuples in completion order; exactly one of
+    result and error is set for each item.
+    """
+    items = list(items)
+    if not items:
+        return
+    workers = max(1, min(max_workers or Config.CLOVER_MAX_CONCURRENT_REQUESTS, len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(func, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                yield index, future.result(), None
+            except Exception as e:
+                yield index, None, e
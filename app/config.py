@@ -20,6 +20,62 @@ class Config:
     # Use sandbox by default for testing
     USE_SANDBOX = os.environ.get('USE_SANDBOX', 'True').lower() == 'true'
 
+    # Clover rate limits applied per merchant token
+    CLOVER_MAX_REQUESTS_PER_SECOND = float(os.environ.get('CLOVER_MAX_REQUESTS_PER_SECOND', '16'))
+    CLOVER_MAX_CONCURRENT_REQUESTS = int(os.environ.get('CLOVER_MAX_CONCURRENT_REQUESTS', '5'))
+    CLOVER_MAX_RETRIES_ON_429 = int(os.environ.get('CLOVER_MAX_RETRIES_ON_429', '2'))
+
+    # Seconds the cached inventory catalog is served before reloading
+    CATALOG_TTL_SECONDS = int(os.environ.get('CATALOG_TTL_SECONDS', '300'))
+    # Reload every catalog collection this often in the background (0 disables)
+    CATALOG_REFRESH_INTERVAL_SECONDS = int(os.environ.get('CATALOG_REFRESH_INTERVAL_SECONDS', '0'))
+
+    # Idempotency-Key retention and how long duplicates wait on an in-flight call
+    IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400'))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '35'))
+    IDEMPOTENCY_IN_FLIGHT_TIMEOUT = int(os.environ.get('IDEMPOTENCY_IN_FLIGHT_TIMEOUT', '120'))
+
+    # Write-behind queue for atomic orders accepted with ?queue=true
+    ORDER_QUEUE_MAX_ATTEMPTS = int(os.environ.get('ORDER_QUEUE_MAX_ATTEMPTS', '20'))
+    ORDER_QUEUE_MAX_BACKOFF_SECONDS = int(os.environ.get('ORDER_QUEUE_MAX_BACKOFF_SECONDS', '300'))
+    ORDER_QUEUE_POLL_SECONDS = float(os.environ.get('ORDER_QUEUE_POLL_SECONDS', '5'))
+
+    # Maximum number of expanded order documents kept in the order detail cache
+    ORDER_CACHE_SIZE = int(os.environ.get('ORDER_CACHE_SIZE', '500'))
+
+    # Incremental sync of Clover data into local stores
+    SYNC_LOOKBACK_DAYS = int(os.environ.get('SYNC_LOOKBACK_DAYS', '30'))
+    SYNC_INTERVAL_SECONDS = int(os.environ.get('SYNC_INTERVAL_SECONDS', '0'))
+
+    # Memory-mapped archive of synced orders; older orders are served from it
+    ORDER_ARCHIVE_DIR = os.environ.get(
+        'ORDER_ARCHIVE_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'archive')))
+    ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', '21'))
+
+    # Largest number of orders a single bulk order job may select
+    BULK_JOB_MAX_ORDERS = int(os.environ.get('BULK_JOB_MAX_ORDERS', '10000'))
+
+    # Payments created this long after a reconciliation range still count towards its orders
+    RECONCILIATION_GRACE_HOURS = float(os.environ.get('RECONCILIATION_GRACE_HOURS', '6'))
+
+    # How long the payments of an order are cached for batched lookups
+    ORDER_PAYMENTS_CACHE_TTL_SECONDS = int(os.environ.get('ORDER_PAYMENTS_CACHE_TTL_SECONDS', '30'))
+
+    # Tab authorizations: assumed lifetime, how early they are due for closing, and recheck interval
+    AUTHORIZATION_TTL_HOURS = float(os.environ.get('AUTHORIZATION_TTL_HOURS', '24'))
+    AUTHORIZATION_DUE_WINDOW_MINUTES = float(os.environ.get('AUTHORIZATION_DUE_WINDOW_MINUTES', '120'))
+    AUTHORIZATION_RECHECK_MINUTES = float(os.environ.get('AUTHORIZATION_RECHECK_MINUTES', '15'))
+
+    # How long composite customer profiles are cached
+    CUSTOMER_PROFILE_CACHE_TTL_SECONDS = int(os.environ.get('CUSTOMER_PROFILE_CACHE_TTL_SECONDS', '60'))
+
+    # Customer index: how long a request waits for the initial seed, and how old its last sync may be
+    CUSTOMER_INDEX_WAIT_SECONDS = float(os.environ.get('CUSTOMER_INDEX_WAIT_SECONDS', '5'))
+    CUSTOMER_INDEX_MAX_STALENESS_SECONDS = int(os.environ.get('CUSTOMER_INDEX_MAX_STALENESS_SECONDS', '60'))
+
+    # Filtered list reads are answered from the local mirrors while their last sync is this recent
+    LOCAL_FILTER_MAX_STALENESS_SECONDS = int(os.environ.get('LOCAL_FILTER_MAX_STALENESS_SECONDS', '120'))
+
     # OAuth / app URLs
     SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8080')
     OAUTH_CALLBACK_PATH = os.environ.get('OAUTH_CALLBACK_PATH', '/oauth/callback')
@@ -0,0 +1,130 @@
+"""Per-customer order history and spend aggregates fed by the orders sync.
+
+Synced orders (which carry their expanded customers and refunds) are indexed
+by customer id with a short summary each, and every customer's aggregates
+(visits, paid orders, spend net of refunds) are adjusted as orders arrive.
+A re-synced order first retracts what its previous version contributed, so
+payment, total, refund and customer changes stay correct and a customer's
+history is a dictionary lookup instead of one request per order. Deleted
+orders are retracted.
+
+The aggregates only cover the orders synced so far, from the sync's
+syncedFrom onwards, not a customer's whole lifetime unless the orders were
+synced from the beginning.
+"""
+
+import heapq
+import threading
+from typing import Any, Dict, List
+
+from app import sync
+
+# Order payment states whose total, less refunds, counts towards spend
+PAID_STATES = ('PAID', 'PARTIALLY_REFUNDED')
+
+
+def _summary(order: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'id': order['id'],
+        'createdTime': order.get('createdTime') or 0,
+        'total': order.get('total') or 0,
+        'refunded': sum(refund.get('amount') or 0 for refund in (order.get('refunds') or {}).get('elements') or []),
+        'state': order.get('state'),
+        'paymentState': order.get('paymentState'),
+        'employeeId': (order.get('employee') or {}).get('id'),
+    }
+
+
+def _customer_ids(order: Dict[str, Any]) -> List[str]:
+    customers = (order.get('customers') or {}).get('elements') or []
+    return sorted({customer['id'] for customer in customers if customer.get('id')})
+
+
+class CustomerHistory:
+    """Orders and aggregates by customer for one merchant"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # customer id -> order id -> order summary
+        self._orders: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # customer id -> visits, paid orders, spend
+        self._totals: Dict[str, List[int]] = {}
+        # order id -> customer ids it was filed under
+        self._owners: Dict[str, List[str]] = {}
+
+    def _retract(self, order_id: str) -> None:
+        for customer_id in self._owners.pop(order_id, ()):
+            summary = self._orders[customer_id].pop(order_id)
+            totals = self._totals[customer_id]
+            totals[0] -= 1
+            if summary['paymentState'] in PAID_STATES:
+                totals[1] -= 1
+                totals[2] -= summary['total'] - summary['refunded']
+            if not self._orders[customer_id]:
+                del self._orders[customer_id]
+                del self._totals[customer_id]
+
+    def ingest(self, orders: List[Dict[str, Any]]) -> None:
+        """Upsert synced orders; deleted orders are dropped"""
+        with self._lock:
+            for order in orders:
+                order_id = order.get('id')
+                if not order_id:
+                    continue
+                self._retract(order_id)
+                customer_ids = _customer_ids(order)
+                if order.get('state') == 'deleted' or not customer_ids:
+                    continue
+                summary = _summary(order)
+                paid = summary['paymentState'] in PAID_STATES
+                for customer_id in customer_ids:
+                    self._orders.setdefault(customer_id, {})[order_id] = summary
+                    totals = self._totals.setdefault(customer_id, [0, 0, 0])
+                    totals[0] += 1
+                    if paid:
+                        totals[1] += 1
+                        totals[2] += summary['total'] - summary['refunded']
+                self._owners[order_id] = customer_ids
+
+    def remove(self, order_id: str) -> None:
+        """Retract an order deleted through the API before the sync sees it"""
+        with self._lock:
+            self._retract(order_id)
+
+    def history(self, customer_id: str, recent: int = 10) -> Dict[str, Any]:
+        """A customer's aggregates and most recent orders"""
+        with self._lock:
+            orders = self._orders.get(customer_id, {})
+            visits, paid_orders, spend = self._totals.get(customer_id, (0, 0, 0))
+            # First and last visit scan the customer's own orders only
+            times = [summary['createdTime'] for summary in orders.values()]
+            latest = heapq.nlargest(recent, orders.values(), key=lambda s: (s['createdTime'], s['id']))
+            return {
+                'customerId': customer_id,
+                'visits': visits,
+                'paidOrders': paid_orders,
+                'spend': spend,
+                'averageTicket': round(spend / paid_orders) if paid_orders else None,
+                'firstVisit': min(times) if times else None,
+                'lastVisit': max(times) if times else None,
+                'recentOrders': [dict(summary) for summary in latest],
+            }
+
+
+_LOCK = threading.Lock()
+_HISTORIES: Dict[str, CustomerHistory] = {}
+
+
+def get_history(merchant_id: str) -> CustomerHistory:
+    with _LOCK:
+        history = _HISTORIES.get(merchant_id)
+        if history is None:
+            history = _HISTORIES[merchant_id] = CustomerHistory()
+        return history
+
+
+def ingest_orders(merchant_id: str, orders: List[Dict[str, Any]]) -> None:
+    get_history(merchant_id).ingest(orders)
+
+
+sync.add_listener('orders', ingest_orders)
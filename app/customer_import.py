@@ -0,0 +1,160 @@
+"""Bulk customer import from CSV or NDJSON.
+
+Rows are parsed from the request stream one at a time and journaled as the
+items of a ``customers.import`` job, so an upload is never held in memory and
+the import runs in the background with bounded concurrency under the
+per-merchant rate limiter.
+
+Each row takes several Clover calls: the customer first, then each address,
+phone number and email address. Every finished call is checkpointed on the
+row, so a row retried after a crash or resume continues with the next
+sub-resource instead of creating the customer again.
+"""
+
+import csv
+import io
+import json
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+from app import customer_index, customer_profiles, jobs
+from app.api_utils import make_clover_request, build_merchant_url
+from app.config import Config
+
+JOB_KIND = 'customers.import'
+
+FORMATS = ('csv', 'ndjson')
+
+# Flat columns (CSV, or NDJSON without nested lists) making up one address
+ADDRESS_FIELDS = ('address1', 'address2', 'address3', 'city', 'state', 'zip', 'country')
+
+
+def _flag(value: Any) -> Optional[bool]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('true', '1', 'yes', 'y')
+
+
+def _listed(value: Any) -> List[Any]:
+    if isinstance(value, dict) and isinstance(value.get('elements'), list):
+        return value['elements']
+    if isinstance(value, list):
+        return value
+    return []
+
+
+def normalize(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn a CSV row or NDJSON object into the customer and the sub-resources to
+    create for it. Raises ValueError for rows that cannot be imported.
+    """
+    customer = {}
+    for field in ('firstName', 'lastName'):
+        value = row.get(field)
+        if value not in (None, ''):
+            customer[field] = str(value).strip()
+    marketing_allowed = _flag(row.get('marketingAllowed'))
+    if marketing_allowed is not None:
+        customer['marketingAllowed'] = marketing_allowed
+
+    addresses = [{k: v for k, v in address.items() if k in ADDRESS_FIELDS and v not in (None, '')}
+                 for address in _listed(row.get('addresses')) if isinstance(address, dict)]
+    flat_address = {k: str(row[k]).strip() for k in ADDRESS_FIELDS if row.get(k) not in (None, '')}
+    if flat_address:
+        addresses.append(flat_address)
+
+    phone_numbers = [p.get('phoneNumber') if isinstance(p, dict) else p for p in _listed(row.get('phoneNumbers'))]
+    email_addresses = [e.get('emailAddress') if isinstance(e, dict) else e for e in _listed(row.get('emailAddresses'))]
+    # CSV cells may hold several values separated by semicolons
+    for column, target in (('phone', phone_numbers), ('phoneNumber', phone_numbers),
+                           ('email', email_addresses), ('emailAddress', email_addresses)):
+        if row.get(column):
+            target.extend(part for part in str(row[column]).split(';'))
+    phone_numbers = [str(p).strip() for p in phone_numbers if p and str(p).strip()]
+    email_addresses = [str(e).strip() for e in email_addresses if e and str(e).strip()]
+
+    if not (customer.get('firstName') or customer.get('lastName') or phone_numbers or email_addresses):
+        raise ValueError('Row needs a firstName, lastName, phone or email')
+    for email in email_addresses:
+        if '@' not in email:
+            raise ValueError(f'Invalid email address: {email}')
+
+    return {
+        'customer': customer,
+        'addresses': [a for a in addresses if a],
+        'phoneNumbers': [{'phoneNumber': p} for p in phone_numbers],
+        'emailAddresses': [{'emailAddress': e} for e in email_addresses],
+    }
+
+
+def _rows(records: Iterator[Tuple[int, Any]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(line number, normalized row) items; invalid rows are journaled with their error so they fail"""
+    for line, record in records:
+        try:
+            if not isinstance(record, dict):
+                raise ValueError('Row is not a JSON object')
+            yield str(line), normalize(record)
+        except ValueError as e:
+            yield str(line), {'error': str(e)}
+
+
+def _csv_records(stream: IO[bytes]) -> Iterator[Tuple[int, Any]]:
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _ndjson_records(stream: IO[bytes]) -> Iterator[Tuple[int, Any]]:
+    for line, text in enumerate(io.TextIOWrapper(stream, encoding='utf-8-sig'), start=1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError:
+            yield line, None
+
+
+def parse(stream: IO[bytes], fmt: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Job items for every row of a CSV or NDJSON byte stream, parsed lazily"""
+    return _rows(_csv_records(stream) if fmt == 'csv' else _ndjson_records(stream))
+
+
+def _create(merchant_id: str, url: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    response = make_clover_request('POST', url, merchant_id, json=body)
+    if response.status_code != 200:
+        raise RuntimeError(f"Clover API error {response.status_code}: {response.text}")
+    return response.json()
+
+
+def import_row(merchant_id: str, params: Dict[str, Any], row: Dict[str, Any],
+               checkpoint: jobs.Checkpoint) -> Dict[str, Any]:
+    """Job handler: create one row's customer and sub-resources, skipping steps already checkpointed"""
+    if row.get('error'):
+        raise ValueError(row['error'])
+    config = Config()
+    if 'customerId' not in checkpoint:
+        customer = _create(merchant_id, build_merchant_url(config, merchant_id, 'customers'), row['customer'])
+        checkpoint['customerId'] = customer['id']
+        checkpoint['created'] = []
+        checkpoint.save()
+    customer_id = checkpoint['customerId']
+    customer_url = build_merchant_url(config, merchant_id, f'customers/{customer_id}')
+
+    for field, path in customer_profiles.SUB_RESOURCES.items():
+        for index, body in enumerate(row.get(field, [])):
+            step = f'{field}.{index}'
+            if step in checkpoint['created']:
+                continue
+            _create(merchant_id, f'{customer_url}/{path}', body)
+            checkpoint['created'].append(step)
+            checkpoint.save()
+
+    customer_profiles.invalidate(merchant_id, customer_id)
+    customer_index.get_index(merchant_id).upsert(dict(row['customer'], id=customer_id,
+                                                      phoneNumbers=row['phoneNumbers'],
+                                                      emailAddresses=row['emailAddresses']))
+    return {'customerId': customer_id}
+
+
+jobs.register(JOB_KIND, import_row, checkpointed=True)
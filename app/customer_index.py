@@ -0,0 +1,274 @@
+"""Local customer lookup index fed by the customers sync.
+
+Phone numbers and email addresses are normalized and kept in hash maps, and
+every name token (first name, last name) is inserted into a prefix trie whose
+nodes hold the ids below them, so a front-desk lookup is a dictionary hit or
+a walk of a few trie nodes instead of a filtered Clover query per keystroke.
+The same maps back the duplicate check run before a customer is created.
+
+Customers created or changed through this service are indexed right away;
+everything else arrives with customers syncs. On first use the index is
+seeded with a full customers sync in the background, and once seeded it is
+brought up to date with an incremental sync whenever it is used after its
+last sync grew stale.
+"""
+
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app import sync
+from app.config import Config
+from app.utils import name_tokens
+
+_NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_phone(value: Any) -> Optional[str]:
+    """Digits only, without a leading North American country code; None if too short to mean anything"""
+    digits = _NON_DIGITS.sub('', str(value or ''))
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    return digits if len(digits) >= 7 else None
+
+
+def normalize_email(value: Any) -> Optional[str]:
+    email = str(value or '').strip().lower()
+    return email if '@' in email else None
+
+
+def _elements(value: Any) -> Optional[List[Any]]:
+    if isinstance(value, dict) and isinstance(value.get('elements'), list):
+        return value['elements']
+    if isinstance(value, list):
+        return value
+    return None
+
+
+def _contacts(customer: Dict[str, Any], field: str, key: str) -> Optional[List[str]]:
+    """Values of an expanded contact collection, or None if the record did not carry it"""
+    elements = _elements(customer.get(field))
+    if elements is None:
+        return None
+    return [e.get(key) if isinstance(e, dict) else e for e in elements if e]
+
+
+class _TrieNode:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        # Every customer with a name token passing through this node
+        self.ids: Set[str] = set()
+
+
+class CustomerIndex:
+    """Phone, email and name-prefix lookups over one merchant's customers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._customers: Dict[str, Dict[str, Any]] = {}
+        self._by_phone: Dict[str, Set[str]] = {}
+        self._by_email: Dict[str, Set[str]] = {}
+        self._trie = _TrieNode()
+
+    # Maintenance
+
+    def _keys(self, entry: Dict[str, Any]):
+        phones = {normalize_phone(p) for p in entry['phoneNumbers']} - {None}
+        emails = {normalize_email(e) for e in entry['emailAddresses']} - {None}
+        tokens = set(name_tokens(entry.get('firstName'))) | set(name_tokens(entry.get('lastName')))
+        return phones, emails, tokens
+
+    def _link(self, customer_id: str, entry: Dict[str, Any], sign: int) -> None:
+        phones, emails, tokens = self._keys(entry)
+        for mapping, keys in ((self._by_phone, phones), (self._by_email, emails)):
+            for key in keys:
+                if sign > 0:
+                    mapping.setdefault(key, set()).add(customer_id)
+                else:
+                    ids = mapping.get(key)
+                    if ids is not None:
+                        ids.discard(customer_id)
+                        if not ids:
+                            del mapping[key]
+        for token in tokens:
+            node = self._trie
+            path = [node]
+            for char in token:
+                child = node.children.get(char)
+                if child is None:
+                    if sign < 0:
+                        break
+                    child = node.children[char] = _TrieNode()
+                node = child
+                path.append(node)
+            for node in path:
+                if sign > 0:
+                    node.ids.add(customer_id)
+                else:
+                    node.ids.discard(customer_id)
+            if sign < 0:
+                # Prune branches no customer passes through any more
+                for parent, char in zip(reversed(path[:-1]), reversed(token[:len(path) - 1])):
+                    child = parent.children[char]
+                    if child.ids or child.children:
+                        break
+                    del parent.children[char]
+
+    def upsert(self, customer: Dict[str, Any]) -> None:
+        """
+        Add or update a customer. Contact collections the record does not carry
+        (because they were not expanded) keep their indexed values.
+        """
+        customer_id = customer.get('id')
+        if not customer_id:
+            return
+        with self._lock:
+            previous = self._customers.get(customer_id)
+            entry = {
+                'id': customer_id,
+                'firstName': customer.get('firstName'),
+                'lastName': customer.get('lastName'),
+                'phoneNumbers': _contacts(customer, 'phoneNumbers', 'phoneNumber'),
+                'emailAddresses': _contacts(customer, 'emailAddresses', 'emailAddress'),
+            }
+            for field in ('phoneNumbers', 'emailAddresses'):
+                if entry[field] is None:
+                    entry[field] = previous[field] if previous else []
+            if previous is not None:
+                self._link(customer_id, previous, -1)
+            self._customers[customer_id] = entry
+            self._link(customer_id, entry, 1)
+
+    def add_contact(self, customer_id: str, phone: Optional[str] = None, email: Optional[str] = None) -> None:
+        """Record a phone number or email address added to an indexed customer"""
+        with self._lock:
+            previous = self._customers.get(customer_id)
+        if previous is None:
+            return
+        customer = dict(previous)
+        if phone:
+            customer['phoneNumbers'] = previous['phoneNumbers'] + [phone]
+        if email:
+            customer['emailAddresses'] = previous['emailAddresses'] + [email]
+        self.upsert(customer)
+
+    def remove(self, customer_id: str) -> None:
+        with self._lock:
+            previous = self._customers.pop(customer_id, None)
+            if previous is not None:
+                self._link(customer_id, previous, -1)
+
+    # Lookups
+
+    def _prefix_ids(self, prefix: str) -> Set[str]:
+        node = self._trie
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.ids
+
+    def _results(self, ids: Iterable[str], matched_on: str, limit: int) -> List[Dict[str, Any]]:
+        entries = sorted((self._customers[i] for i in ids if i in self._customers),
+                         key=lambda e: ((e.get('lastName') or '').lower(), (e.get('firstName') or '').lower(), e['id']))
+        return [dict(entry, matchedOn=matched_on) for entry in entries[:limit]]
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Customers matching a query: an exact email address, an exact phone
+        number, or otherwise a name where every word of the query is a prefix
+        of one of the customer's name words.
+        """
+        with self._lock:
+            email = normalize_email(query)
+            if email:
+                return self._results(self._by_email.get(email, ()), 'email', limit)
+            phone = normalize_phone(query) if not name_tokens(re.sub(r'\d', '', query)) else None
+            if phone:
+                return self._results(self._by_phone.get(phone, ()), 'phone', limit)
+            tokens = name_tokens(query)
+            if not tokens:
+                return []
+            # Walk the longest (most selective) prefix first
+            tokens.sort(key=len, reverse=True)
+            ids = set(self._prefix_ids(tokens[0]))
+            for token in tokens[1:]:
+                if not ids:
+                    break
+                ids &= self._prefix_ids(token)
+            return self._results(ids, 'name', limit)
+
+    def duplicates(self, customer: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Indexed customers sharing a phone number or email address with a customer about to be created"""
+        phones = {normalize_phone(p) for p in _contacts(customer, 'phoneNumbers', 'phoneNumber') or []} - {None}
+        emails = {normalize_email(e) for e in _contacts(customer, 'emailAddresses', 'emailAddress') or []} - {None}
+        with self._lock:
+            matched: Dict[str, List[str]] = {}
+            for mapping, keys, label in ((self._by_phone, phones, 'phone'), (self._by_email, emails, 'email')):
+                for key in keys:
+                    for customer_id in mapping.get(key, ()):
+                        matched.setdefault(customer_id, []).append(label)
+            return [dict(self._customers[customer_id], matchedOn=sorted(set(labels)))
+                    for customer_id, labels in sorted(matched.items())]
+
+    def __len__(self) -> int:
+        return len(self._customers)
+
+
+_LOCK = threading.Lock()
+_INDEXES: Dict[str, CustomerIndex] = {}
+_SEEDERS: Dict[str, threading.Thread] = {}
+
+
+def get_index(merchant_id: str) -> CustomerIndex:
+    with _LOCK:
+        index = _INDEXES.get(merchant_id)
+        if index is None:
+            index = _INDEXES[merchant_id] = CustomerIndex()
+        return index
+
+
+def _seed(merchant_id: str) -> None:
+    try:
+        sync.sync(merchant_id, 'customers', 0)
+    except Exception as e:
+        print(f"Customer index seed failed: {str(e)}")
+
+
+def _seeded(merchant_id: str) -> bool:
+    coverage = sync.get_coverage(merchant_id, 'customers')
+    return coverage is not None and coverage['syncedFrom'] == 0
+
+
+def ensure_seeded(merchant_id: str, wait: float = 0) -> bool:
+    """
+    Whether the index holds every customer. An unseeded index starts seeding
+    with a full customers sync in a background thread, waited on for up to
+    `wait` seconds. A seeded index whose last sync is older than
+    CUSTOMER_INDEX_MAX_STALENESS_SECONDS is first brought up to date with an
+    incremental sync. Raises requests.HTTPError if Clover rejects that sync.
+    """
+    if not _seeded(merchant_id):
+        with _LOCK:
+            seeder = _SEEDERS.get(merchant_id)
+            if seeder is None or not seeder.is_alive():
+                seeder = _SEEDERS[merchant_id] = threading.Thread(
+                    target=_seed, args=(merchant_id,), name='customer-index-seed', daemon=True)
+                seeder.start()
+        seeder.join(wait)
+        return _seeded(merchant_id)
+    if time.time() - sync.get_coverage(merchant_id, 'customers')['syncedAt'] > Config.CUSTOMER_INDEX_MAX_STALENESS_SECONDS:
+        sync.sync(merchant_id, 'customers')
+    return True
+
+
+def index_customers(merchant_id: str, customers: List[Dict[str, Any]]) -> None:
+    index = get_index(merchant_id)
+    for customer in customers:
+        index.upsert(customer)
+
+
+sync.add_listener('customers', index_customers)
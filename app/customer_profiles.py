@@ -0,0 +1,143 @@
+"""Composite customer profiles: the customer with its addresses, phone numbers
+and email addresses in one document.
+
+A profile is normally one Clover request with the sub-collections expanded.
+Collections the expansion did not return are fetched concurrently, and if
+Clover ignores the expansion altogether the merchant's profiles fetch the
+customer and all three sub-resources concurrently for a while before the
+expansion is tried again, so a profile costs about one round trip either way.
+Profiles are cached briefly and dropped when the customer is changed through
+this service or re-synced.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import sync
+from app.api_utils import make_clover_request, build_merchant_url
+from app.concurrency import run_bounded
+from app.config import Config
+
+# Profile field -> Clover sub-resource path
+SUB_RESOURCES = {
+    'addresses': 'addresses',
+    'phoneNumbers': 'phone_numbers',
+    'emailAddresses': 'email_addresses',
+}
+
+# Upper bound on cached profiles; the oldest entries are evicted first
+_MAX_ENTRIES = 2000
+
+_LOCK = threading.Lock()
+_CACHE: 'OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]' = OrderedDict()
+
+# How long a merchant's profiles skip the expansion after Clover ignored or rejected it
+_EXPAND_RETRY_SECONDS = 3600
+
+# merchant id -> when to try the expansion again
+_expand_unsupported: Dict[str, float] = {}
+
+
+def _cached(merchant_id: str, customer_id: str) -> Optional[Dict[str, Any]]:
+    key = (merchant_id, customer_id)
+    with _LOCK:
+        entry = _CACHE.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del _CACHE[key]
+            return None
+        _CACHE.move_to_end(key)
+        return entry[1]
+
+
+def _store(merchant_id: str, customer_id: str, profile: Dict[str, Any]) -> None:
+    if Config.CUSTOMER_PROFILE_CACHE_TTL_SECONDS <= 0:
+        return
+    with _LOCK:
+        _CACHE[(merchant_id, customer_id)] = (time.time() + Config.CUSTOMER_PROFILE_CACHE_TTL_SECONDS, profile)
+        _CACHE.move_to_end((merchant_id, customer_id))
+        while len(_CACHE) > _MAX_ENTRIES:
+            _CACHE.popitem(last=False)
+
+
+def invalidate(merchant_id: str, customer_id: str) -> None:
+    with _LOCK:
+        _CACHE.pop((merchant_id, customer_id), None)
+
+
+def _elements(value: Any) -> Optional[List[Dict[str, Any]]]:
+    """Elements of an expanded collection, or None if it was not expanded"""
+    if isinstance(value, dict) and isinstance(value.get('elements'), list):
+        return value['elements']
+    if isinstance(value, list):
+        return value
+    return None
+
+
+def _fetch_expanded(merchant_id: str, customer_url: str) -> Optional[Dict[str, Any]]:
+    """The customer with whichever sub-collections Clover expanded, or None if it rejected the expansion"""
+    response = make_clover_request('GET', customer_url, merchant_id,
+                                   params={'expand': ','.join(SUB_RESOURCES)})
+    if response.status_code == 400:
+        _expand_unsupported[merchant_id] = time.time() + _EXPAND_RETRY_SECONDS
+        return None
+    response.raise_for_status()
+    customer = response.json()
+    expanded = 0
+    for field in SUB_RESOURCES:
+        elements = _elements(customer.get(field))
+        if elements is not None:
+            customer[field] = elements
+            expanded += 1
+    if not expanded:
+        _expand_unsupported[merchant_id] = time.time() + _EXPAND_RETRY_SECONDS
+    return customer
+
+
+def _fetch_concurrently(merchant_id: str, urls: List[str]) -> List[Dict[str, Any]]:
+    bodies: List[Any] = [None] * len(urls)
+    for index, response, error in run_bounded(lambda url: make_clover_request('GET', url, merchant_id), urls):
+        if error is not None:
+            raise error
+        response.raise_for_status()
+        bodies[index] = response.json()
+    return bodies
+
+
+def get_profile(merchant_id: str, customer_id: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    The customer's profile and whether it came from the cache. Raises
+    requests.HTTPError when Clover rejects a request.
+    """
+    profile = _cached(merchant_id, customer_id)
+    if profile is not None:
+        return profile, True
+    customer_url = build_merchant_url(Config(), merchant_id, f'customers/{customer_id}')
+    expand = _expand_unsupported.get(merchant_id, 0) <= time.time()
+    profile = _fetch_expanded(merchant_id, customer_url) if expand else None
+
+    # Fetch the customer (if needed) and any collection that was not expanded, all at once
+    urls = [] if profile is not None else [customer_url]
+    missing = [field for field in SUB_RESOURCES if profile is None or not isinstance(profile.get(field), list)]
+    urls += [f'{customer_url}/{SUB_RESOURCES[field]}' for field in missing]
+    if urls:
+        bodies = _fetch_concurrently(merchant_id, urls)
+        if profile is None:
+            profile = bodies.pop(0)
+        for field, body in zip(missing, bodies):
+            profile[field] = body.get('elements', [])
+
+    _store(merchant_id, customer_id, profile)
+    return profile, False
+
+
+def _invalidate_synced(merchant_id: str, customers: List[Dict[str, Any]]) -> None:
+    for customer in customers:
+        if customer.get('id'):
+            invalidate(merchant_id, customer['id'])
+
+
+sync.add_listener('customers', _invalidate_synced)
@@ -0,0 +1,126 @@
+"""Parser and evaluator for Clover list filter expressions.
+
+Supports the comparison clauses the list endpoints accept, e.g.
+``createdTime>=1758581462000``, ``state=open``, ``total>1000`` or
+``employee.id=EMP123``. Several clauses are ANDed together, as Clover does
+with repeated ``filter`` parameters.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+# Longest operators first so '>=' is not read as '>'
+_CLAUSE = re.compile(r'^\s*([A-Za-z_][\w.]*)\s*(<=|>=|!=|<>|=|<|>)\s*(.*?)\s*$')
+
+
+class Predicate:
+    """One field comparison"""
+
+    def __init__(self, field: str, op: str, value: Any):
+        self.field = field
+        self.op = '!=' if op == '<>' else op
+        self.value = value
+
+    def __repr__(self):
+        return f'Predicate({self.field!r}, {self.op!r}, {self.value!r})'
+
+    def matches(self, record: Dict[str, Any]) -> bool:
+        actual = get_path(record, self.field)
+        if actual is None:
+            return self.op == '!=' and self.value is not None
+        expected = _coerce(self.value, actual)
+        try:
+            if self.op == '=':
+                return actual == expected
+            if self.op == '!=':
+                return actual != expected
+            if self.op == '<':
+                return actual < expected
+            if self.op == '<=':
+                return actual <= expected
+            if self.op == '>':
+                return actual > expected
+            return actual >= expected
+        except TypeError:
+            return False
+
+
+def _parse_value(raw: str) -> Any:
+    if len(raw) >= 2 and raw[0] == raw[-1] and raw[0] in '\'"':
+        return raw[1:-1]
+    lowered = raw.lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    if lowered == 'null':
+        return None
+    if re.fullmatch(r'-?\d+', raw):
+        return int(raw)
+    return raw
+
+
+def _coerce(value: Any, actual: Any) -> Any:
+    """Compare like with like: a string literal against a numeric field and vice versa"""
+    if isinstance(actual, bool) or value is None:
+        return value
+    if isinstance(actual, (int, float)) and isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    if isinstance(actual, str) and not isinstance(value, str):
+        return str(value).lower() if isinstance(value, bool) else str(value)
+    return value
+
+
+def get_path(record: Dict[str, Any], path: str) -> Any:
+    """Resolve a dotted field path such as employee.id"""
+    value: Any = record
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def parse_filters(clauses: List[str]) -> List[Predicate]:
+    """Parse filter clauses; raises ValueError for syntax that cannot be evaluated locally"""
+    predicates = []
+    for clause in clauses:
+        if not clause:
+            continue
+        match = _CLAUSE.match(clause)
+        if not match:
+            raise ValueError(f'Unsupported filter: {clause}')
+        field, op, raw = match.groups()
+        predicates.append(Predicate(field, op, _parse_value(raw)))
+    return predicates
+
+
+def matches_all(record: Dict[str, Any], predicates: List[Predicate]) -> bool:
+    return all(predicate.matches(record) for predicate in predicates)
+
+
+def lower_bound(predicates: List[Predicate], fields: List[str]) -> Optional[int]:
+    """Tightest inclusive lower bound the predicates put on any of the given time fields"""
+    bound = None
+    for predicate in predicates:
+        if predicate.field in fields and isinstance(predicate.value, int) and predicate.op in ('>=', '>', '='):
+            value = predicate.value + 1 if predicate.op == '>' else predicate.value
+            bound = value if bound is None else max(bound, value)
+    return bound
+
+
+def time_range(predicates: List[Predicate], field: str):
+    """(start, end) inclusive bounds the predicates put on one field; None when open"""
+    start = end = None
+    for predicate in predicates:
+        if predicate.field != field or not isinstance(predicate.value, int):
+            continue
+        value = predicate.value
+        if predicate.op in ('>=', '>', '='):
+            low = value + 1 if predicate.op == '>' else value
+            start = low if start is None else max(start, low)
+        if predicate.op in ('<=', '<', '='):
+            high = value - 1 if predicate.op == '<' else value
+            end = high if end is None else min(end, high)
+    return start, end
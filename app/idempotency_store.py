@@ -0,0 +1,156 @@
+"""SQLite-backed store for Idempotency-Key request deduplication.
+
+Each (scope, key) row records whether the first request is still in flight and,
+once it finishes, the response it produced. Retries with the same key replay
+that response instead of calling Clover again; concurrent duplicates wait for
+the first call to finish.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import Config
+
+_LOCK = threading.Lock()
+_DB_FILE = os.path.join(os.path.dirname(__file__), '..', 'idempotency.db')
+_DB_FILE = os.path.abspath(_DB_FILE)
+
+# Events for calls in flight in this process, so duplicates can block on them
+_IN_FLIGHT: Dict[Tuple[str, str], threading.Event] = {}
+_last_purge = 0.0
+
+NEW = 'new'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+MISMATCH = 'mismatch'
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(_DB_FILE, timeout=30)
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS idempotency_keys ('
+        ' scope TEXT NOT NULL,'
+        ' key TEXT NOT NULL,'
+        ' request_hash TEXT NOT NULL,'
+        ' state TEXT NOT NULL,'
+        ' status_code INTEGER,'
+        ' body TEXT,'
+        ' started_at REAL NOT NULL,'
+        ' expires_at REAL NOT NULL,'
+        ' PRIMARY KEY (scope, key))'
+    )
+    return conn
+
+
+def _purge_expired(conn: sqlite3.Connection, now: float) -> None:
+    global _last_purge
+    if now - _last_purge < 60:
+        return
+    _last_purge = now
+    conn.execute('DELETE FROM idempotency_keys WHERE expires_at < ?', (now,))
+
+
+def begin(scope: str, key: str, request_hash: str) -> Tuple[str, Optional[Tuple[Any, int]]]:
+    """
+    Claim a key for a new request.
+
+    Returns (state, stored) where state is NEW if the caller now owns the key,
+    DONE with the stored (body, status_code), IN_FLIGHT if another call holds
+    it, or MISMATCH if the key was used for a different request.
+    """
+    now = time.time()
+    stale_before = now - Config.IDEMPOTENCY_IN_FLIGHT_TIMEOUT
+    with _LOCK:
+        conn = _connect()
+        try:
+            with conn:
+                _purge_expired(conn, now)
+                row = conn.execute(
+                    'SELECT request_hash, state, status_code, body, started_at, expires_at'
+                    ' FROM idempotency_keys WHERE scope = ? AND key = ?',
+                    (scope, key)
+                ).fetchone()
+
+                if row and row[5] >= now:
+                    stored_hash, state, status_code, body, started_at, _ = row
+                    if stored_hash != request_hash:
+                        return MISMATCH, None
+                    if state == DONE:
+                        return DONE, (json.loads(body), status_code)
+                    if started_at >= stale_before:
+                        return IN_FLIGHT, None
+                    # The original call was abandoned (e.g. the process died); take it over
+
+                conn.execute(
+                    'INSERT OR REPLACE INTO idempotency_keys'
+                    ' (scope, key, request_hash, state, status_code, body, started_at, expires_at)'
+                    ' VALUES (?, ?, ?, ?, NULL, NULL, ?, ?)',
+                    (scope, key, request_hash, IN_FLIGHT, now, now + Config.IDEMPOTENCY_TTL_SECONDS)
+                )
+                _IN_FLIGHT[(scope, key)] = threading.Event()
+                return NEW, None
+        finally:
+            conn.close()
+
+
+def complete(scope: str, key: str, body: Any, status_code: int) -> None:
+    """Record the final response for a key and wake any waiting duplicates"""
+    now = time.time()
+    with _LOCK:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    'UPDATE idempotency_keys SET state = ?, status_code = ?, body = ?, expires_at = ?'
+                    ' WHERE scope = ? AND key = ?',
+                    (DONE, status_code, json.dumps(body), now + Config.IDEMPOTENCY_TTL_SECONDS, scope, key)
+                )
+        finally:
+            conn.close()
+        event = _IN_FLIGHT.pop((scope, key), None)
+    if event:
+        event.set()
+
+
+def release(scope: str, key: str) -> None:
+    """Forget an in-flight key whose call failed, so a retry can run it again"""
+    with _LOCK:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    'DELETE FROM idempotency_keys WHERE scope = ? AND key = ? AND state = ?',
+                    (scope, key, IN_FLIGHT)
+                )
+        finally:
+            conn.close()
+        event = _IN_FLIGHT.pop((scope, key), None)
+    if event:
+        event.set()
+
+
+def wait(scope: str, key: str, request_hash: str, timeout: float) -> Tuple[str, Optional[Tuple[Any, int]]]:
+    """
+    Wait for an in-flight call holding the key to finish.
+
+    Returns the same states as begin(); NEW means the original call failed and
+    the caller now owns the key. IN_FLIGHT means the wait timed out.
+    """
+    deadline = time.time() + timeout
+    while True:
+        with _LOCK:
+            event = _IN_FLIGHT.get((scope, key))
+        remaining = deadline - time.time()
+        if event:
+            event.wait(max(0.0, remaining))
+        else:
+            # Held by another process; poll the store
+            time.sleep(min(0.1, max(0.0, remaining)))
+
+        state, stored = begin(scope, key, request_hash)
+        if state != IN_FLIGHT or time.time() >= deadline:
+            return state, stored
@@ -0,0 +1,122 @@
+"""Bulk inventory item updates diffed against the cached catalog.
+
+Each patch names an item and the fields to set. Patches are compared with the
+cached catalog first, so items already matching are skipped without a Clover
+call, and only changed fields are sent. The remaining updates run with
+bounded concurrency under the per-merchant rate limiter, and the updated
+records are written back into the catalog cache.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import catalog
+from app.api_utils import make_clover_request, build_merchant_url
+from app.concurrency import run_bounded
+from app.config import Config
+
+# Item fields a patch may set through the items endpoint
+ITEM_FIELDS = ('name', 'alternateName', 'code', 'sku', 'price', 'priceType', 'unitName', 'cost',
+               'isRevenue', 'hidden', 'available', 'defaultTaxRates')
+
+# Patch field set through the item_stocks endpoint
+STOCK_FIELD = 'stockCount'
+
+
+def _stock(item: Dict[str, Any]) -> Any:
+    stock = item.get('itemStock') or {}
+    return stock.get('quantity', item.get(STOCK_FIELD))
+
+
+def diff(item: Dict[str, Any], patch: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Any]]:
+    """The item fields that differ from the patch, and the new stock count if it differs"""
+    changes = {field: patch[field] for field in ITEM_FIELDS if field in patch and item.get(field) != patch[field]}
+    stock = patch.get(STOCK_FIELD)
+    if stock is not None and _stock(item) != stock:
+        return changes, stock
+    return changes, None
+
+
+def _plan(items: Dict[str, Dict[str, Any]], patches: List[Any]):
+    """Per-patch outcomes for patches that need no call, and (index, item id, changes, stock) for the rest"""
+    outcomes: List[Optional[Dict[str, Any]]] = [None] * len(patches)
+    updates = []
+    seen = set()
+    allowed = set(ITEM_FIELDS) | {'id', STOCK_FIELD}
+    for index, patch in enumerate(patches):
+        item_id = patch.get('id') if isinstance(patch, dict) else None
+        if not item_id:
+            outcomes[index] = {'index': index, 'id': None, 'status': 'invalid', 'error': 'Patch needs an item id'}
+            continue
+        unknown = sorted(set(patch) - allowed)
+        if unknown:
+            error = f"Fields cannot be updated: {', '.join(unknown)}"
+        elif item_id in seen:
+            error = 'Item appears more than once'
+        else:
+            error = None
+        if error:
+            outcomes[index] = {'index': index, 'id': item_id, 'status': 'invalid', 'error': error}
+            continue
+        seen.add(item_id)
+        item = items.get(item_id)
+        if item is None:
+            outcomes[index] = {'index': index, 'id': item_id, 'status': 'notFound'}
+            continue
+        changes, stock = diff(item, patch)
+        if not changes and stock is None:
+            outcomes[index] = {'index': index, 'id': item_id, 'status': 'unchanged'}
+            continue
+        updates.append((index, item_id, changes, stock))
+    return outcomes, updates
+
+
+def apply_patches(merchant_id: str, patches: List[Any], dry_run: bool = False,
+                  refresh: bool = False) -> Dict[str, Any]:
+    """
+    Apply item patches and return a summary with one outcome per patch, in
+    patch order. Raises requests.HTTPError if the catalog cannot be loaded.
+    """
+    items = catalog.items.refresh(merchant_id) if refresh else catalog.items.get_all(merchant_id)
+    outcomes, updates = _plan(items, patches)
+    config = Config()
+
+    def update(entry):
+        _, item_id, changes, stock = entry
+        record = dict(items[item_id])
+        if changes:
+            response = make_clover_request('POST', build_merchant_url(config, merchant_id, f'items/{item_id}'),
+                                           merchant_id, json=changes)
+            if response.status_code != 200:
+                raise RuntimeError(f"Clover API error {response.status_code}: {response.text}")
+            record.update(changes)
+            record.update(response.json())
+        if stock is not None:
+            response = make_clover_request('POST', build_merchant_url(config, merchant_id, f'item_stocks/{item_id}'),
+                                           merchant_id, json={'quantity': stock})
+            if response.status_code != 200:
+                raise RuntimeError(f"Clover API error {response.status_code}: {response.text}")
+            record['itemStock'] = dict(record.get('itemStock') or {}, quantity=stock)
+            record[STOCK_FIELD] = stock
+        return record
+
+    if dry_run:
+        for index, item_id, changes, stock in updates:
+            outcomes[index] = {'index': index, 'id': item_id, 'status': 'wouldUpdate',
+                               'changed': sorted(changes) + ([STOCK_FIELD] if stock is not None else [])}
+    else:
+        updated = []
+        for position, record, error in run_bounded(update, updates):
+            index, item_id, changes, stock = updates[position]
+            changed = sorted(changes) + ([STOCK_FIELD] if stock is not None else [])
+            if error is not None:
+                outcomes[index] = {'index': index, 'id': item_id, 'status': 'failed', 'changed': changed,
+                                   'error': str(error)}
+            else:
+                outcomes[index] = {'index': index, 'id': item_id, 'status': 'updated', 'changed': changed}
+                updated.append(record)
+        catalog.items.put(merchant_id, updated)
+
+    counts: Dict[str, int] = {}
+    for outcome in outcomes:
+        counts[outcome['status']] = counts.get(outcome['status'], 0) + 1
+    return {'total': len(patches), 'dryRun': dry_run, 'counts': counts, 'results': outcomes}
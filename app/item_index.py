@@ -0,0 +1,146 @@
+"""Item lookup index over the cached inventory catalog.
+
+Barcode scans resolve through a hash map of normalized SKUs and codes. Name
+searches bisect a sorted list of (name word, item id) pairs, so a prefix
+lookup costs a binary search plus the matches it returns, whatever the size
+of the catalog.
+
+The index follows the catalog cache: a new copy of the items collection is
+diffed against the indexed one, and only the changed items are re-indexed,
+unless so many changed that rebuilding is cheaper.
+"""
+
+import bisect
+import threading
+from typing import Any, Dict, List, Set, Tuple
+
+from app import catalog
+from app.utils import name_tokens
+
+# Above this share of changed items the index is rebuilt instead of patched
+_REBUILD_FRACTION = 0.1
+
+
+def normalize_code(value: Any) -> str:
+    return str(value or '').strip().casefold()
+
+
+def _codes(item: Dict[str, Any]) -> Set[str]:
+    return {normalize_code(item.get(field)) for field in ('sku', 'code')} - {''}
+
+
+class ItemIndex:
+    """SKU/code and name-prefix lookups over one merchant's items"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # The items copy the index was built from
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._by_code: Dict[str, Set[str]] = {}
+        # Sorted (name word, item id) pairs, and each item's name words
+        self._words: List[Tuple[str, str]] = []
+        self._item_words: Dict[str, Tuple[str, ...]] = {}
+
+    def _add_codes(self, item: Dict[str, Any]) -> None:
+        for code in _codes(item):
+            self._by_code.setdefault(code, set()).add(item['id'])
+
+    def _remove_codes(self, item: Dict[str, Any]) -> None:
+        for code in _codes(item):
+            ids = self._by_code.get(code)
+            if ids is not None:
+                ids.discard(item['id'])
+                if not ids:
+                    del self._by_code[code]
+
+    def _rebuild(self, items: Dict[str, Dict[str, Any]]) -> None:
+        self._by_code = {}
+        self._item_words = {}
+        words = []
+        for item_id, item in items.items():
+            self._add_codes(item)
+            item_words = self._item_words[item_id] = tuple(name_tokens(item.get('name')))
+            words.extend((word, item_id) for word in set(item_words))
+        words.sort()
+        self._words = words
+
+    def _patch(self, items: Dict[str, Dict[str, Any]], changed: Set[str]) -> None:
+        for item_id in changed:
+            previous = self._items.get(item_id)
+            if previous is not None:
+                self._remove_codes(previous)
+                for word in set(self._item_words.pop(item_id, ())):
+                    position = bisect.bisect_left(self._words, (word, item_id))
+                    if position < len(self._words) and self._words[position] == (word, item_id):
+                        del self._words[position]
+            item = items.get(item_id)
+            if item is not None:
+                self._add_codes(item)
+                item_words = self._item_words[item_id] = tuple(name_tokens(item.get('name')))
+                for word in set(item_words):
+                    bisect.insort(self._words, (word, item_id))
+
+    def follow(self, items: Dict[str, Dict[str, Any]]) -> None:
+        """Bring the index up to date with a copy of the items collection"""
+        with self._lock:
+            if items is self._items:
+                return
+            changed = catalog.changed_ids(self._items, items)
+            if not self._items or len(changed) > _REBUILD_FRACTION * len(items):
+                self._rebuild(items)
+            elif changed:
+                self._patch(items, changed)
+            self._items = items
+
+    def by_code(self, code: str) -> List[Dict[str, Any]]:
+        """Items whose SKU or code equals the scanned value, ignoring case and surrounding spaces"""
+        with self._lock:
+            ids = self._by_code.get(normalize_code(code), ())
+            return [self._items[item_id] for item_id in sorted(ids)]
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Items where every word of the query starts one of the words of the
+        item name, in order of the matched word.
+        """
+        words = name_tokens(query)
+        if not words:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            # Scan the range of the word with the fewest matches, check the others per item
+            ranges = sorted((bisect.bisect_right(self._words, (word + '\uffff',)) - bisect.bisect_left(self._words, (word,)),
+                             index) for index, word in enumerate(words))
+            first = words[ranges[0][1]]
+            others = [word for index, word in enumerate(words) if index != ranges[0][1]]
+            position = bisect.bisect_left(self._words, (first,))
+            while position < len(self._words) and len(results) < limit:
+                word, item_id = self._words[position]
+                if not word.startswith(first):
+                    break
+                position += 1
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+                item_words = self._item_words[item_id]
+                if all(any(w.startswith(other) for w in item_words) for other in others):
+                    results.append(self._items[item_id])
+        return results
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_LOCK = threading.Lock()
+_INDEXES: Dict[str, ItemIndex] = {}
+
+
+def get_index(merchant_id: str) -> ItemIndex:
+    """The merchant's item index, up to date with the cached catalog"""
+    with _LOCK:
+        index = _INDEXES.get(merchant_id)
+        if index is None:
+            index = _INDEXES[merchant_id] = ItemIndex()
+    index.follow(catalog.items.get_all(merchant_id))
+    return index
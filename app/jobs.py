@@ -0,0 +1,432 @@
+"""Durable background jobs that apply one operation to many records.
+
+A job's work items are written to a local SQLite journal when the job is
+created and then processed on a background thread with bounded concurrency.
+Calls still go through the per-merchant rate limiter. Every item's outcome is
+recorded as it completes, so progress and per-item failures can be read while
+the job runs, and a job interrupted by a restart carries on with the items
+that were not finished.
+
+Several processes may share the journal. A process only runs a job after
+claiming it with a conditional update that records the owner and a lease,
+renewed as outcomes are recorded; a job whose lease expired (its process
+died) can be claimed again on startup or resume.
+
+Job kinds register a handler ``handler(merchant_id, params, payload)`` that
+performs one item and returns an optional JSON-serializable result, raising
+an exception to mark the item failed. Items that take several calls can be
+registered with ``checkpointed=True``; their handler also receives a
+Checkpoint to record partial progress, which is passed back when the item
+is retried so finished steps are not repeated.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.concurrency import run_bounded
+
+_LOCK = threading.Lock()
+_DB_FILE = os.path.join(os.path.dirname(__file__), '..', 'jobs.db')
+_DB_FILE = os.path.abspath(_DB_FILE)
+
+# Items are claimed from the journal in chunks of this size; a cancel takes effect between chunks
+_CHUNK_SIZE = 50
+# Item outcomes are written once this many have accumulated or this much time has passed
+_FLUSH_SIZE = 50
+_FLUSH_SECONDS = 1.0
+# Items journaled per transaction while a job is created
+_INSERT_BATCH_SIZE = 1000
+
+# Identifies this process's claims in the shared journal
+_OWNER = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+# How long a claimed job is reserved for its owner without progress
+_LEASE_SECONDS = 120
+
+RUNNING = 'running'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+Handler = Callable[..., Any]
+
+_HANDLERS: Dict[str, Handler] = {}
+_CHECKPOINTED = set()
+_RUNNERS: Dict[str, threading.Thread] = {}
+
+_JOB_COLUMNS = ('id', 'kind', 'merchant_id', 'params', 'status', 'total', 'succeeded', 'failed',
+                'created_at', 'updated_at', 'started_at', 'finished_at')
+_ITEM_COLUMNS = ('seq', 'item_key', 'status', 'attempts', 'error', 'result', 'updated_at')
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(_DB_FILE, timeout=30)
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS jobs ('
+        ' id TEXT PRIMARY KEY,'
+        ' kind TEXT NOT NULL,'
+        ' merchant_id TEXT NOT NULL,'
+        ' params TEXT NOT NULL,'
+        ' status TEXT NOT NULL,'
+        ' total INTEGER NOT NULL,'
+        ' succeeded INTEGER NOT NULL DEFAULT 0,'
+        ' failed INTEGER NOT NULL DEFAULT 0,'
+        ' created_at REAL NOT NULL,'
+        ' updated_at REAL NOT NULL,'
+        ' started_at REAL,'
+        ' finished_at REAL,'
+        ' owner TEXT,'
+        ' lease_until REAL)'
+    )
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS job_items ('
+        ' job_id TEXT NOT NULL,'
+        ' seq INTEGER NOT NULL,'
+        ' item_key TEXT NOT NULL,'
+        ' payload TEXT NOT NULL,'
+        ' status TEXT NOT NULL,'
+        ' attempts INTEGER NOT NULL DEFAULT 0,'
+        ' error TEXT,'
+        ' result TEXT,'
+        ' checkpoint TEXT,'
+        ' updated_at REAL NOT NULL,'
+        ' PRIMARY KEY (job_id, seq))'
+    )
+    # Journals created before items were checkpointed or jobs were leased lack those columns
+    if 'checkpoint' not in {row[1] for row in conn.execute('PRAGMA table_info(job_items)')}:
+        conn.execute('ALTER TABLE job_items ADD COLUMN checkpoint TEXT')
+    job_columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+    for column, kind in (('owner', 'TEXT'), ('lease_until', 'REAL')):
+        if column not in job_columns:
+            conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {kind}')
+    conn.execute('CREATE INDEX IF NOT EXISTS job_items_status ON job_items (job_id, status, seq)')
+    return conn
+
+
+def register(kind: str, handler: Handler, checkpointed: bool = False) -> None:
+    """Register the handler that processes one item of a job kind"""
+    _HANDLERS[kind] = handler
+    if checkpointed:
+        _CHECKPOINTED.add(kind)
+
+
+class Checkpoint(dict):
+    """Partial progress of one job item, persisted by save()"""
+
+    def __init__(self, job_id: str, seq: int, state: Optional[str]):
+        super().__init__(json.loads(state) if state else {})
+        self._job_id = job_id
+        self._seq = seq
+
+    def save(self) -> None:
+        with _LOCK:
+            conn = _connect()
+            try:
+                with conn:
+                    conn.execute('UPDATE job_items SET checkpoint = ? WHERE job_id = ? AND seq = ?',
+                                 (json.dumps(self), self._job_id, self._seq))
+            finally:
+                conn.close()
+
+
+def _job_dict(row) -> Dict[str, Any]:
+    job = dict(zip(_JOB_COLUMNS, row))
+    job['params'] = json.loads(job['params'])
+    job['pending'] = job['total'] - job['succeeded'] - job['failed']
+    if job['started_at']:
+        elapsed = (job['finished_at'] or time.time()) - job['started_at']
+        job['elapsedSeconds'] = round(elapsed, 3)
+        job['itemsPerSecond'] = round((job['succeeded'] + job['failed']) / elapsed, 2) if elapsed > 0 else None
+    return job
+
+
+def _item_dict(row) -> Dict[str, Any]:
+    item = dict(zip(_ITEM_COLUMNS, row))
+    item['result'] = json.loads(item['result']) if item['result'] else None
+    return item
+
+
+def create_job(kind: str, merchant_id: str, params: Dict[str, Any],
+               items: Iterable[Tuple[str, Any]]) -> Dict[str, Any]:
+    """
+    Journal a job's (key, payload) items and start processing them in the
+    background. Items are consumed lazily, so they can be streamed from a
+    request body without holding them all in memory.
+    """
+    if kind not in _HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    job_id = f"J-{uuid.uuid4().hex}"
+    now = time.time()
+    count = 0
+
+    def insert(rows, job_row=None):
+        with _LOCK:
+            conn = _connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        'INSERT INTO job_items (job_id, seq, item_key, payload, status, updated_at)'
+                        ' VALUES (?, ?, ?, ?, ?, ?)',
+                        rows
+                    )
+                    if job_row is not None:
+                        conn.execute(
+                            f"INSERT INTO jobs ({', '.join(_JOB_COLUMNS[:6])}, created_at, updated_at)"
+                            ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                            job_row
+                        )
+            finally:
+                conn.close()
+
+    # Items are written in batches so a slow stream does not hold the lock;
+    # the job row goes in last, so an interrupted upload never starts.
+    batch = []
+    for key, payload in items:
+        batch.append((job_id, count, str(key), json.dumps(payload), PENDING, now))
+        count += 1
+        if len(batch) >= _INSERT_BATCH_SIZE:
+            insert(batch)
+            batch = []
+    insert(batch, (job_id, kind, merchant_id, json.dumps(params), RUNNING, count, now, now))
+    _start(job_id)
+    return get_job(job_id)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with _LOCK:
+        conn = _connect()
+        try:
+            row = conn.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+    return _job_dict(row) if row else None
+
+
+def list_jobs(kind: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    """Most recent jobs first, optionally of one kind"""
+    query = f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs"
+    args: List[Any] = []
+    if kind:
+        query += ' WHERE kind = ?'
+        args.append(kind)
+    query += ' ORDER BY created_at DESC LIMIT ?'
+    args.append(int(limit))
+    with _LOCK:
+        conn = _connect()
+        try:
+            rows = conn.execute(query, args).fetchall()
+        finally:
+            conn.close()
+    return [_job_dict(row) for row in rows]
+
+
+def list_items(job_id: str, status: Optional[str] = None, limit: int = 100,
+               offset: int = 0) -> List[Dict[str, Any]]:
+    """A job's items in submission order, optionally filtered by status"""
+    query = f"SELECT {', '.join(_ITEM_COLUMNS)} FROM job_items WHERE job_id = ?"
+    args: List[Any] = [job_id]
+    if status:
+        query += ' AND status = ?'
+        args.append(status)
+    query += ' ORDER BY seq LIMIT ? OFFSET ?'
+    args += [int(limit), int(offset)]
+    with _LOCK:
+        conn = _connect()
+        try:
+            rows = conn.execute(query, args).fetchall()
+        finally:
+            conn.close()
+    return [_item_dict(row) for row in rows]
+
+
+def _set_status(job_id: str, status: str, **values) -> None:
+    values.update(status=status, updated_at=time.time())
+    assignments = ', '.join(f'{column} = ?' for column in values)
+    with _LOCK:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', list(values.values()) + [job_id])
+        finally:
+            conn.close()
+
+
+def cancel_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Stop a running job after the items already in flight; it can be resumed later"""
+    job = get_job(job_id)
+    if job is not None and job['status'] == RUNNING:
+        _set_status(job_id, CANCELLED)
+    return get_job(job_id)
+
+
+def resume_job(job_id: str, retry_failed: bool = False) -> Optional[Dict[str, Any]]:
+    """Restart a job's pending items, and optionally its failed ones"""
+    if get_job(job_id) is None:
+        return None
+    with _LOCK:
+        conn = _connect()
+        try:
+            with conn:
+                if retry_failed:
+                    conn.execute('UPDATE job_items SET status = ? WHERE job_id = ? AND status = ?',
+                                 (PENDING, job_id, FAILED))
+                    conn.execute(
+                        'UPDATE jobs SET failed = 0, finished_at = NULL WHERE id = ?', (job_id,))
+                conn.execute('UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?',
+                             (RUNNING, time.time(), job_id))
+        finally:
+            conn.close()
+    _start(job_id)
+    return get_job(job_id)
+
+
+def _claim(job_id: str) -> bool:
+    """Take or renew the lease on a running job, unless another process holds a live one"""
+    now = time.time()
+    with _LOCK:
+        conn = _connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    'UPDATE jobs SET owner = ?, lease_until = ? WHERE id = ? AND status = ?'
+                    ' AND (owner IS NULL OR owner = ? OR COALESCE(lease_until, 0) < ?)',
+                    (_OWNER, now + _LEASE_SECONDS, job_id, RUNNING, _OWNER, now)
+                )
+                return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+
+def _release(job_id: str) -> None:
+    with _LOCK:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute('UPDATE jobs SET owner = NULL, lease_until = NULL WHERE id = ? AND owner = ?',
+                             (job_id, _OWNER))
+        finally:
+            conn.close()
+
+
+def _pending_chunk(job_id: str):
+    with _LOCK:
+        conn = _connect()
+        try:
+            status = conn.execute('SELECT status, owner FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if status is None or status[0] != RUNNING or status[1] != _OWNER:
+                return None
+            return conn.execute(
+                'SELECT seq, payload, attempts, checkpoint FROM job_items WHERE job_id = ? AND status = ?'
+                ' ORDER BY seq LIMIT ?',
+                (job_id, PENDING, _CHUNK_SIZE)
+            ).fetchall()
+        finally:
+            conn.close()
+
+
+def _record(job_id: str, outcomes: List[Tuple[int, int, Any, Optional[Exception]]]) -> None:
+    """Store (seq, attempts, result, error) outcomes and bump the job's counters in one transaction"""
+    now = time.time()
+    failed = sum(1 for _, _, _, error in outcomes if error is not None)
+    with _LOCK:
+        conn = _connect()
+        try:
+            with conn:
+                # A process whose lease lapsed leaves the items to the new owner
+                owner = conn.execute('SELECT owner FROM jobs WHERE id = ?', (job_id,)).fetchone()
+                if owner is None or owner[0] != _OWNER:
+                    return
+                conn.executemany(
+                    'UPDATE job_items SET status = ?, attempts = ?, error = ?, result = ?, updated_at = ?'
+                    ' WHERE job_id = ? AND seq = ?',
+                    [(FAILED if error is not None else DONE, attempts + 1,
+                      str(error) if error is not None else None,
+                      json.dumps(result) if result is not None else None, now, job_id, seq)
+                     for seq, attempts, result, error in outcomes]
+                )
+                conn.execute('UPDATE jobs SET succeeded = succeeded + ?, failed = failed + ?, updated_at = ?,'
+                             ' lease_until = ? WHERE id = ? AND owner = ?',
+                             (len(outcomes) - failed, failed, now, now + _LEASE_SECONDS, job_id, _OWNER))
+        finally:
+            conn.close()
+
+
+def _run(job_id: str) -> None:
+    job = get_job(job_id)
+    handler = _HANDLERS.get(job['kind'])
+    if handler is None:
+        print(f"No handler registered for job {job_id} of kind {job['kind']}")
+        return
+    if job['started_at'] is None:
+        _set_status(job_id, RUNNING, started_at=time.time())
+
+    while True:
+        # Renew the lease between chunks; fails once the job is cancelled or taken over
+        if not _claim(job_id):
+            return
+        chunk = _pending_chunk(job_id)
+        if chunk is None:
+            return
+        if not chunk:
+            _set_status(job_id, COMPLETED, finished_at=time.time())
+            return
+
+        def process(row):
+            if job['kind'] in _CHECKPOINTED:
+                return handler(job['merchant_id'], job['params'], json.loads(row[1]),
+                               Checkpoint(job_id, row[0], row[3]))
+            return handler(job['merchant_id'], job['params'], json.loads(row[1]))
+
+        # Outcomes are journaled in small batches rather than one commit per item
+        outcomes = []
+        flushed_at = time.time()
+        for index, result, error in run_bounded(process, chunk):
+            seq, _, attempts, _ = chunk[index]
+            outcomes.append((seq, attempts, result, error))
+            if len(outcomes) >= _FLUSH_SIZE or time.time() - flushed_at >= _FLUSH_SECONDS:
+                _record(job_id, outcomes)
+                outcomes, flushed_at = [], time.time()
+        if outcomes:
+            _record(job_id, outcomes)
+
+
+def _run_guarded(job_id: str) -> None:
+    try:
+        if not _claim(job_id):
+            # Another process is running it
+            return
+        _run(job_id)
+    except Exception as e:
+        # Leave the job running in the journal so it is picked up again on restart
+        print(f"Job {job_id} stopped: {str(e)}")
+    finally:
+        try:
+            _release(job_id)
+        except Exception as e:
+            print(f"Job {job_id} release failed: {str(e)}")
+
+
+def _start(job_id: str) -> None:
+    with _LOCK:
+        runner = _RUNNERS.get(job_id)
+        if runner is not None and runner.is_alive():
+            return
+        runner = _RUNNERS[job_id] = threading.Thread(
+            target=_run_guarded, args=(job_id,), name=f'job-{job_id}', daemon=True)
+        runner.start()
+
+
+def resume_running() -> None:
+    """Restart jobs that were still running when the previous process stopped"""
+    if not os.path.exists(_DB_FILE):
+        return
+    for job in list_jobs(limit=1000):
+        if job['status'] == RUNNING and job['kind'] in _HANDLERS:
+            _start(job['id'])
@@ -0,0 +1,198 @@
+"""Indexed in-memory mirrors of synced collections for local filter evaluation.
+
+Each mirror keeps the latest synced version of every record, a sorted index
+on the collection's creation timestamp and hash indexes on commonly filtered
+fields. Records deleted through the API, or synced as deleted, are removed.
+Customers are not mirrored: they have no modification time, so edits would
+never reach the mirror. A filtered list read is answered locally when the mirror is known to
+hold every record the filter can match (its lower time bound falls inside the
+synced window and the last sync is recent enough); otherwise the caller falls
+back to Clover.
+"""
+
+import bisect
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app import sync
+from app.config import Config
+from app.filters import Predicate, get_path, lower_bound, matches_all, parse_filters, time_range
+
+# 'filterable' lists the fields synced records always carry; a filter on any
+# other field (e.g. an expansion the sync does not request) goes to Clover
+COLLECTIONS: Dict[str, Dict[str, Any]] = {
+    'orders': {
+        'sort_field': 'createdTime',
+        'indexed': ('state', 'paymentState', 'employee.id', 'orderType.id'),
+        'filterable': frozenset((
+            'id', 'createdTime', 'modifiedTime', 'clientCreatedTime', 'state', 'paymentState', 'total',
+            'currency', 'title', 'note', 'manualTransaction', 'testMode', 'employee.id', 'orderType.id',
+            'device.id',
+        )),
+    },
+    'payments': {
+        'sort_field': 'createdTime',
+        'indexed': ('result', 'order.id', 'tender.id', 'employee.id'),
+        'filterable': frozenset((
+            'id', 'createdTime', 'modifiedTime', 'clientCreatedTime', 'result', 'amount', 'tipAmount',
+            'taxAmount', 'cashbackAmount', 'offline', 'externalPaymentId', 'order.id', 'tender.id',
+            'employee.id', 'device.id', 'cardTransaction.cardType', 'cardTransaction.last4',
+        )),
+    },
+}
+
+
+def _index_key(value: Any) -> Optional[str]:
+    """Filter literals arrive untyped, so index values by their filter spelling"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+class LocalMirror:
+    """Latest synced records of one collection for one merchant"""
+
+    def __init__(self, sort_field: str, indexed_fields=()):
+        self.sort_field = sort_field
+        self.indexed_fields = tuple(indexed_fields)
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Any]] = {}
+        # (sort timestamp, id), ascending
+        self._sorted: List[Tuple[int, str]] = []
+        # field -> value -> ids
+        self._indexes: Dict[str, Dict[Any, Set[str]]] = {field: {} for field in self.indexed_fields}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        return self._records.get(record_id)
+
+    def _sort_key(self, record: Dict[str, Any]) -> Tuple[int, str]:
+        return (int(record.get(self.sort_field) or 0), record['id'])
+
+    def _unindex(self, record: Dict[str, Any]) -> None:
+        key = self._sort_key(record)
+        position = bisect.bisect_left(self._sorted, key)
+        if position < len(self._sorted) and self._sorted[position] == key:
+            del self._sorted[position]
+        for field, index in self._indexes.items():
+            value = _index_key(get_path(record, field))
+            ids = index.get(value)
+            if ids is not None:
+                ids.discard(record['id'])
+                if not ids:
+                    del index[value]
+
+    def upsert(self, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for record in records:
+                record_id = record.get('id')
+                if not record_id:
+                    continue
+                previous = self._records.pop(record_id, None)
+                if previous is not None:
+                    self._unindex(previous)
+                if record.get('deleted') or record.get('state') == 'deleted':
+                    continue
+                self._records[record_id] = record
+                bisect.insort(self._sorted, self._sort_key(record))
+                for field, index in self._indexes.items():
+                    index.setdefault(_index_key(get_path(record, field)), set()).add(record_id)
+
+    def remove(self, record_ids: List[str]) -> None:
+        with self._lock:
+            for record_id in record_ids:
+                previous = self._records.pop(record_id, None)
+                if previous is not None:
+                    self._unindex(previous)
+
+    def _candidates(self, predicates: List[Predicate]) -> List[str]:
+        """Smallest id set an index can narrow the predicates down to"""
+        best: Optional[List[str]] = None
+        for predicate in predicates:
+            if predicate.op == '=' and predicate.field in self._indexes:
+                ids = self._indexes[predicate.field].get(_index_key(predicate.value), ())
+                if best is None or len(ids) < len(best):
+                    best = list(ids)
+
+        start, end = time_range(predicates, self.sort_field)
+        if start is not None or end is not None:
+            first = bisect.bisect_left(self._sorted, (start, '')) if start is not None else 0
+            last = bisect.bisect_right(self._sorted, (end, '\uffff')) if end is not None else len(self._sorted)
+            if best is None or last - first < len(best):
+                best = [record_id for _, record_id in self._sorted[first:last]]
+
+        return best if best is not None else list(self._records)
+
+    def query(self, predicates: List[Predicate], limit: int = 100,
+              offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Records matching every predicate, newest first, with the total match count"""
+        with self._lock:
+            matches = [self._records[record_id] for record_id in self._candidates(predicates)
+                       if matches_all(self._records[record_id], predicates)]
+        matches.sort(key=self._sort_key, reverse=True)
+        return matches[offset:offset + limit], len(matches)
+
+
+_LOCK = threading.Lock()
+_MIRRORS: Dict[Tuple[str, str], LocalMirror] = {}
+
+
+def get_mirror(merchant_id: str, collection: str) -> LocalMirror:
+    key = (merchant_id, collection)
+    with _LOCK:
+        mirror = _MIRRORS.get(key)
+        if mirror is None:
+            spec = COLLECTIONS[collection]
+            mirror = _MIRRORS[key] = LocalMirror(spec['sort_field'], spec['indexed'])
+        return mirror
+
+
+def query(merchant_id: str, collection: str, clauses: List[str], limit: Any = 100, offset: Any = 0,
+          expand: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Evaluate Clover filter clauses against the local mirror.
+
+    Returns a Clover-style list result, or None when the mirror cannot answer
+    faithfully (never synced, stale, filter syntax not understood, a filter on
+    a field synced records do not carry, requested expansion not synced, or a
+    time range reaching before the synced window).
+    """
+    coverage = sync.get_coverage(merchant_id, collection)
+    if coverage is None or time.time() - coverage['syncedAt'] > Config.LOCAL_FILTER_MAX_STALENESS_SECONDS:
+        return None
+    if expand:
+        synced = set((sync.SOURCES[collection].get('expand') or '').split(','))
+        if not {part.strip() for part in expand.split(',') if part.strip()} <= synced:
+            return None
+    try:
+        predicates = parse_filters(clauses)
+        limit, offset = int(limit), int(offset)
+    except ValueError:
+        return None
+    spec = COLLECTIONS[collection]
+    if any(predicate.field not in spec['filterable'] for predicate in predicates):
+        return None
+
+    # Records modified since syncedFrom are all present, and a record is modified no earlier than it was created
+    bound = lower_bound(predicates, [spec['sort_field'], sync.SOURCES[collection]['time_field']])
+    if coverage['syncedFrom'] > 0 and (bound is None or bound < coverage['syncedFrom']):
+        return None
+
+    elements, total = get_mirror(merchant_id, collection).query(predicates, limit, offset)
+    return {'elements': elements, 'total': total}
+
+
+def _listener(collection: str):
+    def upsert(merchant_id: str, records: List[Dict[str, Any]]) -> None:
+        get_mirror(merchant_id, collection).upsert(records)
+    upsert.__name__ = f'mirror_{collection}'
+    return upsert
+
+
+for _collection in COLLECTIONS:
+    sync.add_listener(_collection, _listener(_collection))
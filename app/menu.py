@@ -0,0 +1,165 @@
+"""Precomputed menu tree: categories -> items -> modifier groups.
+
+The tree is assembled from the cached catalog collections and kept as a
+serialized JSON document with an ETag, so a menu load is one cached response
+that clients can revalidate with If-None-Match.
+
+Rebuilds are incremental. The catalog cache swaps in a new dict whenever a
+collection is reloaded or written through, so an unchanged collection is
+detected by identity. When one does change, only the records that differ
+from the previous copy are rebuilt: their item or modifier group nodes, and
+the item lists of the categories they join or leave. If nothing differs, the
+document and its ETag are kept.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app import catalog
+
+# Menu entry for items that belong to no category
+UNCATEGORIZED = {'id': None, 'name': 'Uncategorized', 'sortOrder': None}
+
+
+def _refs(record: Dict[str, Any], field: str) -> List[str]:
+    return [ref['id'] for ref in (record.get(field) or {}).get('elements', []) if ref.get('id')]
+
+
+def _group_node(group: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'id': group['id'],
+        'name': group.get('name'),
+        'minRequired': group.get('minRequired'),
+        'maxAllowed': group.get('maxAllowed'),
+        'modifiers': [
+            {'id': m['id'], 'name': m.get('name'), 'price': m.get('price'), 'available': m.get('available')}
+            for m in (group.get('modifiers') or {}).get('elements', [])
+        ],
+    }
+
+
+class MenuTree:
+    """The menu document of one merchant and the nodes it is assembled from"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # The catalog copies the nodes were last built from
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._categories: Dict[str, Dict[str, Any]] = {}
+        self._groups: Dict[str, Dict[str, Any]] = {}
+        self._item_nodes: Dict[str, Dict[str, Any]] = {}
+        self._group_nodes: Dict[str, Dict[str, Any]] = {}
+        # Category id (None for uncategorized) -> ids of its visible items
+        self._members: Dict[Optional[str], Set[str]] = {}
+        # Modifier group id -> ids of items using it
+        self._group_users: Dict[str, Set[str]] = {}
+        self._body: Optional[bytes] = None
+        self._etag: Optional[str] = None
+
+    def _unlink_item(self, item_id: str) -> None:
+        item = self._items.get(item_id)
+        if item is None:
+            return
+        for category_id in _refs(item, 'categories') or [None]:
+            self._members.get(category_id, set()).discard(item_id)
+        for group_id in _refs(item, 'modifierGroups'):
+            self._group_users.get(group_id, set()).discard(item_id)
+        self._item_nodes.pop(item_id, None)
+
+    def _link_item(self, item: Dict[str, Any]) -> None:
+        for group_id in _refs(item, 'modifierGroups'):
+            self._group_users.setdefault(group_id, set()).add(item['id'])
+        if item.get('hidden'):
+            return
+        for category_id in _refs(item, 'categories') or [None]:
+            self._members.setdefault(category_id, set()).add(item['id'])
+        self._item_nodes[item['id']] = self._item_node(item)
+
+    def _item_node(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': item['id'],
+            'name': item.get('name'),
+            'price': item.get('price'),
+            'priceType': item.get('priceType'),
+            'available': item.get('available'),
+            'modifierGroups': [self._group_nodes[g] for g in _refs(item, 'modifierGroups') if g in self._group_nodes],
+        }
+
+    def _update(self, items, categories, groups) -> bool:
+        """Apply catalog changes to the nodes; returns whether anything changed"""
+        changed_groups = catalog.changed_ids(self._groups, groups)
+        for group_id in changed_groups:
+            if group_id in groups:
+                self._group_nodes[group_id] = _group_node(groups[group_id])
+            else:
+                self._group_nodes.pop(group_id, None)
+
+        changed_items = catalog.changed_ids(self._items, items)
+        for group_id in changed_groups:
+            changed_items |= self._group_users.get(group_id, set())
+        for item_id in changed_items:
+            self._unlink_item(item_id)
+        self._items = items
+        for item_id in changed_items:
+            if item_id in items:
+                self._link_item(items[item_id])
+
+        changed_categories = catalog.changed_ids(self._categories, categories)
+        self._categories, self._groups = categories, groups
+        return bool(changed_groups or changed_items or changed_categories)
+
+    def _render(self) -> None:
+        def item_key(item_id):
+            node = self._item_nodes[item_id]
+            return ((node['name'] or '').lower(), item_id)
+
+        categories = sorted(self._categories.values(),
+                            key=lambda c: (c.get('sortOrder') is None, c.get('sortOrder') or 0,
+                                           (c.get('name') or '').lower()))
+        # Items whose only categories were deleted are listed as uncategorized
+        uncategorized = set(self._members.get(None, ()))
+        for category_id, members in self._members.items():
+            if category_id is not None and category_id not in self._categories:
+                uncategorized |= {i for i in members
+                                  if not any(c in self._categories for c in _refs(self._items[i], 'categories'))}
+        tree = []
+        for category in categories + [UNCATEGORIZED]:
+            members = self._members.get(category['id']) if category is not UNCATEGORIZED else uncategorized
+            if not members and category is UNCATEGORIZED:
+                continue
+            tree.append({
+                'id': category['id'],
+                'name': category.get('name'),
+                'sortOrder': category.get('sortOrder'),
+                'items': [self._item_nodes[i] for i in sorted(members or (), key=item_key)],
+            })
+        body = {'builtAt': int(time.time() * 1000), 'categories': tree}
+        self._body = json.dumps(body, separators=(',', ':')).encode('utf-8')
+        # The ETag covers the tree only, not when it was built
+        digest = hashlib.sha1(json.dumps(tree, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+        self._etag = digest.hexdigest()
+
+    def document(self, items, categories, groups) -> Tuple[bytes, str]:
+        """The serialized menu and its ETag, updated first if the catalog changed"""
+        with self._lock:
+            unchanged = items is self._items and categories is self._categories and groups is self._groups
+            if not unchanged and self._update(items, categories, groups) or self._body is None:
+                self._render()
+            return self._body, self._etag
+
+
+_LOCK = threading.Lock()
+_MENUS: Dict[str, MenuTree] = {}
+
+
+def get_menu(merchant_id: str) -> Tuple[bytes, str]:
+    """The merchant's menu document and ETag. Raises requests.HTTPError if the catalog cannot be loaded."""
+    with _LOCK:
+        menu = _MENUS.get(merchant_id)
+        if menu is None:
+            menu = _MENUS[merchant_id] = MenuTree()
+    return menu.document(catalog.items.get_all(merchant_id), catalog.categories.get_all(merchant_id),
+                         catalog.modifier_groups.get_all(merchant_id))
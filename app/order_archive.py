@@ -0,0 +1,266 @@
+"""Append-only, memory-mapped archive of synced orders.
+
+Each merchant has one archive file of records laid out as
+
+    <order id>\\t<createdTime>\\t<body length>\\n<JSON body>\\n
+
+Records are only ever appended; a re-synced order simply gets a newer record
+and the index points at it, unless it is unchanged. An order changed or
+deleted through the API gets a tombstone (a record with an empty body), so it
+is read from Clover until the sync archives it again. Once superseded records
+take up more than half the file, the live records are rewritten to a new file.
+
+Opening an archive scans the short headers to rebuild an in-memory offset
+index by order id and by createdTime day, skipping over the bodies, so the
+orders themselves stay on disk and are read through the memory map only when
+requested.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import sync
+from app.config import Config
+
+_DAY_MS = 86400000
+
+# Expansions present in archived orders, as synced
+EXPAND = frozenset(sync.SOURCES['orders']['expand'].split(','))
+
+# Archives smaller than this are never compacted
+_COMPACT_MIN_BYTES = 1 << 20
+
+
+def missing(expand: str) -> List[str]:
+    """Expansions of a Clover expand value that archived orders do not hold"""
+    return sorted({part.strip() for part in (expand or '').split(',') if part.strip()} - EXPAND)
+
+
+def covers(expand: str) -> bool:
+    """Whether archived orders hold every expansion of a Clover expand value"""
+    return not missing(expand)
+
+
+def _header(order_id: str, created: int, length: int) -> bytes:
+    return f"{order_id}\t{created}\t{length}\n".encode('utf-8')
+
+
+class OrderArchive:
+    """Archive file and offset index for one merchant"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # order id -> (body offset, body length, createdTime)
+        self._by_id: Dict[str, Tuple[int, int, int]] = {}
+        # day number -> order ids created that day
+        self._by_day: Dict[int, set] = {}
+        self._days: List[int] = []
+        self._size = 0
+        # Bytes taken by the records the index points at
+        self._live = 0
+        self._mm: Optional[mmap.mmap] = None
+        self._file = None
+        if os.path.exists(path):
+            self._load_index()
+
+    def _forget(self, order_id: str) -> None:
+        previous = self._by_id.pop(order_id, None)
+        if previous is not None:
+            day = previous[2] // _DAY_MS
+            self._by_day[day].discard(order_id)
+            if not self._by_day[day]:
+                del self._by_day[day]
+                del self._days[bisect.bisect_left(self._days, day)]
+            self._live -= len(_header(order_id, previous[2], previous[1])) + previous[1] + 1
+
+    def _index(self, order_id: str, offset: int, length: int, created: int) -> None:
+        self._forget(order_id)
+        self._by_id[order_id] = (offset, length, created)
+        self._live += len(_header(order_id, created, length)) + length + 1
+        day = created // _DAY_MS
+        if day not in self._by_day:
+            self._by_day[day] = set()
+            bisect.insort(self._days, day)
+        self._by_day[day].add(order_id)
+
+    def _load_index(self) -> None:
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                position = 0
+                while position < size:
+                    end = mm.find(b'\n', position)
+                    if end < 0:
+                        break
+                    try:
+                        order_id, created, length = mm[position:end].decode('utf-8').split('\t')
+                        length = int(length)
+                    except ValueError:
+                        break
+                    body = end + 1
+                    if body + length + 1 > size:
+                        # Truncated final record from an interrupted write
+                        break
+                    if length:
+                        self._index(order_id, body, length, int(created))
+                    else:
+                        self._forget(order_id)
+                    position = body + length + 1
+                self._size = position
+        if self._size < size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(self._size)
+        self._compact_if_sparse()
+
+    def _write(self, records: List[Tuple[str, int, bytes]]) -> None:
+        """Append (order id, createdTime, body) records; an empty body is a tombstone"""
+        if not records:
+            return
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, 'ab')
+        chunks = []
+        entries = []
+        position = self._size
+        for order_id, created, body in records:
+            header = _header(order_id, created, len(body))
+            chunks.append(header + body + b'\n')
+            entries.append((order_id, position + len(header), len(body), created))
+            position += len(header) + len(body) + 1
+        self._file.write(b''.join(chunks))
+        self._file.flush()
+        self._size = position
+        for order_id, offset, length, created in entries:
+            if length:
+                self._index(order_id, offset, length, created)
+            else:
+                self._forget(order_id)
+        self._compact_if_sparse()
+
+    def _compact_if_sparse(self) -> None:
+        """Rewrite the live records to a new file once most of the file is superseded"""
+        if self._size < _COMPACT_MIN_BYTES or self._live * 2 > self._size:
+            return
+        entries = sorted((offset, length, created, order_id)
+                         for order_id, (offset, length, created) in self._by_id.items())
+        compacted = self.path + '.compact'
+        by_id = {}
+        position = 0
+        with open(self.path, 'rb') as source, open(compacted, 'wb') as target:
+            for offset, length, created, order_id in entries:
+                source.seek(offset)
+                header = _header(order_id, created, length)
+                target.write(header + source.read(length) + b'\n')
+                by_id[order_id] = (position + len(header), length, created)
+                position += len(header) + length + 1
+            target.flush()
+            os.fsync(target.fileno())
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        os.replace(compacted, self.path)
+        # Same orders and days, new offsets
+        self._by_id = by_id
+        self._size = self._live = position
+
+    def append(self, orders: List[Dict[str, Any]]) -> None:
+        """Append orders to the archive, superseding earlier records for the same ids"""
+        with self._lock:
+            records = []
+            for order in orders:
+                if not order.get('id'):
+                    continue
+                body = json.dumps(order, separators=(',', ':')).encode('utf-8')
+                # A restart re-syncs the lookback window; unchanged orders are not written again
+                entry = self._by_id.get(order['id'])
+                if entry is not None and entry[1] == len(body) and self._read_bytes(entry[0], entry[1]) == body:
+                    continue
+                records.append((order['id'], int(order.get('createdTime') or 0), body))
+            self._write(records)
+
+    def remove(self, order_ids: List[str]) -> None:
+        """Tombstone archived orders so they are read from Clover until re-archived"""
+        with self._lock:
+            self._write([(order_id, self._by_id[order_id][2], b'')
+                         for order_id in dict.fromkeys(order_ids) if order_id in self._by_id])
+
+    def _read_bytes(self, offset: int, length: int) -> bytes:
+        if self._mm is None or len(self._mm) < offset + length:
+            if self._mm is not None:
+                self._mm.close()
+            with open(self.path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm[offset:offset + length]
+
+    def _read(self, offset: int, length: int) -> Dict[str, Any]:
+        return json.loads(self._read_bytes(offset, length))
+
+    def created_time(self, order_id: str) -> Optional[int]:
+        entry = self._by_id.get(order_id)
+        return entry[2] if entry else None
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._by_id.get(order_id)
+            return self._read(entry[0], entry[1]) if entry else None
+
+    def query(self, start: Optional[int], end: Optional[int], limit: int = 100,
+              offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Orders with start <= createdTime < end, newest first. Returns the
+        requested page and the total number of matches.
+        """
+        with self._lock:
+            first = bisect.bisect_left(self._days, start // _DAY_MS) if start is not None else 0
+            last = bisect.bisect_right(self._days, (end - 1) // _DAY_MS) if end is not None else len(self._days)
+            matches = []
+            for day in self._days[first:last]:
+                for order_id in self._by_day[day]:
+                    body_offset, length, created = self._by_id[order_id]
+                    if (start is None or created >= start) and (end is None or created < end):
+                        matches.append((created, order_id, body_offset, length))
+            matches.sort(reverse=True)
+            page = [self._read(body_offset, length)
+                    for _, _, body_offset, length in matches[offset:offset + limit]]
+            return page, len(matches)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'orders': len(self._by_id),
+                'days': len(self._days),
+                'fileBytes': self._size,
+                'liveBytes': self._live,
+                'oldestDay': self._days[0] * _DAY_MS if self._days else None,
+                'newestDay': self._days[-1] * _DAY_MS if self._days else None,
+            }
+
+
+_LOCK = threading.Lock()
+_ARCHIVES: Dict[str, OrderArchive] = {}
+
+
+def get_archive(merchant_id: str) -> OrderArchive:
+    with _LOCK:
+        archive = _ARCHIVES.get(merchant_id)
+        if archive is None:
+            path = os.path.join(Config.ORDER_ARCHIVE_DIR, f'{merchant_id}.archive')
+            archive = _ARCHIVES[merchant_id] = OrderArchive(path)
+        return archive
+
+
+def archive_orders(merchant_id: str, orders: List[Dict[str, Any]]) -> None:
+    get_archive(merchant_id).append(orders)
+
+
+sync.add_listener('orders', archive_orders)
@@ -0,0 +1,60 @@
+"""LRU cache of expanded order documents, revalidated by modifiedTime.
+
+A cached expansion is served again only after a cheap unexpanded read of the
+order confirms its modifiedTime has not changed. Writes made through this
+service invalidate the order's entries directly.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.config import Config
+
+
+class OrderCache:
+    """Bounded LRU of order documents keyed by (merchant, order, expand)"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[str, str, str], Dict[str, Any]]' = OrderedDict()
+        self._expansions: Dict[Tuple[str, str], Set[str]] = {}
+
+    def get(self, merchant_id: str, order_id: str, expand: str) -> Optional[Dict[str, Any]]:
+        key = (merchant_id, order_id, expand)
+        with self._lock:
+            document = self._entries.get(key)
+            if document is not None:
+                self._entries.move_to_end(key)
+            return document
+
+    def put(self, merchant_id: str, order_id: str, expand: str, document: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        key = (merchant_id, order_id, expand)
+        with self._lock:
+            self._entries[key] = document
+            self._entries.move_to_end(key)
+            self._expansions.setdefault((merchant_id, order_id), set()).add(expand)
+            while len(self._entries) > self.max_entries:
+                (old_merchant, old_order, old_expand), _ = self._entries.popitem(last=False)
+                expansions = self._expansions.get((old_merchant, old_order))
+                if expansions is not None:
+                    expansions.discard(old_expand)
+                    if not expansions:
+                        del self._expansions[(old_merchant, old_order)]
+
+    def invalidate(self, merchant_id: str, order_id: str) -> None:
+        """Drop every cached expansion of an order"""
+        with self._lock:
+            for expand in self._expansions.pop((merchant_id, order_id), ()):
+                self._entries.pop((merchant_id, order_id, expand), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._expansions.clear()
+
+
+orders = OrderCache(Config.ORDER_CACHE_SIZE)
@@ -0,0 +1,115 @@
+"""Batched lookup of the payments of several orders.
+
+Each order's payments come from the synced payments mirror when it covers the
+order (its payments cannot predate the order, so the order's createdTime
+bounds the local query), and otherwise from one Clover request per order, run
+concurrently. Results are cached briefly per order and dropped as soon as a
+sync brings in a payment for that order.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from app import local_mirror, sync
+from app.api_utils import make_clover_request, build_merchant_url
+from app.concurrency import run_bounded
+from app.config import Config
+
+# Upper bound on cached orders; the oldest entries are evicted first
+_MAX_ENTRIES = 5000
+
+_LOCK = threading.Lock()
+_CACHE: 'OrderedDict[Tuple[str, str], Tuple[float, List[Dict[str, Any]]]]' = OrderedDict()
+
+
+def _cached(merchant_id: str, order_id: str):
+    key = (merchant_id, order_id)
+    with _LOCK:
+        entry = _CACHE.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del _CACHE[key]
+            return None
+        return entry[1]
+
+
+def _store(merchant_id: str, order_id: str, payments: List[Dict[str, Any]]) -> None:
+    if Config.ORDER_PAYMENTS_CACHE_TTL_SECONDS <= 0:
+        return
+    with _LOCK:
+        _CACHE[(merchant_id, order_id)] = (time.time() + Config.ORDER_PAYMENTS_CACHE_TTL_SECONDS, payments)
+        _CACHE.move_to_end((merchant_id, order_id))
+        while len(_CACHE) > _MAX_ENTRIES:
+            _CACHE.popitem(last=False)
+
+
+def invalidate(merchant_id: str, order_id: str) -> None:
+    with _LOCK:
+        _CACHE.pop((merchant_id, order_id), None)
+
+
+def _from_mirror(merchant_id: str, order_id: str):
+    order = local_mirror.get_mirror(merchant_id, 'orders').get(order_id)
+    if order is None or not order.get('createdTime'):
+        return None
+    result = local_mirror.query(merchant_id, 'payments',
+                                [f'order.id={order_id}', f"createdTime>={order['createdTime']}"], _MAX_ENTRIES)
+    return result['elements'] if result is not None else None
+
+
+def lookup(merchant_id: str, order_ids: List[str]) -> Dict[str, Any]:
+    """
+    Payments of each order id, as {'elements': {order id: payments},
+    'errors': {order id: message}, 'sources': counts by cache/local/clover}.
+    """
+    elements: Dict[str, List[Dict[str, Any]]] = {}
+    errors: Dict[str, str] = {}
+    sources = {'cache': 0, 'local': 0, 'clover': 0}
+    remote = []
+    for order_id in dict.fromkeys(order_ids):
+        payments = _cached(merchant_id, order_id)
+        if payments is not None:
+            elements[order_id] = payments
+            sources['cache'] += 1
+            continue
+        payments = _from_mirror(merchant_id, order_id)
+        if payments is not None:
+            elements[order_id] = payments
+            sources['local'] += 1
+            _store(merchant_id, order_id, payments)
+            continue
+        remote.append(order_id)
+
+    config = Config()
+
+    def fetch(order_id):
+        url = build_merchant_url(config, merchant_id, f'orders/{order_id}/payments')
+        return make_clover_request('GET', url, merchant_id)
+
+    for index, response, error in run_bounded(fetch, remote):
+        order_id = remote[index]
+        sources['clover'] += 1
+        if error is not None:
+            errors[order_id] = str(error)
+        elif response.status_code != 200:
+            errors[order_id] = f"Clover API error: {response.text}"
+        else:
+            elements[order_id] = response.json().get('elements', [])
+            _store(merchant_id, order_id, elements[order_id])
+
+    # Answer in the order the ids were asked for
+    elements = {order_id: elements[order_id] for order_id in dict.fromkeys(order_ids) if order_id in elements}
+    return {'elements': elements, 'errors': errors, 'sources': sources}
+
+
+def _invalidate_synced(merchant_id: str, payments: List[Dict[str, Any]]) -> None:
+    for payment in payments:
+        order_id = (payment.get('order') or {}).get('id')
+        if order_id:
+            invalidate(merchant_id, order_id)
+
+
+sync.add_listener('payments', _invalidate_synced)
@@ -0,0 +1,255 @@
+"""Durable write-behind queue for atomic order creation.
+
+Orders accepted in queue mode are appended to a local SQLite journal and
+acknowledged immediately with a local reference. A background drainer replays
+them to Clover in the order they were accepted, retrying transient failures
+(timeouts, 429 and 5xx responses) with exponential backoff, so an upstream
+outage delays orders instead of losing them.
+
+Several processes (the debug reloader, multiple workers) may drain the same
+journal. Each entry is claimed with a conditional update that records the
+owner and a lease before it is submitted, so only one process sends it. An
+entry whose lease expired (its process died mid-submission) is reclaimed.
+
+Delivery is at-least-once: an order that was being submitted when its process
+stopped is submitted again once the lease expires.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from app.config import Config
+
+_LOCK = threading.Lock()
+_DB_FILE = os.path.join(os.path.dirname(__file__), '..', 'order_queue.db')
+_DB_FILE = os.path.abspath(_DB_FILE)
+
+# Identifies this process's claims in the shared journal
+_OWNER = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+# How long a claimed entry is reserved for its owner; longer than one submission with retries
+_LEASE_SECONDS = 120
+
+_WAKE = threading.Event()
+_drainer: Optional[threading.Thread] = None
+
+QUEUED = 'queued'
+SUBMITTING = 'submitting'
+CREATED = 'created'
+FAILED = 'failed'
+
+_COLUMNS = ('seq', 'ref', 'merchant_id', 'status', 'attempts', 'order_id', 'last_error',
+            'response', 'created_at', 'updated_at', 'next_attempt_at')
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(_DB_FILE, timeout=30)
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS queued_orders ('
+        ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+        ' ref TEXT NOT NULL UNIQUE,'
+        ' merchant_id TEXT NOT NULL,'
+        ' payload TEXT NOT NULL,'
+        ' status TEXT NOT NULL,'
+        ' attempts INTEGER NOT NULL DEFAULT 0,'
+        ' order_id TEXT,'
+        ' last_error TEXT,'
+        ' response TEXT,'
+        ' created_at REAL NOT NULL,'
+        ' updated_at REAL NOT NULL,'
+        ' next_attempt_at REAL NOT NULL,'
+        ' owner TEXT,'
+        ' lease_until REAL)'
+    )
+    # Journals created before claims were leased lack the claim columns
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(queued_orders)')}
+    for column, kind in (('owner', 'TEXT'), ('lease_until', 'REAL')):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE queued_orders ADD COLUMN {column} {kind}')
+    conn.execute('CREATE INDEX IF NOT EXISTS queued_orders_status ON queued_orders (status, seq)')
+    return conn
+
+
+def _to_dict(row) -> Dict[str, Any]:
+    entry = dict(zip(_COLUMNS, row))
+    entry['response'] = json.loads(entry['response']) if entry['response'] else None
+    return entry
+
+
+def enqueue(merchant_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Persist an atomic order payload and return its queue entry"""
+    now = time.time()
+    ref = f"Q-{uuid.uuid4().hex}"
+    with _LOCK:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT INTO queued_orders'
+                    ' (ref, merchant_id, payload, status, created_at, updated_at, next_attempt_at)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (ref, merchant_id, json.dumps(payload), QUEUED, now, now, now)
+                )
+        finally:
+            conn.close()
+    start_drainer()
+    _WAKE.set()
+    return get_entry(ref)
+
+
+def get_entry(ref: str) -> Optional[Dict[str, Any]]:
+    """Get the status of a queued order by its local reference"""
+    with _LOCK:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM queued_orders WHERE ref = ?", (ref,)
+            ).fetchone()
+        finally:
+            conn.close()
+    return _to_dict(row) if row else None
+
+
+def list_entries(status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    """List queued orders, oldest first, optionally filtered by status"""
+    query = f"SELECT {', '.join(_COLUMNS)} FROM queued_orders"
+    args: List[Any] = []
+    if status:
+        query += ' WHERE status = ?'
+        args.append(status)
+    query += ' ORDER BY seq LIMIT ?'
+    args.append(limit)
+    with _LOCK:
+        conn = _connect()
+        try:
+            rows = conn.execute(query, args).fetchall()
+        finally:
+            conn.close()
+    return [_to_dict(row) for row in rows]
+
+
+def _next_pending():
+    """The head of the queue, or None if it is empty"""
+    with _LOCK:
+        conn = _connect()
+        try:
+            return conn.execute(
+                'SELECT seq, ref, merchant_id, payload, attempts, next_attempt_at, status, lease_until'
+                ' FROM queued_orders WHERE status IN (?, ?) ORDER BY seq LIMIT 1',
+                (QUEUED, SUBMITTING)
+            ).fetchone()
+        finally:
+            conn.close()
+
+
+def _claim(seq: int) -> bool:
+    """Atomically take an entry that is queued or whose previous claim expired"""
+    now = time.time()
+    with _LOCK:
+        conn = _connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    'UPDATE queued_orders SET status = ?, owner = ?, lease_until = ?, attempts = attempts + 1,'
+                    ' updated_at = ? WHERE seq = ? AND (status = ? OR (status = ? AND COALESCE(lease_until, 0) < ?))',
+                    (SUBMITTING, _OWNER, now + _LEASE_SECONDS, now, seq, QUEUED, SUBMITTING, now)
+                )
+                return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+
+def _update(seq: int, **values) -> None:
+    """Record the outcome of this process's claim; ignored if the claim was lost"""
+    values.update(updated_at=time.time(), owner=None, lease_until=None)
+    assignments = ', '.join(f'{column} = ?' for column in values)
+    with _LOCK:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(f'UPDATE queued_orders SET {assignments} WHERE seq = ? AND owner = ?',
+                             list(values.values()) + [seq, _OWNER])
+        finally:
+            conn.close()
+
+
+def _submit(seq: int, merchant_id: str, payload: Dict[str, Any], attempts: int) -> None:
+    """Submit a claimed entry; `attempts` counts earlier submissions"""
+    from app.api_utils import make_clover_request, build_merchant_url
+
+    url = build_merchant_url(Config(), merchant_id, 'atomic_order/orders')
+    try:
+        response = make_clover_request('POST', url, merchant_id, json=payload)
+    except requests.RequestException as e:
+        status_code, error = None, str(e)
+    else:
+        if response.status_code in [200, 201]:
+            order = response.json()
+            _update(seq, status=CREATED, order_id=order.get('id'), response=json.dumps(order), last_error=None)
+            return
+        status_code, error = response.status_code, f"Clover API error: {response.text}"
+
+    retryable = status_code is None or status_code == 429 or status_code >= 500
+    if not retryable or attempts + 1 >= Config.ORDER_QUEUE_MAX_ATTEMPTS:
+        _update(seq, status=FAILED, last_error=error)
+        return
+    # Keep the entry at the head of the queue so later orders stay behind it
+    delay = min(Config.ORDER_QUEUE_MAX_BACKOFF_SECONDS, 2 ** attempts)
+    _update(seq, status=QUEUED, last_error=error, next_attempt_at=time.time() + delay)
+
+
+def _drain_forever() -> None:
+    while True:
+        try:
+            row = _next_pending()
+        except Exception as e:
+            print(f"Order queue read failed: {str(e)}")
+            row = None
+        if row is None:
+            _WAKE.wait(Config.ORDER_QUEUE_POLL_SECONDS)
+            _WAKE.clear()
+            continue
+
+        seq, ref, merchant_id, payload, attempts, next_attempt_at, status, lease_until = row
+        # Wait for the backoff, or for another process to finish the head entry
+        now = time.time()
+        wait = next_attempt_at - now if status == QUEUED else (lease_until or 0) - now
+        if wait > 0:
+            _WAKE.wait(min(wait, Config.ORDER_QUEUE_POLL_SECONDS))
+            _WAKE.clear()
+            continue
+        try:
+            if not _claim(seq):
+                continue
+        except Exception as e:
+            print(f"Order queue claim of {ref} failed: {str(e)}")
+            _WAKE.wait(Config.ORDER_QUEUE_POLL_SECONDS)
+            _WAKE.clear()
+            continue
+        try:
+            _submit(seq, merchant_id, json.loads(payload), attempts)
+        except Exception as e:
+            print(f"Order queue submission of {ref} failed: {str(e)}")
+            _update(seq, status=QUEUED, last_error=str(e), next_attempt_at=time.time() + 5)
+
+
+def start_drainer() -> None:
+    """Start the background drainer thread if it is not already running"""
+    global _drainer
+    with _LOCK:
+        if _drainer is not None and _drainer.is_alive():
+            return
+        _drainer = threading.Thread(target=_drain_forever, name='order-queue-drainer', daemon=True)
+        _drainer.start()
+
+
+def resume_pending() -> None:
+    """Resume draining orders left in the journal by a previous run"""
+    if os.path.exists(_DB_FILE) and _next_pending() is not None:
+        start_drainer()
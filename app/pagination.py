@@ -0,0 +1,168 @@
+"""Keyset (createdTime, id) cursor pagination for Clover list endpoints.
+
+Offset paging gets slower the deeper a client pages and shifts under concurrent
+inserts. A cursor instead remembers the last (createdTime, id) a client saw and
+turns it into a ``createdTime<=`` filter, so every page costs the same and
+records created after the first page never push older ones across a boundary.
+"""
+
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.api_utils import make_clover_request
+
+# Clover caps list requests at 1000 elements
+MAX_PAGE_SIZE = 1000
+
+# Extra rows requested so records sharing the cursor's createdTime can be
+# dropped without coming up short on the page; larger tie groups are read whole
+TIE_SLACK = 25
+
+
+def encode_cursor(created_time: int, record_id: str) -> str:
+    """Encode a (createdTime, id) position as an opaque URL-safe cursor"""
+    raw = json.dumps({'t': created_time, 'id': record_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[int, str]]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Returns None for an empty cursor (first page) and raises ValueError if the
+    cursor is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return int(data['t']), str(data['id'])
+    except Exception:
+        raise ValueError('Invalid pagination cursor')
+
+
+def _fetch(url: str, merchant_id: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    response = make_clover_request('GET', url, merchant_id, params=params)
+    response.raise_for_status()
+    return response.json().get('elements', [])
+
+
+def _fetch_tie_group(url: str, merchant_id: str, filters: List[str], expand: Optional[str],
+                     time_field: str, value: int) -> List[Dict[str, Any]]:
+    """Every record whose timestamp equals value, read with offset paging"""
+    records: Dict[Any, Dict[str, Any]] = {}
+    offset = 0
+    while True:
+        params: Dict[str, Any] = {
+            'filter': filters + [f'{time_field}={value}'],
+            'limit': MAX_PAGE_SIZE,
+            'offset': offset,
+        }
+        if expand:
+            params['expand'] = expand
+        elements = _fetch(url, merchant_id, params)
+        for element in elements:
+            records[element.get('id')] = element
+        if len(elements) < MAX_PAGE_SIZE:
+            return list(records.values())
+        offset += len(elements)
+
+
+def fetch_cursor_page(url: str, merchant_id: str, cursor: str, limit: int,
+                      filters: Optional[List[str]] = None,
+                      expand: Optional[str] = None,
+                      time_field: str = 'createdTime') -> Dict[str, Any]:
+    """
+    Fetch one page of a Clover collection, newest first, after the given cursor.
+
+    Args:
+        url: Full URL of the Clover collection (e.g. .../orders)
+        merchant_id: Merchant ID for token refresh
+        cursor: Cursor from a previous page, or '' for the first page
+        limit: Page size
+        filters: Additional Clover filter clauses, ANDed with the cursor clause
+        expand: Optional Clover expand value
+        time_field: Timestamp field the collection is ordered by (customers
+            use customerSince rather than createdTime)
+
+    Returns:
+        Dict with 'elements', 'nextCursor' and 'hasMore'. Raises ValueError for
+        an invalid cursor and requests.HTTPError for upstream errors.
+    """
+    position = decode_cursor(cursor)
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE - TIE_SLACK - 1))
+
+    def sort_key(record: Dict[str, Any]) -> Tuple[int, str]:
+        return record.get(time_field) or 0, record.get('id') or ''
+
+    bound = position[0] if position else None
+    while True:
+        clauses = list(filters or [])
+        if bound is not None:
+            clauses.append(f'{time_field}<={bound}')
+        params: Dict[str, Any] = {
+            'limit': limit + TIE_SLACK + 1,
+            'orderBy': f'{time_field} DESC',
+        }
+        if clauses:
+            params['filter'] = clauses
+        if expand:
+            params['expand'] = expand
+        fetched = _fetch(url, merchant_id, params)
+        full = len(fetched) >= params['limit']
+
+        # Clover only orders by the timestamp, so break ties on id locally and skip
+        # anything at or before the cursor position
+        elements = sorted(fetched, key=sort_key, reverse=True)
+        if full:
+            # A full response may cut off the records sharing its oldest timestamp;
+            # when the page reaches into them, read that whole tie group
+            oldest = sort_key(elements[-1])[0]
+            newer = [e for e in elements if sort_key(e)[0] > oldest]
+            if sum(1 for e in newer if not position or sort_key(e) < position) < limit:
+                group = _fetch_tie_group(url, merchant_id, list(filters or []), expand, time_field, oldest)
+                elements = newer + sorted(group, key=sort_key, reverse=True)
+        if position:
+            elements = [e for e in elements if sort_key(e) < position]
+        if elements or not full:
+            break
+        # Everything down to the oldest timestamp was already seen; continue below it
+        bound = oldest - 1
+
+    page = elements[:limit]
+    has_more = len(elements) > limit or full
+    next_cursor = None
+    if has_more and page:
+        last = page[-1]
+        next_cursor = encode_cursor(*sort_key(last))
+
+    return {
+        'elements': page,
+        'nextCursor': next_cursor,
+        'hasMore': has_more,
+    }
+
+
+def fetch_all(url: str, merchant_id: str, filters: Optional[List[str]] = None,
+              expand: Optional[str] = None, time_field: str = 'createdTime',
+              max_records: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Follow cursor pages of full size until the collection is exhausted, or
+    until more than max_records have been read.
+
+    Returns the records, newest first, and the number of upstream requests
+    made. Raises requests.HTTPError for upstream errors.
+    """
+    records: List[Dict[str, Any]] = []
+    cursor = ''
+    requests_made = 0
+    while True:
+        page = fetch_cursor_page(url, merchant_id, cursor, MAX_PAGE_SIZE, filters=filters,
+                                 expand=expand, time_field=time_field)
+        requests_made += 1
+        records.extend(page['elements'])
+        if not page['hasMore'] or (max_records is not None and len(records) > max_records):
+            return records, requests_made
+        cursor = page['nextCursor']
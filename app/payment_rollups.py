@@ -0,0 +1,150 @@
+"""Materialized hourly and daily payment rollups fed by the payments sync.
+
+Every synced payment adds its count, amount, tipAmount and cashbackAmount to
+the UTC hour and UTC day bucket of its createdTime, keyed by (result, card
+type). A re-synced payment first retracts what its previous version added, so
+refunds, voids and tip adjustments stay correct. A summary over a range adds
+whole days from the daily buckets and only the partial days at either end
+from the hourly buckets, so its cost depends on the length of the range, not
+on the number of payments.
+
+The buckets only hold payments the sync has seen, so a range starting before
+the sync's syncedFrom is summarized from the payments Clover lists for it
+instead.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import sync
+from app.api_utils import build_merchant_url
+from app.config import Config
+from app.pagination import fetch_all
+
+_HOUR_MS = 3600000
+
+_FIELDS = ('count', 'amount', 'tipAmount', 'cashbackAmount')
+
+Key = Tuple[Optional[str], Optional[str]]
+
+
+def _card_type(payment: Dict[str, Any]) -> Optional[str]:
+    return (payment.get('cardTransaction') or {}).get('cardType')
+
+
+class PaymentRollups:
+    """Hourly and daily buckets of one merchant's payments"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # bucket number -> (result, card type) -> [count, amount, tip, cashback]
+        self._hours: Dict[int, Dict[Key, List[int]]] = {}
+        self._days: Dict[int, Dict[Key, List[int]]] = {}
+        # payment id -> (hour, key, values) it contributed, to retract on re-sync
+        self._contributions: Dict[str, Tuple[int, Key, Tuple[int, int, int, int]]] = {}
+
+    def _add(self, hour: int, key: Key, values: Tuple[int, ...], sign: int) -> None:
+        for buckets, number in ((self._hours, hour), (self._days, hour // 24)):
+            counters = buckets.setdefault(number, {}).setdefault(key, [0, 0, 0, 0])
+            for i, value in enumerate(values):
+                counters[i] += sign * value
+
+    def ingest(self, payments: List[Dict[str, Any]]) -> None:
+        """Upsert synced payments into the buckets"""
+        with self._lock:
+            for payment in payments:
+                payment_id = payment.get('id')
+                if not payment_id:
+                    continue
+                previous = self._contributions.pop(payment_id, None)
+                if previous is not None:
+                    self._add(*previous, sign=-1)
+                hour = (payment.get('createdTime') or 0) // _HOUR_MS
+                key = (payment.get('result'), _card_type(payment))
+                values = (1, payment.get('amount') or 0, payment.get('tipAmount') or 0,
+                          payment.get('cashbackAmount') or 0)
+                self._add(hour, key, values, sign=1)
+                self._contributions[payment_id] = (hour, key, values)
+
+    def summary(self, start: int, end: int) -> Dict[str, Any]:
+        """
+        Totals for payments created in [start, end), both rounded down to the
+        hour, overall and by result and by card type.
+        """
+        first_hour, end_hour = start // _HOUR_MS, end // _HOUR_MS
+        first_day, end_day = -(-first_hour // 24), end_hour // 24
+        if first_day < end_day:
+            spans = [(self._hours, first_hour, first_day * 24), (self._days, first_day, end_day),
+                     (self._hours, end_day * 24, end_hour)]
+        else:
+            spans = [(self._hours, first_hour, end_hour)]
+
+        totals = [0, 0, 0, 0]
+        by_result: Dict[Optional[str], List[int]] = {}
+        by_card_type: Dict[Optional[str], List[int]] = {}
+        buckets_read = 0
+        with self._lock:
+            for buckets, low, high in spans:
+                for number in range(low, high):
+                    bucket = buckets.get(number)
+                    if not bucket:
+                        continue
+                    buckets_read += 1
+                    for (result, card_type), counters in bucket.items():
+                        for target in (totals, by_result.setdefault(result, [0, 0, 0, 0]),
+                                       by_card_type.setdefault(card_type, [0, 0, 0, 0])):
+                            for i, value in enumerate(counters):
+                                target[i] += value
+
+        def named(counters):
+            return dict(zip(_FIELDS, counters))
+
+        return {
+            'from': first_hour * _HOUR_MS,
+            'to': end_hour * _HOUR_MS,
+            'totals': named(totals),
+            'byResult': {str(result): named(c) for result, c in by_result.items() if c[0]},
+            'byCardType': {str(card_type) if card_type else 'NONE': named(c)
+                           for card_type, c in by_card_type.items() if c[0]},
+            'bucketsRead': buckets_read,
+        }
+
+
+_LOCK = threading.Lock()
+_ROLLUPS: Dict[str, PaymentRollups] = {}
+
+
+def get_rollups(merchant_id: str) -> PaymentRollups:
+    with _LOCK:
+        rollups = _ROLLUPS.get(merchant_id)
+        if rollups is None:
+            rollups = _ROLLUPS[merchant_id] = PaymentRollups()
+        return rollups
+
+
+def covers(merchant_id: str, start: int) -> bool:
+    """Whether the rollups hold every payment created from `start` (rounded down to the hour) on"""
+    coverage = sync.get_coverage(merchant_id, 'payments')
+    return coverage is not None and coverage['syncedFrom'] <= start - start % _HOUR_MS
+
+
+def summary_from_clover(merchant_id: str, start: int, end: int) -> Dict[str, Any]:
+    """
+    The same summary built from the payments Clover lists for the range, for
+    ranges the rollups do not cover. Raises requests.HTTPError for upstream errors.
+    """
+    first, last = start - start % _HOUR_MS, end - end % _HOUR_MS
+    payments, requests_made = fetch_all(build_merchant_url(Config(), merchant_id, 'payments'), merchant_id,
+                                        [f'createdTime>={first}', f'createdTime<{last}'], 'cardTransaction')
+    rollups = PaymentRollups()
+    rollups.ingest(payments)
+    summary = rollups.summary(start, end)
+    summary['upstreamRequests'] = requests_made
+    return summary
+
+
+def ingest_payments(merchant_id: str, payments: List[Dict[str, Any]]) -> None:
+    get_rollups(merchant_id).ingest(payments)
+
+
+sync.add_listener('payments', ingest_payments)
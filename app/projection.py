@@ -0,0 +1,98 @@
+"""Field projection for Clover documents.
+
+Maps a client's ``fields=`` selection to the smallest Clover ``expand`` set that
+can satisfy it, and trims the response down to those fields before it is
+serialized.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+# Expansion used when a client asks for the full order
+DEFAULT_ORDER_EXPAND = (
+    'lineItems,lineItems.item,lineItems.modifications,'
+    'discounts,orderType,payments,taxRates,serviceCharge,'
+    'device,merchant,employee'
+)
+
+# Order paths that Clover only returns in full when expanded
+ORDER_EXPANDABLE = {
+    'lineItems', 'lineItems.item', 'lineItems.modifications', 'lineItems.discounts',
+    'lineItems.taxRates', 'discounts', 'orderType', 'payments', 'refunds', 'credits',
+    'taxRates', 'serviceCharge', 'device', 'merchant', 'employee', 'customers'
+}
+
+# Named field sets; None means the full document with the default expansion
+ORDER_PRESETS: Dict[str, Optional[List[str]]] = {
+    'summary': [
+        'id', 'title', 'state', 'paymentState', 'currency', 'total',
+        'createdTime', 'modifiedTime'
+    ],
+    'kitchen': [
+        'id', 'title', 'note', 'state', 'createdTime', 'orderType.label',
+        'lineItems.id', 'lineItems.name', 'lineItems.unitQty', 'lineItems.note',
+        'lineItems.modifications.name', 'employee.name'
+    ],
+    'full': None,
+}
+
+
+def resolve_fields(fields_param: Optional[str], presets: Dict[str, Optional[List[str]]]) -> Optional[List[str]]:
+    """
+    Turn a comma-separated fields value (field paths and/or preset names) into
+    a list of field paths. Returns None when the full document is wanted.
+    """
+    if not fields_param:
+        return None
+    fields: List[str] = []
+    for name in (part.strip() for part in fields_param.split(',')):
+        if not name:
+            continue
+        if name in presets:
+            if presets[name] is None:
+                return None
+            fields.extend(presets[name])
+        else:
+            fields.append(name)
+    return fields or None
+
+
+def expand_for_fields(fields: Iterable[str], expandable: Iterable[str]) -> str:
+    """Smallest Clover expand value covering every requested field path"""
+    expandable = set(expandable)
+    needed: List[str] = []
+    for field in fields:
+        parts = field.split('.')
+        for i in range(1, len(parts) + 1):
+            prefix = '.'.join(parts[:i])
+            if prefix in expandable and prefix not in needed:
+                needed.append(prefix)
+    return ','.join(needed)
+
+
+def _field_tree(fields: Iterable[str]) -> Dict[str, Any]:
+    tree: Dict[str, Any] = {}
+    for field in fields:
+        node = tree
+        for part in field.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _trim(value: Any, tree: Dict[str, Any]) -> Any:
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [_trim(element, tree) for element in value]
+    if not isinstance(value, dict):
+        return value
+    # Clover wraps expanded collections as {'elements': [...]}
+    if 'elements' in value and 'elements' not in tree:
+        return dict(value, elements=_trim(value['elements'], tree))
+    return {key: _trim(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+
+def project(document: Dict[str, Any], fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """Keep only the requested field paths of a document (all of it if fields is None)"""
+    if fields is None:
+        return document
+    return _trim(document, _field_tree(fields))
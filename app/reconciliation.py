@@ -0,0 +1,166 @@
+"""Payment-to-order reconciliation over a time range.
+
+Instead of asking Clover for each order's payments, the orders created in the
+range and the payments created in the range (plus a grace period for orders
+settled later) are bulk-read page by page, or taken from the synced local
+mirrors when those cover the range, and joined locally on order id.
+"""
+
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import local_mirror
+from app.api_utils import make_clover_request, build_merchant_url
+from app.concurrency import run_bounded
+from app.config import Config
+from app.pagination import fetch_all
+
+# Payment results that count towards an order's paid amount
+PAID_RESULTS = ('SUCCESS',)
+
+
+def _load(merchant_id: str, collection: str, start: int, end: int,
+          expand: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """Records created in [start, end) and the number of upstream requests it took"""
+    filters = [f'createdTime>={start}', f'createdTime<{end}']
+    local = local_mirror.query(merchant_id, collection, filters, sys.maxsize, 0, expand)
+    if local is not None:
+        return local['elements'], 0
+    url = build_merchant_url(Config(), merchant_id, collection)
+    return fetch_all(url, merchant_id, filters, expand)
+
+
+def _fetch_orders(merchant_id: str, order_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Look up orders outside the range by id; None for orders Clover does not know"""
+    config = Config()
+
+    def fetch(order_id):
+        response = make_clover_request('GET', build_merchant_url(config, merchant_id, f'orders/{order_id}'),
+                                       merchant_id)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    found = {}
+    for index, order, error in run_bounded(fetch, order_ids):
+        if error is not None:
+            raise error
+        found[order_ids[index]] = order
+    return found
+
+
+def _net_amount(payment: Dict[str, Any]) -> Tuple[int, int]:
+    """(amount, refunded) of a payment; tips are not part of the order total"""
+    refunds = (payment.get('refunds') or {}).get('elements') or []
+    return payment.get('amount') or 0, sum(refund.get('amount') or 0 for refund in refunds)
+
+
+def reconcile(merchant_id: str, start: int, end: int, grace_ms: int = 0) -> Dict[str, Any]:
+    """
+    Join orders created in [start, end) with their payments.
+
+    Orders are flagged unpaid, underpaid or overpaid when the gross amount of
+    their successful payments differs from the order total. Refunds against
+    those payments are listed separately rather than counted as a shortfall.
+    Payments created in the range whose order does not exist are reported as
+    orphans. Raises requests.HTTPError for upstream errors.
+    """
+    orders, order_requests = _load(merchant_id, 'orders', start, end)
+    payments, payment_requests = _load(merchant_id, 'payments', start, end + grace_ms, 'refunds')
+    upstream_requests = order_requests + payment_requests
+
+    # Build side: payments hashed by order id
+    payments_by_order: Dict[str, List[Dict[str, Any]]] = {}
+    unlinked = []
+    for payment in payments:
+        order_id = (payment.get('order') or {}).get('id')
+        if order_id:
+            payments_by_order.setdefault(order_id, []).append(payment)
+        elif (payment.get('createdTime') or 0) < end:
+            unlinked.append(payment)
+
+    # Payments in the range for orders created before it are looked up individually
+    order_ids = {order['id'] for order in orders}
+    outside = sorted({
+        order_id for order_id, linked in payments_by_order.items()
+        if order_id not in order_ids and any((p.get('createdTime') or 0) < end for p in linked)
+    })
+    earlier = _fetch_orders(merchant_id, outside) if outside else {}
+    upstream_requests += len(outside)
+
+    orphans = [
+        {'paymentId': payment['id'], 'orderId': (payment.get('order') or {}).get('id'),
+         'amount': payment.get('amount'), 'result': payment.get('result'), 'createdTime': payment.get('createdTime')}
+        for payment in unlinked + [p for order_id in outside if earlier[order_id] is None
+                                   for p in payments_by_order[order_id] if (p.get('createdTime') or 0) < end]
+    ]
+
+    # Probe side: orders in the range. Earlier orders only decide whether a
+    # payment is an orphan; their other payments fall outside the range.
+    counts = {'paid': 0, 'unpaid': 0, 'underpaid': 0, 'overpaid': 0, 'noCharge': 0}
+    mismatches = []
+    refunds = []
+    order_total = paid_total = refunded_total = 0
+    for order in orders:
+        total = order.get('total') or 0
+        paid = refunded = 0
+        payment_ids = []
+        for payment in payments_by_order.get(order['id'], []):
+            if payment.get('result') not in PAID_RESULTS:
+                continue
+            amount, refund = _net_amount(payment)
+            paid += amount
+            refunded += refund
+            payment_ids.append(payment['id'])
+        order_total += total
+        paid_total += paid
+        refunded_total += refunded
+
+        # A refund does not make a settled order unpaid
+        if total == 0 and not payment_ids:
+            status = 'noCharge'
+        elif paid == total:
+            status = 'paid'
+        elif paid == 0:
+            status = 'unpaid'
+        elif paid < total:
+            status = 'underpaid'
+        else:
+            status = 'overpaid'
+        counts[status] += 1
+        if status in ('unpaid', 'underpaid', 'overpaid'):
+            mismatches.append({
+                'orderId': order['id'],
+                'status': status,
+                'orderState': order.get('state'),
+                'createdTime': order.get('createdTime'),
+                'total': total,
+                'paid': paid,
+                'refunded': refunded,
+                'balance': total - paid,
+                'paymentIds': payment_ids,
+            })
+        if refunded:
+            refunds.append({
+                'orderId': order['id'],
+                'status': status,
+                'createdTime': order.get('createdTime'),
+                'total': total,
+                'paid': paid,
+                'refunded': refunded,
+                'paymentIds': payment_ids,
+            })
+
+    mismatches.sort(key=lambda m: m['createdTime'] or 0)
+    refunds.sort(key=lambda r: r['createdTime'] or 0)
+    return {
+        'from': start,
+        'to': end,
+        'summary': dict(counts, orders=len(orders), earlierOrders=len(outside), payments=len(payments),
+                        orphanPayments=len(orphans), refundedOrders=len(refunds), orderTotal=order_total,
+                        paidTotal=paid_total, refundedTotal=refunded_total, upstreamRequests=upstream_requests),
+        'mismatches': mismatches,
+        'refunds': refunds,
+        'orphanPayments': orphans,
+    }
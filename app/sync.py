@@ -0,0 +1,189 @@
+"""Incremental sync of Clover collections into local stores.
+
+Local stores (analytics, archives, indexes) register a listener for a
+collection. A sync pages through records modified since the last watermark,
+oldest first, and hands each page to every listener. Watermarks are kept in
+memory, so the first sync after a restart re-reads the configured lookback
+window and listeners must treat records as upserts.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import Config
+from app.api_utils import make_clover_request, build_merchant_url
+
+# Clover caps list requests at 1000 elements
+_PAGE_SIZE = 1000
+
+SOURCES: Dict[str, Dict[str, Any]] = {
+    'orders': {
+        'endpoint': 'orders',
+        'time_field': 'modifiedTime',
+        'expand': 'lineItems,lineItems.modifications,discounts,payments,refunds,customers',
+    },
+    'payments': {
+        'endpoint': 'payments',
+        'time_field': 'modifiedTime',
+        'expand': 'cardTransaction,tender,refunds',
+    },
+    'customers': {
+        # Customers carry no modifiedTime, so only newly created ones are picked up incrementally
+        'endpoint': 'customers',
+        'time_field': 'customerSince',
+        'expand': 'addresses,emailAddresses,phoneNumbers',
+    },
+}
+
+Listener = Callable[[str, List[Dict[str, Any]]], None]
+
+_LOCK = threading.Lock()
+_LISTENERS: Dict[str, List[Listener]] = {}
+_WATERMARKS: Dict[Tuple[str, str], int] = {}
+# Earliest `since` a completed sync started from, and when the last one finished
+_SYNCED_FROM: Dict[Tuple[str, str], int] = {}
+_SYNCED_AT: Dict[Tuple[str, str], float] = {}
+_RUNNING: Dict[Tuple[str, str], threading.Lock] = {}
+_background: Optional[threading.Thread] = None
+
+
+def add_listener(collection: str, listener: Listener) -> None:
+    """Register a callback receiving (merchant_id, records) for each synced page"""
+    with _LOCK:
+        listeners = _LISTENERS.setdefault(collection, [])
+        if listener not in listeners:
+            listeners.append(listener)
+
+
+def get_watermark(merchant_id: str, collection: str) -> Optional[int]:
+    """Timestamp (ms) up to which a collection has been synced, if at all"""
+    return _WATERMARKS.get((merchant_id, collection))
+
+
+def get_coverage(merchant_id: str, collection: str) -> Optional[Dict[str, Any]]:
+    """
+    What local stores fed by this collection are known to hold: every record
+    whose time field is at or after `syncedFrom`, as of `syncedAt` (epoch
+    seconds). None if the collection has never been synced.
+    """
+    key = (merchant_id, collection)
+    if key not in _SYNCED_AT:
+        return None
+    return {
+        'syncedFrom': _SYNCED_FROM[key],
+        'watermark': _WATERMARKS.get(key),
+        'syncedAt': _SYNCED_AT[key],
+    }
+
+
+def _notify(collection: str, merchant_id: str, records: List[Dict[str, Any]]) -> None:
+    for listener in list(_LISTENERS.get(collection, [])):
+        try:
+            listener(merchant_id, records)
+        except Exception as e:
+            print(f"Sync listener {getattr(listener, '__name__', listener)} failed for {collection}: {str(e)}")
+
+
+def sync(merchant_id: str, collection: str, since: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Pull records modified since `since` (default: the last watermark, or the
+    lookback window on first run) and pass them to the collection's listeners.
+
+    Returns a summary with the number of records synced and the new watermark.
+    Raises requests.HTTPError if Clover rejects a page.
+    """
+    source = SOURCES[collection]
+    time_field = source['time_field']
+    key = (merchant_id, collection)
+    with _LOCK:
+        running = _RUNNING.setdefault(key, threading.Lock())
+
+    with running:
+        if since is None:
+            since = _WATERMARKS.get(key)
+        if since is None:
+            since = int((time.time() - Config.SYNC_LOOKBACK_DAYS * 86400) * 1000)
+
+        url = build_merchant_url(Config(), merchant_id, source['endpoint'])
+        position = since
+        seen_at_position = set()
+        offset = 0
+        synced = 0
+        high_water = since
+        started = time.time()
+        while True:
+            params: Dict[str, Any] = {
+                'filter': [f'{time_field}>={position}'],
+                'orderBy': f'{time_field} ASC',
+                'limit': _PAGE_SIZE,
+                'offset': offset,
+            }
+            if source.get('expand'):
+                params['expand'] = source['expand']
+            response = make_clover_request('GET', url, merchant_id, params=params)
+            response.raise_for_status()
+            elements = response.json().get('elements', [])
+
+            fresh = [e for e in elements
+                     if not (e.get(time_field) == position and e.get('id') in seen_at_position)]
+            if fresh:
+                _notify(collection, merchant_id, fresh)
+                synced += len(fresh)
+            if elements:
+                newest = max(e.get(time_field) or 0 for e in elements)
+                high_water = max(high_water, newest)
+            if len(elements) < _PAGE_SIZE:
+                break
+
+            # Keyset on the timestamp; fall back to offset while a whole page shares one timestamp
+            at_newest = {e.get('id') for e in elements if e.get(time_field) == newest}
+            if newest == position:
+                seen_at_position |= at_newest
+                offset += len(elements)
+            else:
+                position, seen_at_position, offset = newest, at_newest, 0
+
+        # Re-read the last millisecond next time; listeners upsert, so overlap is harmless
+        previous = _WATERMARKS.get(key)
+        if previous is not None and since <= previous:
+            _SYNCED_FROM[key] = min(since, _SYNCED_FROM.get(key, since))
+        else:
+            # Anything modified between the old watermark and `since` was skipped
+            _SYNCED_FROM[key] = since
+        _WATERMARKS[key] = max(high_water, _WATERMARKS.get(key, 0))
+        _SYNCED_AT[key] = time.time()
+        return {
+            'collection': collection,
+            'synced': synced,
+            'since': since,
+            'watermark': _WATERMARKS[key],
+            'seconds': round(time.time() - started, 3),
+        }
+
+
+def _sync_periodically() -> None:
+    while True:
+        time.sleep(Config.SYNC_INTERVAL_SECONDS)
+        merchant_id = Config.get_merchant_id()
+        if not merchant_id:
+            continue
+        for collection in list(_LISTENERS):
+            if collection not in SOURCES:
+                continue
+            try:
+                sync(merchant_id, collection)
+            except Exception as e:
+                print(f"Background sync of {collection} failed: {str(e)}")
+
+
+def start_background_sync() -> None:
+    """Start periodic syncing of every collection with listeners, if enabled"""
+    global _background
+    if Config.SYNC_INTERVAL_SECONDS <= 0:
+        return
+    with _LOCK:
+        if _background is not None and _background.is_alive():
+            return
+        _background = threading.Thread(target=_sync_periodically, name='clover-sync', daemon=True)
+        _background.start()
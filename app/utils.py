@@ -1,5 +1,6 @@
+import re
 import requests
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from app.config import Config
 
 class CloverAPIClient:
@@ -95,4 +96,13 @@ class CloverAPIClient:
                 'merchant_id': self.merchant_id,
                 'api_version': self.api_version,
                 'environment': 'sandbox' if self.config.USE_SANDBOX else 'production'
-            }
\ No newline at end of file
+            }
+
+
+# Words of a name, keeping inner apostrophes and hyphens (O'Neil, Jean-Luc)
+_NAME_TOKENS = re.compile(r"[^\W_]+(?:['’-][^\W_]+)*")
+
+
+def name_tokens(value: Any) -> List[str]:
+    """Lowercased words of a name or search query, as used by the local search indexes"""
+    return [token.lower() for token in _NAME_TOKENS.findall(str(value or ''))]